@@ -1,13 +1,17 @@
 # main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from logging.handlers import RotatingFileHandler
 import os
-import requests
 
-from src.api.controllers import rag_router, scrape_router
-from src.config.settings import OLLAMA_BASE_URL
+from src.api.controllers import metrics_router, rag_router, scrape_router
+from src.config.settings import RAG_CONFIG
+from src.core.ollama_backends import get_backend_pool
+from src.core.ollama_client import close_ollama_client, get_ollama_client
+from src.repository.log_sink import get_log_sink
 
 # ===============================
 # Logging setup
@@ -42,9 +46,32 @@ logger = logging.getLogger("app")
 # ===============================
 # FastAPI app
 # ===============================
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # HTTP client (connection pool) ไปยัง Ollama ใช้ร่วมกันทุก Request
+    get_ollama_client()
+    # probe เครื่อง Ollama ที่ถูกนำออกจากการใช้งาน จนกว่าจะกลับมา
+    prober = asyncio.create_task(get_backend_pool().probe_forever())
+    # worker ของ /rag/jobs (ต่องานที่ค้างจากรอบก่อนด้วย)
+    await rag_router.job_service.start()
+    warmup = None
+    if RAG_CONFIG["warmup"]:
+        # ทำใน background ไม่บล็อกการเปิด server (คำถามที่เข้ามาระหว่างนี้ได้คิวก่อน เพราะ warm-up อยู่ lane bulk)
+        warmup = asyncio.create_task(rag_router.rag_service.llm.warm_up())
+    yield
+    await rag_router.job_service.stop()
+    if warmup is not None and not warmup.done():
+        warmup.cancel()
+    prober.cancel()
+    await close_ollama_client()
+    # เขียน Log ที่ค้างใน buffer ให้ครบก่อนปิด
+    get_log_sink().close()
+
+
 app = FastAPI(
     title="⚖️ RPA RD Scraper & ChatBot (Modular API)",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -56,6 +83,7 @@ app.add_middleware(
 
 app.include_router(rag_router.router)
 app.include_router(scrape_router.router)
+app.include_router(metrics_router.router)
 
 
 @app.get("/")
@@ -70,17 +98,13 @@ def healthz():
 
 
 @app.get("/ready")
-def ready():
-    try:
-        r = requests.get(
-            f"{OLLAMA_BASE_URL}/api/tags",
-            timeout=2
-        )
-        r.raise_for_status()
-        return {"status": "ready", "ollama": "reachable"}
-    except Exception as e:
-        logger.error("Ollama not ready: %s", e)
-        return {"status": "not_ready", "ollama": "unreachable"}
+async def ready():
+    # พร้อมเมื่อมีเครื่อง Ollama ที่ใช้ได้อย่างน้อยหนึ่งเครื่อง
+    backends = await get_backend_pool().probe_all()
+    if any(b["healthy"] for b in backends):
+        return {"status": "ready", "ollama": "reachable", "backends": backends}
+    logger.error("Ollama not ready: %s", [b["last_error"] for b in backends])
+    return {"status": "not_ready", "ollama": "unreachable", "backends": backends}
 
 
 if __name__ == "__main__":
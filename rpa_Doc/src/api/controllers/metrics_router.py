@@ -0,0 +1,77 @@
+# src/api/controllers/metrics_router.py
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from typing import List
+
+from src.api.controllers import rag_router
+from src.core.metrics import Sample, get_metrics
+
+router = APIRouter(tags=["Monitoring"])
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics_text():
+    """Metrics แบบ Prometheus: histogram เวลาแต่ละขั้นตอน + สถานะคิว/Index/Cache ณ ตอนที่เรียก"""
+    return PlainTextResponse(get_metrics().render(_current_samples()), media_type=CONTENT_TYPE)
+
+def _current_samples() -> List[Sample]:
+    """อ่านค่าปัจจุบันจาก stats() ของแต่ละส่วน (ทำเฉพาะตอน scrape ไม่มีต้นทุนบน hot path)"""
+    rag = rag_router.rag_service
+    samples: List[Sample] = []
+
+    # คิว Ollama
+    queue = rag.llm.scheduler.stats()
+    for lane, depth in queue["queue_depth_by_lane"].items():
+        samples.append(Sample("ollama_queue_depth", "gauge", "Jobs waiting for an Ollama slot", depth, {"lane": lane}))
+    samples.append(Sample("ollama_generations_in_flight", "gauge", "Ollama jobs currently running", queue["running"]))
+    samples.append(Sample("ollama_slots", "gauge", "Ollama jobs allowed to run at once", queue["num_parallel"]))
+    for outcome in ("submitted", "completed", "failed", "rejected", "expired", "cancelled"):
+        samples.append(Sample(
+            "ollama_queue_jobs_total", "counter", "Ollama queue jobs by outcome", queue[outcome], {"outcome": outcome}
+        ))
+    for b in rag.llm.backends.states():
+        labels = {"backend": b["url"]}
+        samples.append(Sample("ollama_backend_up", "gauge", "1 if the Ollama backend is in rotation", int(b["healthy"]), labels))
+        samples.append(Sample("ollama_backend_outstanding", "gauge", "Requests running on the backend", b["outstanding"], labels))
+
+    # คำถามที่กำลังประมวลผล (Single-flight)
+    inflight = rag.inflight_stats()
+    samples.append(Sample("rag_inflight_questions", "gauge", "Distinct questions being generated", inflight["inflight_questions"]))
+    samples.append(Sample("rag_coalesced_total", "counter", "Questions answered by waiting for an identical in-flight one",
+                          inflight["coalesced"]))
+
+    # Index ที่โหลดอยู่ (ยังไม่โหลด = ไม่มีค่า)
+    snapshot = rag.retrieval.index_holder.peek()
+    if snapshot is not None:
+        samples.append(Sample("rag_index_chunks", "gauge", "Chunks in the loaded index", len(snapshot.chunks)))
+        samples.append(Sample("rag_index_shards", "gauge", "Shards in the loaded index", len(snapshot.shards)))
+        samples.append(Sample("rag_index_dense_vectors", "gauge", "Rows in the dense (ANN) index",
+                              len(snapshot.dense_chunks) if snapshot.dense_chunks is not None else 0))
+        for part, size in snapshot.size_bytes.items():
+            samples.append(Sample("rag_index_bytes", "gauge", "On-disk size of the loaded index files", size,
+                                  {"part": part}))
+        samples.append(Sample("rag_index_info", "gauge", "Version of the loaded index", 1,
+                              {"version": snapshot.version or ""}))
+
+    # Cache คำตอบ
+    if rag.cache is not None:
+        cache = rag.cache.stats()
+        for result, key in (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses")):
+            samples.append(Sample("rag_cache_lookups_total", "counter", "Answer cache lookups by result", cache[key],
+                                  {"result": result}))
+        samples.append(Sample("rag_cache_hit_ratio", "gauge", "Answer cache hits / lookups since start", cache["hit_rate"]))
+        samples.append(Sample("rag_cache_entries", "gauge", "Answers in the cache", cache["memory_entries"], {"store": "memory"}))
+        samples.append(Sample("rag_cache_entries", "gauge", "Answers in the cache", cache["disk_entries"], {"store": "disk"}))
+
+    # งานเบื้องหลัง (/rag/jobs) และ buffer ของ Log
+    jobs = rag_router.job_service.stats()
+    samples.append(Sample("rag_jobs", "gauge", "Background jobs by state", jobs["pending_jobs"], {"state": "pending"}))
+    samples.append(Sample("rag_jobs", "gauge", "Background jobs by state", jobs["running_jobs"], {"state": "running"}))
+    sink = rag.log_sink.stats()
+    samples.append(Sample("rag_log_buffered", "gauge", "Q&A logs waiting to be written", sink["buffered"]))
+    for result in ("written", "dropped"):
+        samples.append(Sample("rag_log_entries_total", "counter", "Q&A log entries by result", sink[result],
+                              {"result": result}))
+    return samples
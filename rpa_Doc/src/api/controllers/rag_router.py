@@ -1,8 +1,16 @@
 #src/api/controllers/rag_router.py
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Optional
+import json
 import logging
 
-from src.api.models.schemas import QuestionRequest, QuestionResponse
+from src.api.models.schemas import (
+    QuestionRequest, QuestionResponse, JobResponse, HistoryPage,
+    BatchRetrieveRequest, BatchRetrieveResponse, RetrievalResult, ReferenceDetail
+)
+from src.api.services.job_service import JobService
 from src.api.services.rag_service import RAGService
 from src.repository.log_repository import LogRepository
 
@@ -12,24 +20,23 @@ logger = logging.getLogger("rag")
 router = APIRouter(prefix="/rag", tags=["RAG"])
 
 rag_service = RAGService()
+job_service = JobService(rag_service)
 log_repo = LogRepository()
 
 @router.post("/ask", response_model=QuestionResponse)
-def ask_question(request: QuestionRequest):
+async def ask_question(request: QuestionRequest):
     try:
         # 1. เรียกการทำงาน (จะมีการประมวลผลผ่านคิว Ollama)
-        answer = rag_service.ask_question(request.question)
-        
-        # 2. ดึง Log ล่าสุดมาเพื่อส่งกลับข้อมูลอ้างอิงและ Domain
-        last_log = log_repo.get_last_log() or {}
-        
-        # 3. จัดโครงสร้างข้อมูลส่งกลับตาม QuestionResponse Schema
+        result = await rag_service.ask_question(request.question, request.year_from, request.year_to)
+
+        # 2. จัดโครงสร้างข้อมูลส่งกลับตาม QuestionResponse Schema
         return QuestionResponse(
-            answer=answer,
-            main_reference=last_log.get("main_reference"),
-            refs=last_log.get("refs", []),
-            domain=last_log.get("domain", "ทั่วไป"),
-            status=last_log.get("status", "success")
+            answer=result.answer,
+            main_reference=result.main_reference,
+            refs=result.refs,
+            domain=result.domain,
+            status=result.status,
+            timings=result.timings
         )
     except HTTPException as he:
         # ถ้าเป็น Error ที่ตั้งใจส่งออกมาจาก Service (เช่น 503 Timeout) ให้ส่งต่อไปเลย
@@ -39,6 +46,116 @@ def ask_question(request: QuestionRequest):
         logger.error(f"Router error: {str(e)}")
         raise HTTPException(status_code=500, detail="เกิดข้อผิดพลาดภายในระบบกรุณาลองใหม่")
 
-@router.get("/history")
-def get_history():
-    return log_repo.get_all_logs()
\ No newline at end of file
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest, http_request: Request):
+    """
+    ถามคำถามแบบ Server-Sent Events: ส่ง event "refs" ก่อน แล้วตามด้วย "token" ทีละส่วน และ "done"
+    ถ้า client ตัดการเชื่อมต่อ จะยกเลิกการ generate ที่ Ollama ทันที
+    """
+    events = rag_service.stream_question(request.question, request.year_from, request.year_to)
+    # event แรก (refs) ดึงก่อนเริ่มตอบ เพื่อให้ Error ก่อนเริ่ม stream (เช่น 503 คิวเต็ม) ตอบเป็น HTTP status ปกติ
+    try:
+        first = await events.__anext__()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Router error: {str(e)}")
+        raise HTTPException(status_code=500, detail="เกิดข้อผิดพลาดภายในระบบกรุณาลองใหม่")
+
+    async def event_stream():
+        try:
+            yield _sse(*first)
+            async for event, data in events:
+                if await http_request.is_disconnected():
+                    logger.info("Stream client disconnected")
+                    break
+                yield _sse(event, data)
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(request: QuestionRequest):
+    """ส่งคำถามเข้าคิวแล้วคืน job ID ทันที (ใช้กับคำถามที่ตอบนานเกินกว่า proxy จะรอได้)"""
+    return await job_service.submit(request.question, request.year_from, request.year_to)
+
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """สถานะงาน, ลำดับคิว, คำตอบบางส่วน และผลลัพธ์สุดท้าย (result) เมื่อเสร็จ"""
+    job = await job_service.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ไม่พบงานนี้")
+    return job
+
+@router.post("/retrieve/batch", response_model=BatchRetrieveResponse)
+def retrieve_batch(request: BatchRetrieveRequest):
+    """ค้นหาเอกสารอ้างอิงของหลายคำถามพร้อมกัน (Retrieval อย่างเดียว ไม่เรียก LLM)"""
+    try:
+        retrieval = rag_service.retrieval
+        top_k = request.top_k or retrieval.top_k
+        # ดึง passage เผื่อไว้ แล้วรวมเป็นรายเอกสาร
+        batch_hits = [
+            retrieval.dedupe_by_document(hits, top_k)
+            for hits in retrieval.retrieve_hits_many(
+                request.questions, max(top_k * 4, retrieval.passage_k), request.year_from, request.year_to
+            )
+        ]
+    except Exception as e:
+        logger.error(f"Batch retrieval error: {str(e)}")
+        raise HTTPException(status_code=500, detail="เกิดข้อผิดพลาดภายในระบบกรุณาลองใหม่")
+
+    return BatchRetrieveResponse(results=[
+        RetrievalResult(
+            question=q,
+            refs=[
+                ReferenceDetail(title=h["doc"]["title"], score=round(h["score"], 4), is_primary=i == 0)
+                for i, h in enumerate(hits)
+            ]
+        )
+        for q, hits in zip(request.questions, batch_hits)
+    ])
+
+@router.get("/queue")
+def get_queue_stats():
+    """สถานะคิวงาน Ollama: ความลึกคิว, งานที่กำลังทำ, เวลารอ, คำถามซ้ำที่รวมเป็นงานเดียว, buffer ของ Log"""
+    return {
+        **rag_service.llm.scheduler.stats(), **rag_service.inflight_stats(), **job_service.stats(),
+        "log_sink": rag_service.log_sink.stats()
+    }
+
+@router.get("/cache")
+def get_cache_stats():
+    """สถิติ Cache คำตอบ: hit/miss, จำนวนรายการใน Memory/ดิสก์"""
+    if rag_service.cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **rag_service.cache.stats()}
+
+@router.get("/history", response_model=HistoryPage)
+def get_history(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[int] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    domain: Optional[str] = None,
+    status: Optional[str] = None,
+    main_reference: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|summary)$"),
+):
+    """
+    ประวัติการถาม-ตอบ ใหม่ไปเก่า ทีละหน้า: ส่ง next_cursor กลับมาเป็น cursor เพื่อดึงหน้าถัดไป
+    view=summary ไม่ส่งคำตอบและรายการอ้างอิงฉบับเต็ม
+    """
+    items, next_cursor = log_repo.query(
+        limit=limit, cursor=cursor,
+        since=since.timestamp() if since else None, until=until.timestamp() if until else None,
+        summary=view == "summary", domain=domain, status=status, main_reference=main_reference
+    )
+    return HistoryPage(items=items, next_cursor=next_cursor)
\ No newline at end of file
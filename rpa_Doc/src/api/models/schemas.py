@@ -1,9 +1,14 @@
 # src/api/models/schemas.py
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import RAG_CONFIG
 
 class QuestionRequest(BaseModel):
     question: str
+    # กรองช่วงปี พ.ศ. ของเอกสาร (ค้นเฉพาะ shard ที่อยู่ในช่วง)
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
 
 class ReferenceDetail(BaseModel):
     title: str
@@ -16,6 +21,40 @@ class QuestionResponse(BaseModel):
     refs: List[ReferenceDetail]
     domain: str
     status: str = "success"
+    # เวลาแต่ละขั้นตอน (ms) เช่น retrieval, context, queue_wait, generation, total
+    timings: Optional[Dict[str, float]] = None
+
+class JobResponse(BaseModel):
+    job_id: str
+    # queued / running / succeeded / failed
+    status: str
+    question: str
+    created_at: str
+    updated_at: str
+    queue_position: Optional[int] = None
+    partial_answer: Optional[str] = None
+    result: Optional[QuestionResponse] = None
+    error: Optional[str] = None
+
+class BatchRetrieveRequest(BaseModel):
+    # จำกัดขนาดงานต่อ Request (หนึ่ง Request ถือ worker ไว้ตลอดการคำนวณ)
+    questions: List[str] = Field(min_length=1, max_length=RAG_CONFIG["batch_max_questions"])
+    top_k: Optional[int] = Field(None, ge=1, le=RAG_CONFIG["batch_max_top_k"])
+    year_from: Optional[int] = None
+    year_to: Optional[int] = None
+
+class RetrievalResult(BaseModel):
+    question: str
+    refs: List[ReferenceDetail]
+
+class BatchRetrieveResponse(BaseModel):
+    results: List[RetrievalResult]
+
+class HistoryPage(BaseModel):
+    # log ใหม่ไปเก่า แต่ละรายการมี id (ใช้เป็น cursor)
+    items: List[Dict[str, Any]]
+    # ส่งเป็น cursor เพื่อดึงหน้าถัดไป (None = หมดแล้ว)
+    next_cursor: Optional[int] = None
 
 class ScrapeRequest(BaseModel):
     stage: int
\ No newline at end of file
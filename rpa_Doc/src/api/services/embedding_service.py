@@ -0,0 +1,95 @@
+import logging
+import threading
+from typing import List, Optional
+import httpx
+import numpy as np
+import requests
+from src.config.settings import DENSE_CONFIG
+from src.core.ollama_backends import get_backend_pool, is_backend_failure
+from src.core.ollama_client import get_ollama_client
+
+logger = logging.getLogger("rag.embedding")
+
+
+class EmbeddingService:
+    """
+    เรียก Ollama /api/embed เพื่อแปลงข้อความเป็น Dense Vector (ส่งเป็น batch)
+    - embed_query_async: คำถามตอนให้บริการ ผ่าน httpx client ที่ใช้ร่วมกัน (ไม่กิน thread ของ Retrieval ระหว่างรอ)
+    - embed: งาน sync (สร้าง Index, batch, benchmark) ใช้ requests.Session แยกต่อ thread
+    """
+
+    def __init__(self, base_url: Optional[str] = None):
+        # base_url = เรียกเครื่องนี้ตรงๆ (ใช้ตอนสร้าง Index offline)
+        # None = เลือกเครื่องจาก BackendPool และนับ error ร่วมกับงาน generate (เครื่องที่ล่มถูกข้าม)
+        self.base_url = base_url.rstrip("/") if base_url else None
+        self.backends = None if base_url else get_backend_pool()
+        self.model = DENSE_CONFIG["model"]
+        self.batch_size = DENSE_CONFIG["batch_size"]
+        self.timeout = (10, DENSE_CONFIG["timeout"])
+        # embedding คำถามต้องเร็ว: ช้ากว่านี้ข้าม dense ไปเลยดีกว่าให้ผู้ใช้รอ
+        self.query_timeout = DENSE_CONFIG["query_timeout"]
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def embed(self, texts: List[str], timeout: Optional[float] = None) -> np.ndarray:
+        """Embed ข้อความ 1 batch คืน float32 matrix (len(texts) x dim) timeout = เวลาอ่านผลสูงสุด (วินาที)"""
+        timeout = (min(self.timeout[0], timeout), timeout) if timeout else self.timeout
+        if self.backends is None:
+            return self._post(self.base_url, texts, timeout)
+        backend = self.backends.pick()
+        try:
+            vectors = self._post(backend.url, texts, timeout)
+        except requests.RequestException as e:
+            if _is_backend_failure(e):
+                self.backends.report_failure(backend, e)
+            raise
+        self.backends.report_success(backend)
+        return vectors
+
+    def embed_query(self, question: str) -> np.ndarray:
+        return self.embed([question], self.query_timeout)[0]
+
+    async def embed_query_async(self, question: str) -> np.ndarray:
+        """Embed คำถามเดียวบน event loop ด้วย httpx client ที่ใช้ร่วมกับการเรียก Ollama อื่นๆ"""
+        backend = self.backends.pick() if self.backends is not None else None
+        url = backend.url if backend is not None else self.base_url
+        try:
+            r = await get_ollama_client().post(
+                f"{url}/api/embed", json=self._body([question]), timeout=httpx.Timeout(self.query_timeout)
+            )
+            r.raise_for_status()
+            vectors = self._parse(r.json(), 1)
+        except httpx.HTTPError as e:
+            if backend is not None and is_backend_failure(e):
+                self.backends.report_failure(backend, e)
+            raise
+        if backend is not None:
+            self.backends.report_success(backend)
+        return vectors[0]
+
+    def _post(self, base_url: str, texts: List[str], timeout) -> np.ndarray:
+        r = self.session.post(f"{base_url}/api/embed", json=self._body(texts), timeout=timeout)
+        r.raise_for_status()
+        return self._parse(r.json(), len(texts))
+
+    def _body(self, texts: List[str]) -> dict:
+        return {"model": self.model, "input": texts, "truncate": True}
+
+    def _parse(self, data: dict, expected: int) -> np.ndarray:
+        embeddings = data.get("embeddings", [])
+        if len(embeddings) != expected:
+            raise ValueError(f"Ollama returned {len(embeddings)} embeddings for {expected} inputs")
+        return np.asarray(embeddings, dtype=np.float32)
+
+
+def _is_backend_failure(e: requests.RequestException) -> bool:
+    """ต่อไม่ได้, timeout หรือ 5xx = เครื่องมีปัญหา"""
+    if isinstance(e, requests.HTTPError):
+        return e.response is not None and e.response.status_code >= 500
+    return isinstance(e, (requests.ConnectionError, requests.Timeout))
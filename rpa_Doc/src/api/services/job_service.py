@@ -0,0 +1,189 @@
+# src/api/services/job_service.py
+"""
+งานถาม-ตอบแบบ asynchronous (/rag/jobs)
+- POST คืน job ID ทันที คำถามถูกประมวลผลใน background (ไม่ถือ HTTP connection ไว้ระหว่างรอ LLM)
+- ผู้เรียก poll สถานะ, ลำดับคิว, คำตอบบางส่วน และผลลัพธ์สุดท้าย
+- งานเก็บใน JobRepository (SQLite) งานที่ค้างอยู่ตอน shutdown จะเริ่มใหม่เมื่อเปิด server
+- การอ่าน/เขียน SQLite ทำใน thread pool ไม่บล็อก event loop ที่ให้บริการ /rag/ask
+"""
+import asyncio
+import functools
+import logging
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from src.config.settings import JOB_CONFIG
+from src.repository.job_repository import ACTIVE_STATUSES, JobRepository
+
+logger = logging.getLogger("rag.jobs")
+
+
+class JobService:
+    def __init__(self, rag_service, repo: Optional[JobRepository] = None):
+        self.rag = rag_service
+        self.repo = repo or JobRepository()
+        self.n_workers = JOB_CONFIG["workers"] or rag_service.llm.scheduler.num_parallel
+        self.priority = JOB_CONFIG["priority"]
+        self.max_pending = JOB_CONFIG["max_pending"]
+        self.flush_interval = JOB_CONFIG["flush_interval"]
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Deque[str] = deque()
+        # คำตอบบางส่วนของงานที่กำลังทำ (อ่านจาก Memory ได้ทันที ดิสก์อัปเดตทุก flush_interval)
+        self._partial: Dict[str, List[str]] = {}
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self):
+        """เรียกตอน startup: ล้างงานเก่า, ใส่งานที่ค้างจากรอบก่อนกลับเข้าคิว แล้วเริ่ม worker"""
+        self._queue = asyncio.Queue()
+        purged = await self._db(self.repo.purge, time.time() - JOB_CONFIG["ttl_seconds"])
+        resumed = await self._db(self.repo.list_active)
+        for job in resumed:
+            # งานที่ถูกตัดกลางทางเริ่มใหม่ทั้งหมด
+            await self._db(self.repo.update, job["id"], status="queued", partial_answer="")
+            self._enqueue(job["id"])
+        if resumed or purged:
+            logger.info(f"Jobs: resumed {len(resumed)}, purged {purged}")
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.n_workers)]
+
+    async def stop(self):
+        for w in self._workers:
+            w.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, question: str, year_from: Optional[int] = None,
+                     year_to: Optional[int] = None) -> Dict[str, Any]:
+        if self._queue is None:
+            raise RuntimeError("JobService is not started")
+        if len(self._pending) >= self.max_pending:
+            raise HTTPException(
+                status_code=503, detail="มีงานรอประมวลผลจำนวนมาก กรุณาลองใหม่ภายหลัง", headers={"Retry-After": "60"}
+            )
+        job_id = uuid.uuid4().hex
+        await self._db(self.repo.create, job_id, question, year_from, year_to)
+        self._enqueue(job_id)
+        return await self.get(job_id)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self._db(self.repo.get, job_id)
+        if job is None:
+            return None
+        live = self._partial.get(job_id)
+        if live is not None:
+            job["partial_answer"] = "".join(live)
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "question": job["question"],
+            "created_at": datetime.fromtimestamp(job["created_at"]).isoformat(),
+            "updated_at": datetime.fromtimestamp(job["updated_at"]).isoformat(),
+            "queue_position": self._position(job_id) if job["status"] == "queued" else None,
+            "partial_answer": job["partial_answer"] or None,
+            "result": job["result"],
+            "error": job["error"],
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {"pending_jobs": len(self._pending), "running_jobs": len(self._partial)}
+
+    # ---------- Internals ----------
+
+    def _enqueue(self, job_id: str):
+        self._pending.append(job_id)
+        self._queue.put_nowait(job_id)
+
+    def _position(self, job_id: str) -> Optional[int]:
+        """
+        ลำดับคิวโดยประมาณ (1 = งานถัดไป) = งานที่รอใน lane ของ Scheduler อยู่แล้ว + ลำดับในคิวของ JobService
+        เป็นค่าต่ำสุด: คำถาม interactive ที่เข้ามาภายหลังได้ทำก่อนงานใน lane bulk
+        """
+        try:
+            index = self._pending.index(job_id)
+        except ValueError:
+            return None
+        return self.rag.llm.scheduler.pending(self.priority) + index + 1
+
+    async def _db(self, func, *args, **kwargs):
+        """เรียก JobRepository ใน thread pool (SQLite commit ไม่บล็อก event loop)"""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                self._pending.remove(job_id)
+            except ValueError:
+                pass
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Job {job_id} worker error")
+
+    async def _run(self, job_id: str):
+        job = await self._db(self.repo.get, job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return
+        await self._db(self.repo.update, job_id, status="running", partial_answer="")
+        parts = self._partial[job_id] = []
+        try:
+            result = await self._answer(job_id, job, parts)
+            await self._db(self.repo.update, job_id, status="succeeded", partial_answer=result["answer"], result=result)
+        except asyncio.CancelledError:
+            # shutdown: สถานะยังเป็น running งานจะเริ่มใหม่ตอน start ครั้งถัดไป
+            raise
+        except HTTPException as he:
+            await self._db(self.repo.update, job_id, status="failed", partial_answer="".join(parts), error=str(he.detail))
+        except Exception as e:
+            logger.exception(f"Job {job_id} failed")
+            await self._db(self.repo.update, job_id, status="failed", partial_answer="".join(parts), error=str(e))
+        finally:
+            self._partial.pop(job_id, None)
+
+    async def _answer(self, job_id: str, job: Dict[str, Any], parts: List[str]) -> Dict[str, Any]:
+        """ประมวลผลคำถามผ่าน stream_question คืนผลตามรูปแบบ QuestionResponse"""
+        while True:
+            refs: Dict[str, Any] = {}
+            done: Dict[str, Any] = {}
+            last_flush = time.monotonic()
+            # ไม่มี deadline ในคิว Scheduler: งานรออยู่ในคิวของ JobService อยู่แล้ว
+            events = self.rag.stream_question(
+                job["question"], job["year_from"], job["year_to"], priority=self.priority, deadline=0
+            )
+            try:
+                async for event, data in events:
+                    if event == "refs":
+                        refs = data
+                    elif event == "token":
+                        parts.append(data["text"])
+                        if time.monotonic() - last_flush >= self.flush_interval:
+                            await self._db(self.repo.update, job_id, partial_answer="".join(parts))
+                            last_flush = time.monotonic()
+                    elif event == "done":
+                        done = data
+                    elif event == "error":
+                        raise RuntimeError(data["detail"])
+            except HTTPException as he:
+                # คิว Ollama เต็ม (ก่อนเริ่มตอบ) -> รอตาม Retry-After แล้วลองใหม่
+                if he.status_code != 503 or parts:
+                    raise
+                retry_after = int((he.headers or {}).get("Retry-After", 5))
+                logger.info(f"Job {job_id} waiting {retry_after}s for Ollama queue")
+                await asyncio.sleep(retry_after)
+                continue
+            finally:
+                await events.aclose()
+
+            return {
+                "answer": done.get("answer") or "".join(parts).strip(),
+                "main_reference": refs.get("main_reference"),
+                "refs": refs.get("refs", []),
+                "domain": refs.get("domain", "ทั่วไป"),
+                "status": done.get("status", "success"),
+            }
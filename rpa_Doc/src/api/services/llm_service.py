@@ -1,52 +1,299 @@
-import requests
+import asyncio
+import json
+import time
+import httpx
 import logging
-from typing import Dict, Any
-from src.config.settings import RAG_CONFIG, OLLAMA_BASE_URL
-from src.core.ollama_queue import OllamaQueue
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional
+from src.config.settings import RAG_CONFIG, OLLAMA_HTTP_CONFIG
+from fastapi import HTTPException
+from src.core.ollama_backends import Backend, NoBackendAvailableError, get_backend_pool, is_backend_failure
+from src.core.metrics import TOKEN_RATE_BUCKETS, get_metrics
+from src.core.ollama_client import get_ollama_client
+from src.core.ollama_queue import DeadlineExceededError, QueueFullError, get_ollama_scheduler
+from src.core.token_estimator import TokenEstimator
 
 logger = logging.getLogger("rag.llm")
 
+TOKENS_PER_SECOND = get_metrics().histogram(
+    "ollama_generation_tokens_per_second", "Generation speed reported by Ollama (eval_count / eval_duration)",
+    TOKEN_RATE_BUCKETS, label="backend"
+)
+GENERATED_TOKENS = get_metrics().counter(
+    "ollama_generated_tokens_total", "Tokens generated by Ollama (eval_count)", label="backend"
+)
+
+# เปลี่ยนทุกครั้งที่แก้ build_document_prompt (คำตอบใน Cache เดิมจะไม่ถูกใช้)
+PROMPT_TEMPLATE_VERSION = 2
+
+# คำสั่งคงที่อยู่ต้น prompt เสมอ (ไม่มีส่วนที่เปลี่ยนตามคำถาม) ทุก Request จึงขึ้นต้นเหมือนกันทุกตัวอักษร
+# Ollama ใช้ KV cache ของส่วนนี้ซ้ำได้ ไม่ต้องประมวลผลใหม่ทุกครั้ง
+PROMPT_PREFIX = (
+    "คุณคือผู้เชี่ยวชาญด้านกฎหมายภาษี สรุปคำตอบจากเอกสารอ้างอิงที่ให้มาเท่านั้น\n"
+    "หากในเอกสารกล่าวถึงการยกเว้นภาษีหรือเงื่อนไขใดๆ ให้ระบุมาให้ชัดเจน\n"
+    "ตอบโดยอ้างอิงเลขที่หนังสือของเอกสารที่ใช้ด้วย\n\n"
+    "ข้อมูลอ้างอิง:\n"
+)
+
+# คำที่บอกชนิดคำถาม (ใช้เลือก num_predict)
+_EXPLAIN_WORDS = ("อย่างไร", "ยังไง", "ทำไม", "เพราะอะไร", "ขั้นตอน", "วิธี", "อธิบาย", "เท่าไร", "เท่าใด", "คำนวณ")
+_YES_NO_ENDINGS = ("ไหม", "มั้ย", "หรือไม่", "หรือเปล่า", "ใช่ไหม", "ได้ไหม")
+
+
+def classify_question(question: str) -> str:
+    """ชนิดคำถาม: "explain" (ต้องอธิบาย/คำนวณ), "yes_no" (ถามว่าใช่/ได้หรือไม่) หรือ "default" """
+    q = question.strip().rstrip("?？ ")
+    if any(w in q for w in _EXPLAIN_WORDS):
+        return "explain"
+    if q.endswith(_YES_NO_ENDINGS):
+        return "yes_no"
+    return "default"
+
+
+def _record_eval(backend: Backend, data: Dict[str, Any]):
+    """บันทึกความเร็ว generate จากสถิติที่ Ollama ส่งมาพร้อมคำตอบ (eval_duration เป็น ns)"""
+    count, duration = data.get("eval_count"), data.get("eval_duration")
+    if count and duration:
+        GENERATED_TOKENS.inc(count, backend.url)
+        TOKENS_PER_SECOND.observe(count / (duration / 1e9), backend.url)
+
+
 class LLMService:
     def __init__(self):
-        self.ollama_url = f"{OLLAMA_BASE_URL}/api/generate"
         self.model = RAG_CONFIG["model"]
-        self.connect_timeout = 10
-        self.read_timeout = 240
-        self.ollama_queue = OllamaQueue()
-
-    def call_ollama(self, prompt: str) -> str:
-        def _request():
-            r = requests.post(
-                self.ollama_url,
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.1,
-                        "num_ctx": 1024,
-                        "num_predict": 512,
-                        "num_thread": 4
-                    }
-                },
-                timeout=(self.connect_timeout, self.read_timeout)
+        self.connect_timeout = OLLAMA_HTTP_CONFIG["connect_timeout"]
+        self.read_timeout = OLLAMA_HTTP_CONFIG["read_timeout"]
+        self.num_ctx = RAG_CONFIG["num_ctx"]
+        self.max_num_ctx = max(RAG_CONFIG["max_num_ctx"], self.num_ctx)
+        self.num_predict = RAG_CONFIG["num_predict"]
+        self.num_predict_by_type = RAG_CONFIG["num_predict_by_type"]
+        self.keep_alive = RAG_CONFIG["keep_alive"]
+        self.token_estimator = TokenEstimator.for_model(self.model)
+        self.scheduler = get_ollama_scheduler()
+        self.backends = get_backend_pool()
+
+    def num_predict_for(self, question: str) -> int:
+        return self.num_predict_by_type.get(classify_question(question), self.num_predict)
+
+    def num_ctx_for(self, prompt_tokens: int, num_predict: int) -> int:
+        """ขั้น num_ctx ที่เล็กที่สุดที่พอสำหรับ prompt + คำตอบ (เผื่อความคลาดเคลื่อนของการประมาณ 10%)"""
+        need = int((prompt_tokens + num_predict) * 1.1)
+        num_ctx = self.num_ctx
+        while num_ctx < need and num_ctx < self.max_num_ctx:
+            num_ctx *= 2
+        if need > self.max_num_ctx:
+            logger.warning(f"Prompt needs ~{need} tokens, more than max_num_ctx {self.max_num_ctx}")
+        return min(num_ctx, self.max_num_ctx)
+
+    def generation_options(self, prompt: str, question: str = "") -> Dict[str, Any]:
+        """
+        options ของโมเดลสำหรับ prompt นี้ (ไม่รวม num_thread ซึ่งขึ้นกับเครื่อง)
+        ทุกค่ามาจาก prompt/คำถามเท่านั้น จึงใช้เป็นส่วนหนึ่งของ key ใน Cache ได้
+        """
+        num_predict = self.num_predict_for(question)
+        return {
+            "temperature": 0.1,
+            "num_ctx": self.num_ctx_for(self.token_estimator.estimate(prompt), num_predict),
+            "num_predict": num_predict,
+        }
+
+    def _payload(self, prompt: str, stream: bool, options: Dict[str, Any], backend: Backend) -> Dict[str, Any]:
+        options = dict(options)
+        if backend.num_thread:
+            options["num_thread"] = backend.num_thread
+        return {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+            "options": options,
+        }
+
+    def _timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    async def _on_backend(self, send: Callable[[Backend], Awaitable], backend: Optional[Backend] = None):
+        """
+        เรียก send(backend) บนเครื่องที่ว่างที่สุดใน BackendPool
+        ถ้าต่อเครื่องไม่ได้หรือได้ 5xx (ยังไม่มี output ออกไป) จะลองเครื่องถัดไปจนครบทุกเครื่อง
+        """
+        tried = []
+        while True:
+            current = None
+            try:
+                async with self.backends.lease(backend, exclude=tried) as current:
+                    return await send(current)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.HTTPStatusError) as e:
+                retryable = not isinstance(e, httpx.HTTPStatusError) or e.response.status_code >= 500
+                if not retryable or current is None or backend is not None \
+                        or len(tried) + 1 >= len(self.backends.backends):
+                    raise
+                logger.warning(f"Ollama backend {current.url} unreachable ({e}), retrying on another backend")
+                tried.append(current)
+
+    async def call_ollama(self, prompt: str, priority: str = "interactive", options: Optional[Dict[str, Any]] = None,
+                          timings: Optional[Dict[str, float]] = None) -> str:
+        """timings (ถ้าส่งมา) จะได้เวลารอคิว "queue_wait" และเวลา generate "generation" เป็น ms"""
+        options = options or self.generation_options(prompt)
+        enqueued = time.perf_counter()
+        started: List[float] = []
+
+        async def _send(backend: Backend):
+            if not started:
+                started.append(time.perf_counter())
+            r = await get_ollama_client().post(
+                f"{backend.url}/api/generate", json=self._payload(prompt, False, options, backend), timeout=self._timeout()
             )
             r.raise_for_status()
-            return r.json().get("response", "").strip()
+            data = r.json()
+            _record_eval(backend, data)
+            return data.get("response", "").strip()
 
-        # submit returns result_q.get() directly in our src/core/ollama_queue.py
-        result = self.ollama_queue.submit(_request)
-        if isinstance(result, Exception):
-            logger.error(f"LLM Error: {result}")
-            raise result
-        return result
+        try:
+            answer = await self.scheduler.run(lambda: self._on_backend(_send), priority=priority)
+            if timings is not None and started:
+                timings["queue_wait"] = round((started[0] - enqueued) * 1000, 1)
+                timings["generation"] = round((time.perf_counter() - started[0]) * 1000, 1)
+            return answer
+        except (QueueFullError, DeadlineExceededError, NoBackendAvailableError) as e:
+            raise self._overloaded(e)
+        except Exception as e:
+            logger.error(f"LLM Error: {e}")
+            if is_backend_failure(e):
+                # ลองครบทุกเครื่องแล้วยังต่อไม่ได้/ได้ 5xx
+                raise self._overloaded(e)
+            raise
+
+    def stream_ollama(self, prompt: str, priority: str = "interactive", options: Optional[Dict[str, Any]] = None,
+                      deadline: Optional[float] = None,
+                      timings: Optional[Dict[str, float]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        เรียก Ollama แบบ stream (NDJSON) ผ่าน Scheduler เดียวกับ call_ollama แล้วส่งต่อทีละ chunk
+        งานถูกใส่คิวทันทีที่เรียก (คิวเต็ม = HTTPException 503 ก่อนเริ่ม stream)
+        ถ้าผู้เรียกเลิกอ่าน (client ตัดการเชื่อมต่อ) จะยกเลิกงานและปิด connection ไปยัง Ollama เพื่อหยุดการ generate
+        timings (ถ้าส่งมา) ได้ "queue_wait" และ "generation" เหมือน call_ollama เมื่อ stream จบครบ
+        """
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+        options = options or self.generation_options(prompt)
+        enqueued = time.perf_counter()
+        started: List[float] = []
+
+        async def _send(backend: Backend):
+            if not started:
+                started.append(time.perf_counter())
+            async with get_ollama_client().stream(
+                "POST", f"{backend.url}/api/generate", json=self._payload(prompt, True, options, backend),
+                timeout=self._timeout()
+            ) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    events.put_nowait(("chunk", chunk))
+                    if chunk.get("done"):
+                        _record_eval(backend, chunk)
+                        break
+
+        async def _stream():
+            try:
+                await self._on_backend(_send)
+                if timings is not None and started:
+                    timings["queue_wait"] = round((started[0] - enqueued) * 1000, 1)
+                    timings["generation"] = round((time.perf_counter() - started[0]) * 1000, 1)
+                events.put_nowait(("end", None))
+            except asyncio.CancelledError:
+                logger.info("LLM stream cancelled by client")
+                raise
+            except Exception as e:
+                unavailable = isinstance(e, NoBackendAvailableError) or is_backend_failure(e)
+                events.put_nowait(("error", self._overloaded(e) if unavailable else e))
+
+        try:
+            job = self.scheduler.enqueue_async(_stream, priority=priority, deadline=deadline)
+        except QueueFullError as e:
+            raise self._overloaded(e)
+
+        def _on_done(f):
+            # งานหมด deadline ก่อนได้เริ่ม (callback ถูกเรียกจาก worker thread)
+            if not f.cancelled() and isinstance(f.exception(), DeadlineExceededError):
+                loop.call_soon_threadsafe(events.put_nowait, ("error", self._overloaded(f.exception())))
+
+        job.future.add_done_callback(_on_done)
+        return self._drain_stream(events, job)
+
+    async def _drain_stream(self, events: asyncio.Queue, job):
+        finished = False
+        try:
+            while True:
+                kind, value = await events.get()
+                if kind == "end":
+                    finished = True
+                    return
+                if kind == "error":
+                    logger.error(f"LLM Error: {value}")
+                    raise value
+                yield value
+        finally:
+            # งานจบเองแล้วไม่ต้องยกเลิก (ไม่งั้น Scheduler จะนับเป็นงานที่ล้มเหลว)
+            if not finished:
+                job.cancel()
+
+    def _overloaded(self, e: Exception) -> HTTPException:
+        """คิว Ollama เต็ม/รอนานเกิน deadline/ไม่มีเครื่องที่ใช้ได้/ทุกเครื่องต่อไม่ได้ -> 503 พร้อม Retry-After"""
+        logger.warning(f"LLM overloaded: {e}")
+        if isinstance(e, NoBackendAvailableError) or is_backend_failure(e):
+            retry_after = self.backends.probe_interval
+        else:
+            retry_after = getattr(e, "retry_after", None) or self.scheduler.stats()["wait_seconds"]["p50"] or 5
+        return HTTPException(
+            status_code=503,
+            detail="ระบบกำลังประมวลผลคำถามจำนวนมาก กรุณาลองใหม่ภายหลัง",
+            headers={"Retry-After": str(max(1, int(retry_after)))}
+        )
+
+    def context_budget(self, question: str) -> int:
+        """
+        งบ token สูงสุดสำหรับ context = max_num_ctx - num_predict - ส่วนคงที่ของ prompt (เผื่อไว้ 10%)
+        context จริงที่สั้นกว่างบจะได้ num_ctx ขั้นที่เล็กลงตาม generation_options
+        """
+        if RAG_CONFIG.get("context_tokens"):
+            return RAG_CONFIG["context_tokens"]
+        overhead = self.token_estimator.estimate(self.build_document_prompt("", question))
+        return max(int(self.max_num_ctx / 1.1 - self.num_predict_for(question) - overhead), 64)
 
     def build_document_prompt(self, context: str, question: str) -> str:
         return (
-            "คุณคือผู้เชี่ยวชาญด้านกฎหมายภาษี สรุปคำตอบจากเอกสารอ้างอิงที่ให้มาเท่านั้น\n"
-            "หากในเอกสารกล่าวถึงการยกเว้นภาษีหรือเงื่อนไขใดๆ ให้ระบุมาให้ชัดเจน\n"
-            "ข้อมูลอ้างอิง:\n"
+            f"{PROMPT_PREFIX}"
             f"{context}\n\n"
             f"คำถาม: {question}\n"
-            "คำตอบ (อ้างอิงเลขที่หนังสือด้วย):"
+            "คำตอบ:"
         )
+
+    async def warm_up(self):
+        """
+        โหลดโมเดลไว้ล่วงหน้าและประมวลผล PROMPT_PREFIX ให้อยู่ใน KV cache ของทุกเครื่อง (เรียกตอน startup)
+        ใช้ num_ctx ขั้นแรก (ขนาดที่คำถามส่วนใหญ่ใช้ ถ้า num_ctx ต่างกัน Ollama จะโหลดโมเดลใหม่)
+        """
+        options = {"temperature": 0.1, "num_ctx": self.num_ctx, "num_predict": 1}
+
+        async def _send(backend: Backend):
+            r = await get_ollama_client().post(
+                f"{backend.url}/api/generate", json=self._payload(PROMPT_PREFIX, False, options, backend),
+                timeout=self._timeout()
+            )
+            r.raise_for_status()
+            return r.json()
+
+        async def _warm(backend: Backend):
+            try:
+                data = await self.scheduler.run(lambda: self._on_backend(_send, backend), priority="bulk", deadline=0)
+                load_ms = (data.get("load_duration") or 0) / 1e6
+                logger.info(f"LLM warm-up done: {self.model} on {backend.url} "
+                            f"(load {load_ms:.0f} ms, keep_alive {self.keep_alive})")
+            except Exception as e:
+                logger.warning(f"LLM warm-up failed on {backend.url}: {e}")
+
+        await asyncio.gather(*(_warm(b) for b in self.backends.backends))
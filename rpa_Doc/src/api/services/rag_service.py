@@ -1,39 +1,115 @@
+import asyncio
+import functools
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import numpy as np
 from fastapi import HTTPException
-from src.repository.log_repository import LogRepository
-from src.api.services.llm_service import LLMService
+from src.config.settings import CACHE_CONFIG, RAG_CONFIG
+from src.core.answer_cache import AnswerCache, make_cache_key, normalize_question
+from src.core.metrics import get_metrics
+from src.repository.log_sink import get_log_sink
+from src.api.services.llm_service import PROMPT_TEMPLATE_VERSION, LLMService
 from src.api.services.retrieval_service import RetrievalService
 
 logger = logging.getLogger("rag")
 
+STAGE_SECONDS = get_metrics().histogram(
+    "rag_stage_duration_seconds", "Time spent per stage of answering a question", label="stage"
+)
+REQUEST_SECONDS = get_metrics().histogram(
+    "rag_request_duration_seconds", "End-to-end time of a question by answer source", label="answer_source"
+)
+
+
+@dataclass
+class PreparedQuestion:
+    """ผลของขั้นตอนก่อนเรียก LLM"""
+    refs: List[Dict]
+    prompt: Optional[str]
+    options: Optional[Dict] = None
+    cache_key: Optional[str] = None
+    index_version: Optional[str] = None
+    cached: Optional[Dict] = None
+    # เวลาแต่ละขั้นตอน (ms)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class AnswerResult:
+    """ผลของ ask_question (Router ส่งกลับได้ทันที ไม่ต้องอ่าน Log ซ้ำ)"""
+    answer: str
+    refs: List[Dict]
+    main_reference: Optional[str]
+    domain: str
+    status: str
+    answer_source: str
+    # เวลาแต่ละขั้นตอน (ms): retrieval, context, cache_lookup, queue_wait, generation, log, total
+    timings: Dict[str, float]
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def _log_store_error(future):
+    if future.exception() is not None:
+        logger.error(f"Answer cache write failed: {future.exception()}")
+
+
 class RAGService:
     def __init__(self):
-        self.log_repo = LogRepository()
+        # Log ถูกเขียนเป็น batch ใน thread เบื้องหลัง (Request ไม่ต้องรอดิสก์)
+        self.log_sink = get_log_sink()
+        self.log_repo = self.log_sink.repo
         self.llm = LLMService()
         self.retrieval = RetrievalService()
+        self.cache = AnswerCache() if CACHE_CONFIG["enabled"] else None
+        if self.cache is not None:
+            # ลบคำตอบของ Index เวอร์ชันเก่าครั้งเดียวเมื่อโหลดเวอร์ชันใหม่
+            self.retrieval.index_holder.on_load(lambda snapshot: self.cache.purge(snapshot.version))
+        # งาน generate ที่กำลังทำอยู่ แยกตาม key (ใช้บน event loop เดียว)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.singleflight = {"leaders": 0, "coalesced": 0}
+        self.executor = ThreadPoolExecutor(
+            max_workers=RAG_CONFIG["retrieval_workers"] or os.cpu_count(), thread_name_prefix="retrieval"
+        )
+        # เขียน Cache คำตอบลงดิสก์เบื้องหลัง (thread เดียว: SQLite เขียนได้ทีละ transaction อยู่แล้ว)
+        self.cache_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
 
-    def ask_question(self, question: str) -> str:
+    async def ask_question(self, question: str, year_from: Optional[int] = None,
+                           year_to: Optional[int] = None) -> AnswerResult:
         start_time = datetime.now()
+        started = time.perf_counter()
         try:
             domain = self._detect_domain(question)
-            
-            # 1. Retrieval
-            chunks, hits = self.retrieval.retrieve_hits(question)
-            
-            if not hits:
-                return self._finalize(start_time, question, domain, [], "ไม่พบข้อมูลในฐานข้อมูล", "fail", "document")
-
-            # 2. Context Construction
-            context, detailed_refs = self.retrieval.build_context(hits)
-            
-            # 3. Prompt Construction
-            prompt = self.llm.build_document_prompt(context, question)
-
-            # 4. LLM Call
-            answer = self.llm.call_ollama(prompt)
-            
-            return self._finalize(start_time, question, domain, detailed_refs, answer, "success", "document")
+
+            # 1-3. Retrieval, Context, Prompt, Cache lookup (CPU-bound: แยกไปทำใน executor)
+            prepared = await self._prepare_async(question, year_from, year_to)
+            timings = prepared.timings
+
+            if prepared.prompt is None:
+                return self._finalize(
+                    start_time, question, domain, [], "ไม่พบข้อมูลในฐานข้อมูล", "fail", "document", timings, started
+                )
+
+            if prepared.cached is not None:
+                return self._finalize(
+                    start_time, question, domain, prepared.cached["refs"], prepared.cached["answer"], "success", "cache",
+                    timings, started
+                )
+
+            # 4. LLM Call (คำถามเดียวกันที่กำลังประมวลผลอยู่ จะรอผลจากงานเดิมแทนการเข้าคิวใหม่)
+            answer, coalesced = await self._generate_once(prepared)
+
+            return self._finalize(
+                start_time, question, domain, prepared.refs, answer, "success", "coalesced" if coalesced else "document",
+                timings, started
+            )
 
         except HTTPException: 
             raise
@@ -41,10 +117,165 @@ class RAGService:
             logger.exception("RAG Error")
             raise HTTPException(status_code=500, detail="ระบบขัดข้อง")
 
+    async def stream_question(self, question: str, year_from: Optional[int] = None, year_to: Optional[int] = None,
+                              priority: str = "interactive",
+                              deadline: Optional[float] = None) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        เหมือน ask_question แต่คืนเป็นลำดับ event: ("refs", ...) ก่อน ตามด้วย ("token", ...) และ ("done", ...)
+        บันทึก Log เมื่อ stream จบ หรือเมื่อผู้เรียกเลิกอ่านกลางทาง (status = "cancelled")
+        priority/deadline ส่งต่อให้ Scheduler (งานเบื้องหลังอย่าง /rag/jobs ใช้ lane bulk)
+        """
+        start_time = datetime.now()
+        started = time.perf_counter()
+        domain = self._detect_domain(question)
+        try:
+            prepared = await self._prepare_async(question, year_from, year_to)
+        except Exception:
+            logger.exception("RAG Error")
+            raise HTTPException(status_code=500, detail="ระบบขัดข้อง")
+        detailed_refs = prepared.cached["refs"] if prepared.cached is not None else prepared.refs
+        main_ref = next((r["title"] for r in detailed_refs if r.get("is_primary")), None)
+        refs_event = {"main_reference": main_ref, "refs": detailed_refs, "domain": domain}
+
+        if prepared.prompt is None:
+            answer = "ไม่พบข้อมูลในฐานข้อมูล"
+            self._finalize(start_time, question, domain, [], answer, "fail", "document", prepared.timings,
+                           started)
+            yield "refs", refs_event
+            yield "done", {"status": "fail", "answer": answer}
+            return
+
+        if prepared.cached is not None:
+            answer = prepared.cached["answer"]
+            self._finalize(start_time, question, domain, detailed_refs, answer, "success", "cache", prepared.timings,
+                           started)
+            yield "refs", refs_event
+            yield "token", {"text": answer}
+            yield "done", {"status": "success", "cached": True}
+            return
+
+        # ใส่คิวก่อนส่ง refs: ถ้าคิวเต็มจะได้ 503 + Retry-After แทน stream ที่ไม่มีคำตอบ
+        chunks = self.llm.stream_ollama(prepared.prompt, priority, prepared.options, deadline, prepared.timings)
+        yield "refs", refs_event
+
+        parts: List[str] = []
+        status = "cancelled"
+        try:
+            async for chunk in chunks:
+                if chunk.get("response"):
+                    parts.append(chunk["response"])
+                    yield "token", {"text": chunk["response"]}
+                if chunk.get("done"):
+                    status = "success"
+                    self._store_in_background(prepared, "".join(parts).strip())
+                    yield "done", {
+                        "status": status,
+                        "eval_count": chunk.get("eval_count"),
+                        "eval_duration": chunk.get("eval_duration"),
+                    }
+        except HTTPException as he:
+            status = "error"
+            yield "error", {"detail": he.detail}
+        except Exception:
+            logger.exception("RAG stream error")
+            status = "error"
+            yield "error", {"detail": "ระบบขัดข้อง"}
+        finally:
+            await chunks.aclose()
+            self._finalize(start_time, question, domain, detailed_refs, "".join(parts).strip(), status, "document",
+                           prepared.timings, started)
+
+    async def _generate_once(self, prepared: PreparedQuestion) -> Tuple[str, bool]:
+        """
+        Single-flight: ถ้ามีงาน generate ของ key เดียวกันค้างอยู่ ให้รอผลจากงานนั้น คืน (answer, coalesced)
+        งาน generate แยกเป็น Task ของตัวเอง ผู้เรียกคนแรกยกเลิกไปก็ไม่กระทบคนที่รออยู่
+        """
+        task = self._inflight.get(prepared.cache_key)
+        if task is not None:
+            self.singleflight["coalesced"] += 1
+            waited = time.perf_counter()
+            answer = await asyncio.shield(task)
+            prepared.timings["generation"] = _elapsed_ms(waited)
+            return answer, True
+
+        async def _generate():
+            try:
+                answer = await self.llm.call_ollama(prepared.prompt, options=prepared.options, timings=prepared.timings)
+                self._store_in_background(prepared, answer)
+                return answer
+            finally:
+                self._inflight.pop(prepared.cache_key, None)
+
+        task = asyncio.ensure_future(_generate())
+        self._inflight[prepared.cache_key] = task
+        self.singleflight["leaders"] += 1
+        return await asyncio.shield(task), False
+
+    def inflight_stats(self) -> Dict[str, int]:
+        return {"inflight_questions": len(self._inflight), **self.singleflight}
+
+    async def _run_in_executor(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def _prepare_async(self, question: str, year_from: Optional[int], year_to: Optional[int]) -> PreparedQuestion:
+        """embed คำถามบน event loop (ถ้ามี Dense Index) แล้วทำ _prepare ใน executor"""
+        t = time.perf_counter()
+        q_dense = await self.retrieval.embed_query(normalize_question(question))
+        embed_ms = _elapsed_ms(t)
+        prepared = await self._run_in_executor(self._prepare, question, year_from, year_to, q_dense)
+        if q_dense is not None:
+            prepared.timings["embedding"] = embed_ms
+        return prepared
+
+    def _prepare(self, question: str, year_from: Optional[int], year_to: Optional[int],
+                 q_dense: Optional[np.ndarray] = None) -> PreparedQuestion:
+        """Retrieval + Context + Prompt + ค้น Cache (prompt = None ถ้าไม่พบเอกสาร)"""
+        timings: Dict[str, float] = {}
+        t = time.perf_counter()
+        # ค้นด้วยคำถามที่ normalize แล้ว คำถามที่ต่างกันแค่ช่องว่าง/เครื่องหมายจะได้เอกสารชุดเดียวกัน (ใช้ Cache ร่วมกันได้)
+        chunks, hits = self.retrieval.retrieve_hits(
+            normalize_question(question), year_from, year_to, q_dense=q_dense, embed=False
+        )
+        timings["retrieval"] = _elapsed_ms(t)
+        if not hits:
+            return PreparedQuestion([], None, timings=timings)
+        t = time.perf_counter()
+        context, detailed_refs = self.retrieval.build_context(hits, self.llm.context_budget(question))
+        prompt = self.llm.build_document_prompt(context, question)
+        # num_ctx/num_predict ตามความยาว prompt และชนิดคำถาม
+        prepared = PreparedQuestion(
+            detailed_refs, prompt, self.llm.generation_options(prompt, question), timings=timings
+        )
+        timings["context"] = _elapsed_ms(t)
+
+        # key เดียวกันใช้ทั้ง Cache และ Single-flight
+        prepared.index_version = self.retrieval.index_holder.get().version
+        prepared.cache_key = make_cache_key(
+            question, [h["doc"]["content_hash"] for h in hits],
+            self.llm.model, PROMPT_TEMPLATE_VERSION, prepared.options
+        )
+        if self.cache is not None:
+            t = time.perf_counter()
+            prepared.cached = self.cache.get(prepared.cache_key, prepared.index_version)
+            timings["cache_lookup"] = _elapsed_ms(t)
+        return prepared
+
+    def _store_in_background(self, prepared: PreparedQuestion, answer: str):
+        """บันทึกคำตอบลง Cache โดยไม่ให้ Request รอ SQLite commit"""
+        if self.cache is None or not prepared.cache_key or not answer:
+            return
+        self.cache_writer.submit(self._store, prepared, answer).add_done_callback(_log_store_error)
+
+    def _store(self, prepared: PreparedQuestion, answer: str):
+        self.cache.put(prepared.cache_key, prepared.index_version, {"answer": answer, "refs": prepared.refs})
+
     def _detect_domain(self, q: str) -> str:
         return "ภาษีมูลค่าเพิ่ม" if any(x in q.lower() for x in ["vat", "ภาษีมูลค่าเพิ่ม"]) else "ทั่วไป"
 
-    def _finalize(self, start_time, question, domain, refs, answer, status, source):
+    def _finalize(self, start_time, question, domain, refs, answer, status, source,
+                  timings: Optional[Dict[str, float]] = None, started: Optional[float] = None) -> AnswerResult:
+        """ส่ง Log เข้า LogSink แล้วคืนผลลัพธ์ (Log เป็นผลข้างเคียง ผู้เรียกไม่ต้องอ่านกลับ)"""
+        timings = dict(timings or {})
         main_ref = next((r['title'] for r in refs if r.get('is_primary')), None)
         log_data = {
             "timestamp": start_time.isoformat(), 
@@ -54,7 +285,15 @@ class RAGService:
             "refs": refs, 
             "answer": answer, 
             "status": status, 
-            "answer_source": source
+            "answer_source": source,
+            "timings": timings
         }
-        self.log_repo.save_log(log_data)
-        return answer
\ No newline at end of file
+        t = time.perf_counter()
+        self.log_sink.submit(log_data)
+        timings["log"] = _elapsed_ms(t)
+        for stage, ms in timings.items():
+            STAGE_SECONDS.observe(ms / 1000, stage)
+        if started is not None:
+            timings["total"] = _elapsed_ms(started)
+            REQUEST_SECONDS.observe(timings["total"] / 1000, source)
+        return AnswerResult(answer, refs, main_ref, domain, status, source, timings)
\ No newline at end of file
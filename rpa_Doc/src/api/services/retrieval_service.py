@@ -1,39 +1,200 @@
-from typing import List, Dict, Any, Tuple
-from sklearn.metrics.pairwise import cosine_similarity
-from src.repository.document_repository import DocumentRepository
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from src.config.settings import DENSE_CONFIG, RAG_CONFIG
+from src.core.index_holder import IndexSnapshot, get_index_holder
+from src.core.token_estimator import TokenEstimator
+from src.api.services.embedding_service import EmbeddingService
+
+logger = logging.getLogger("rag.retrieval")
 
 class RetrievalService:
     def __init__(self):
-        self.doc_repo = DocumentRepository()
-        self.top_k = 2
+        # Corpus และ Index ถูกโหลดค้างไว้ใน Memory ระดับ Process (ไม่อ่านไฟล์ใหม่ทุก Request)
+        self.index_holder = get_index_holder()
+        self.embedding = EmbeddingService()
+        self.token_estimator = TokenEstimator.for_model(RAG_CONFIG["model"])
+        self.top_k = 2  # จำนวนเอกสารสูงสุดใน context
+        self.passage_k = RAG_CONFIG["passage_candidates"]
         self.min_similarity = 0.05
 
-    def retrieve_hits(self, question: str) -> Tuple[List[Dict], List[Dict]]:
-        chunks = self.doc_repo.load_documents()
-        vectorizer, matrix = self.doc_repo.get_retriever(chunks)
-        
-        q_vec = vectorizer.transform([question])
-        scores = cosine_similarity(q_vec, matrix).flatten()
-
-        hits = [
-            {"score": float(scores[i]), "doc": chunks[i]}
-            for i in scores.argsort()[::-1][:self.top_k]
-            if scores[i] >= self.min_similarity
+    async def embed_query(self, question: str) -> Optional[np.ndarray]:
+        """
+        Embedding ของคำถามสำหรับ Dense Retrieval (เรียกบน event loop ก่อนส่ง retrieve_hits เข้า executor)
+        None = ไม่มี Dense Index หรือ embed ไม่สำเร็จ (ใช้ TF-IDF อย่างเดียว)
+        """
+        # ยังไม่เคยโหลด Index: ดูจาก config (ไม่โหลด Index บน event loop)
+        snapshot = self.index_holder.peek()
+        if not DENSE_CONFIG["enabled"] or (snapshot is not None and snapshot.dense is None):
+            return None
+        try:
+            return await self.embedding.embed_query_async(question)
+        except Exception as e:
+            logger.warning(f"Dense retrieval skipped: {e}")
+            return None
+
+    def retrieve_hits(self, question: str, year_from: Optional[int] = None, year_to: Optional[int] = None,
+                      q_dense: Optional[np.ndarray] = None, embed: bool = True) -> Tuple[List[Dict], List[Dict]]:
+        """
+        q_dense = embedding ของคำถามที่ได้จาก embed_query แล้ว
+        embed=False = ไม่ embed ที่นี่ (ผู้เรียก embed มาแล้ว หรือ embed ไม่สำเร็จ: ใช้ TF-IDF อย่างเดียว)
+        """
+        snapshot = self.index_holder.get()
+        # ถ้ามี Dense Index ให้ดึงผู้สมัครมากขึ้นจากแต่ละฝั่งก่อน fuse
+        fetch = max(DENSE_CONFIG["candidates"], self.passage_k) if snapshot.dense is not None else self.passage_k
+
+        q_vec = snapshot.vectorizer.transform([question])
+        candidates = []
+        for shard in snapshot.select_shards(year_from, year_to):
+            rows, scores = shard.scorer.top_k(q_vec, fetch, self.min_similarity)
+            candidates.extend({"score": float(s), "doc": shard.chunks[i]} for i, s in zip(rows, scores))
+        sparse_hits = self._merge_hits(candidates, fetch)
+
+        if snapshot.dense is None:
+            return snapshot.chunks, sparse_hits
+
+        if q_dense is None and embed:
+            try:
+                q_dense = self.embedding.embed_query(question)
+            except Exception as e:
+                logger.warning(f"Dense retrieval skipped: {e}")
+        if q_dense is None:
+            return snapshot.chunks, sparse_hits[:self.passage_k]
+        dense_hits = self._dense_hits(snapshot, q_dense, fetch, year_from, year_to)
+        return snapshot.chunks, self._fuse(sparse_hits, dense_hits, self.passage_k)
+
+    def retrieve_hits_many(self, questions: List[str], top_k: Optional[int] = None,
+                           year_from: Optional[int] = None, year_to: Optional[int] = None) -> List[List[Dict]]:
+        """ค้นหาหลายคำถามพร้อมกัน: vectorize ครั้งเดียว และให้คะแนนด้วย matrix-matrix product"""
+        if not questions:
+            return []
+        snapshot = self.index_holder.get()
+        top_k = top_k or self.passage_k
+        fetch = max(DENSE_CONFIG["candidates"], top_k) if snapshot.dense is not None else top_k
+
+        q_matrix = snapshot.vectorizer.transform(questions)
+        candidates = [[] for _ in questions]
+        for shard in snapshot.select_shards(year_from, year_to):
+            results = shard.scorer.top_k_many(q_matrix, fetch, self.min_similarity)
+            for per_question, (rows, scores) in zip(candidates, results):
+                per_question.extend({"score": float(s), "doc": shard.chunks[i]} for i, s in zip(rows, scores))
+        sparse_hits = [self._merge_hits(c, fetch) for c in candidates]
+
+        if snapshot.dense is None:
+            return sparse_hits
+
+        try:
+            q_dense = np.vstack([
+                self.embedding.embed(questions[i:i + self.embedding.batch_size], self.embedding.query_timeout)
+                for i in range(0, len(questions), self.embedding.batch_size)
+            ])
+        except Exception as e:
+            logger.warning(f"Dense retrieval skipped: {e}")
+            return [hits[:top_k] for hits in sparse_hits]
+        return [
+            self._fuse(hits, self._dense_hits(snapshot, q, fetch, year_from, year_to), top_k)
+            for hits, q in zip(sparse_hits, q_dense)
         ]
 
-        return chunks, hits
+    def _merge_hits(self, candidates: List[Dict], top_k: int) -> List[Dict]:
+        """รวม Top-K จากหลาย shard"""
+        return sorted(candidates, key=lambda h: h["score"], reverse=True)[:top_k]
+
+    def _dense_hits(self, snapshot: IndexSnapshot, q_dense: np.ndarray, fetch: int,
+                    year_from: Optional[int], year_to: Optional[int]) -> List[Dict]:
+        filtered = year_from is not None or year_to is not None
+        # กรองปีหลังค้นหา จึงต้องดึงเผื่อไว้มากขึ้น
+        rows, scores = snapshot.dense.search(q_dense, fetch * 4 if filtered else fetch, DENSE_CONFIG["n_probe"])
+
+        hits = []
+        for r, s in zip(rows, scores):
+            doc = snapshot.dense_chunks[r]
+            if doc is None or s < DENSE_CONFIG["min_similarity"]:
+                continue
+            if filtered and not self._in_year_range(doc, year_from, year_to):
+                continue
+            hits.append({"score": float(s), "doc": doc})
+        return hits[:fetch]
+
+    def _in_year_range(self, doc: Dict, year_from: Optional[int], year_to: Optional[int]) -> bool:
+        year = str(doc.get("year") or "")
+        if not year.isdigit():
+            return False
+        return (year_from is None or int(year) >= year_from) and (year_to is None or int(year) <= year_to)
+
+    def _fuse(self, sparse_hits: List[Dict], dense_hits: List[Dict], top_k: int) -> List[Dict]:
+        """
+        Reciprocal Rank Fusion: คะแนน = sum(1 / (k + rank)) จากทั้งสองรายการ
+        score ที่ส่งออกยังเป็น similarity เดิม (TF-IDF ถ้ามี ไม่งั้น dense)
+        """
+        k = DENSE_CONFIG["rrf_k"]
+        fused: Dict[str, Dict] = {}
+        for hits in (sparse_hits, dense_hits):
+            for rank, h in enumerate(hits):
+                key = h["doc"]["content_hash"]
+                entry = fused.setdefault(key, {"score": h["score"], "doc": h["doc"], "rrf_score": 0.0})
+                entry["rrf_score"] += 1.0 / (k + rank + 1)
+        return sorted(fused.values(), key=lambda h: h["rrf_score"], reverse=True)[:top_k]
+
+    def dedupe_by_document(self, hits: List[Dict], top_k: int) -> List[Dict]:
+        """เก็บเฉพาะ passage ที่คะแนนสูงสุดของแต่ละเอกสาร (ใช้ทำรายการอ้างอิง)"""
+        best: Dict[str, Dict] = {}
+        for h in hits:
+            doc_id = h["doc"]["doc_id"]
+            if doc_id not in best or h["score"] > best[doc_id]["score"]:
+                best[doc_id] = h
+        return sorted(best.values(), key=lambda h: h["score"], reverse=True)[:top_k]
+
+    def build_context(self, hits: List[Dict], token_budget: int) -> Tuple[str, List[Dict]]:
+        """
+        บรรจุ passage ที่คะแนนสูงสุดลงใน context ให้ไม่เกิน token_budget
+        passage ของเอกสารเดียวกันที่ซ้อน/ติดกันจะถูกรวมเป็นช่วงเดียว (ไม่ส่งข้อความซ้ำ)
+        """
+        ranked = sorted(hits, key=lambda h: h.get("rrf_score", h["score"]), reverse=True)
+
+        selected: Dict[str, Dict] = {}
+        used = 0
+        for h in ranked:
+            doc = h["doc"]
+            entry = selected.get(doc["doc_id"])
+            if entry is None and len(selected) >= self.top_k:
+                continue
+            cost = self.token_estimator.estimate(doc["content"]) + (0 if entry else self._header_cost(doc))
+            if used + cost > token_budget:
+                if selected:
+                    continue
+                # passage แรกยาวเกินงบ: ตัดให้พอดี
+                room = max(token_budget - self._header_cost(doc), 0)
+                text = self.token_estimator.truncate(doc["content"], room)
+                doc = dict(doc, content=text, end=doc["start"] + len(text))
+                cost = token_budget
+            if entry is None:
+                entry = selected[doc["doc_id"]] = {"doc": doc, "score": h["score"], "spans": []}
+            entry["spans"].append((doc["start"], doc["end"]))
+            used += cost
 
-    def build_context(self, hits: List[Dict]) -> Tuple[str, List[Dict]]:
         ctx = ""
         detailed_refs = []
-        for i, h in enumerate(hits):
-            doc = h["doc"]
-            ctx += f"\n--- เอกสาร: {doc['title']} ---\n{doc['content']}\n"
+        for i, entry in enumerate(selected.values()):
+            doc = entry["doc"]
+            parts = [doc["doc_content"][s:e] for s, e in self._merge_spans(entry["spans"])]
+            ctx += f"\n--- เอกสาร: {doc['title']} ---\n" + "\n...\n".join(parts) + "\n"
             detailed_refs.append({
-                "title": doc['title'], 
-                "score": round(h["score"], 4), 
+                "title": doc['title'],
+                "score": round(entry["score"], 4),
                 "is_primary": i == 0
             })
-        
-        # Max context length to avoid blowing up LLM limit
-        return ctx[:1500], detailed_refs
+
+        return ctx, detailed_refs
+
+    def _header_cost(self, doc: Dict) -> int:
+        return self.token_estimator.estimate(f"\n--- เอกสาร: {doc['title']} ---\n\n")
+
+    def _merge_spans(self, spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        merged = []
+        for s, e in sorted(spans):
+            if merged and s <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+            else:
+                merged.append((s, e))
+        return merged
@@ -0,0 +1,98 @@
+# src/benchmarks/analyzer_compare.py
+"""
+เปรียบเทียบ analyzer ของ TF-IDF บน corpus จริง: char n-gram (char_wb) กับการตัดคำภาษาไทย (thai_word)
+วัดขนาด vocabulary / nnz / ขนาดบนดิสก์, เวลา build และ latency ต่อคำถาม
+
+    python -m src.benchmarks.analyzer_compare --queries 200
+    python -m src.benchmarks.analyzer_compare --json analyzer_compare.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List, Tuple
+import numpy as np
+from src.config.settings import INDEX_CONFIG
+from src.core.sparse_scorer import SparseScorer
+from src.core.tfidf_index import WORD_ANALYZER, TfidfEncoder, make_vectorizer, save_index
+from src.repository.document_repository import DocumentRepository
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def measure(corpus: List[str], questions: List[str], analyzer: str, ngram_range: Tuple[int, int],
+            top_k: int) -> Dict:
+    start = time.perf_counter()
+    vectorizer = make_vectorizer(analyzer, ngram_range)
+    matrix = vectorizer.fit_transform(corpus).tocsr()
+    encoder = TfidfEncoder.from_vectorizer(vectorizer, analyzer, ngram_range)
+    build_s = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        save_index(tmp, encoder, [{
+            "key": "all", "year": None, "shard_hash": "bench", "doc_hashes": [], "matrix": matrix,
+        }], {"build_hash": "bench"})
+        disk_bytes = _dir_size(tmp)
+
+    scorer = SparseScorer(matrix)
+    latencies = []
+    for q in questions:
+        t = time.perf_counter()
+        scorer.top_k(encoder.transform([q]), top_k)
+        latencies.append((time.perf_counter() - t) * 1000)
+
+    lat = np.asarray(latencies) if latencies else np.zeros(1)
+    return {
+        "analyzer": analyzer,
+        "ngram_range": list(ngram_range),
+        "docs": matrix.shape[0],
+        "vocabulary": encoder.n_features,
+        "nnz": int(matrix.nnz),
+        "build_s": round(build_s, 3),
+        "disk_mb": round(disk_bytes / 1024 / 1024, 2),
+        "query_ms_p50": round(float(np.percentile(lat, 50)), 3),
+        "query_ms_p99": round(float(np.percentile(lat, 99)), 3),
+        "oov_ratio": round(encoder.oov_ratio(questions), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare char n-gram vs Thai word analyzers")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    parser.add_argument("--json", help="เขียนผลลัพธ์เป็นไฟล์ JSON")
+    args = parser.parse_args()
+
+    chunks = DocumentRepository().load_documents()
+    if not chunks:
+        print("[WARN] No documents found")
+        return
+    corpus = [c["search_text"] for c in chunks]
+    questions = [c["title"] for c in chunks[::max(1, len(chunks) // args.queries)]][:args.queries]
+
+    configs = [
+        ("char_wb", tuple(INDEX_CONFIG["ngram_range"])),
+        (WORD_ANALYZER, tuple(INDEX_CONFIG["word_ngram_range"])),
+    ]
+    results = [measure(corpus, questions, name, ngram, args.top_k) for name, ngram in configs]
+
+    print(f"Corpus: {len(corpus)} passages, {len(questions)} queries, top_k={args.top_k}")
+    for r in results:
+        print(f"  {r['analyzer']:<10} vocab={r['vocabulary']:>9} nnz={r['nnz']:>10} "
+              f"build={r['build_s']:7.2f}s disk={r['disk_mb']:8.2f}MB "
+              f"p50={r['query_ms_p50']:7.3f}ms p99={r['query_ms_p99']:7.3f}ms oov={r['oov_ratio']:.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, ensure_ascii=False, indent=2)
+        print(f"[OK] Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+# src/benchmarks/load_test.py
+"""
+Load test แบบ end-to-end ของ /rag/ask (Retrieval จริง + Ollama จริงหรือจำลอง)
+
+    # 1) Ollama จำลอง (ไม่ใช้ CPU/GPU รันโมเดล)
+    python -m src.devtools.fake_ollama --port 11500 --latency 0.5 --tokens-per-second 20 --parallel 2
+    # 2) API ชี้ไปที่ Ollama จำลอง
+    OLLAMA_BACKENDS=http://127.0.0.1:11500 OLLAMA_NUM_PARALLEL=2 uvicorn main:app --port 8000
+    # 3) ยิง Request
+    python -m src.benchmarks.load_test --concurrency 16 --requests 200 --json load.json
+    python -m src.benchmarks.load_test --concurrency 32 --duration 60 --questions-file questions.txt
+
+รายงาน throughput, latency p50/p95/p99, อัตรา error แยกตาม status code และเวลารอคิว Ollama (จาก /rag/queue)
+คำถามที่ซ้ำกันจะถูกตอบจาก Answer Cache ใช้ --questions-file ที่ไม่ซ้ำกันถ้าต้องการวัดการ generate ทุกครั้ง
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+import httpx
+import numpy as np
+from src.benchmarks.synthetic_corpus import SyntheticCorpus
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    arr = np.asarray(samples) if samples else np.zeros(1)
+    return {
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+        "mean": round(float(arr.mean()), 3),
+        "max": round(float(arr.max()), 3),
+    }
+
+
+def load_questions(path: Optional[str], n: int, seed: int) -> List[str]:
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        if not questions:
+            raise ValueError(f"No questions in {path}")
+        return questions
+    return SyntheticCorpus(seed=seed).questions(n)
+
+
+async def _queue_stats(client: httpx.AsyncClient) -> Optional[Dict]:
+    try:
+        r = await client.get("/rag/queue", timeout=5)
+        r.raise_for_status()
+        return r.json()
+    except httpx.HTTPError:
+        return None
+
+
+async def run_load(base_url: str, questions: List[str], concurrency: int, n_requests: Optional[int],
+                   duration: Optional[float], timeout: float) -> Dict:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    answer_statuses: Counter = Counter()
+    sent = 0
+    deadline = time.monotonic() + duration if duration else None
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        before = await _queue_stats(client)
+
+        def next_question() -> Optional[str]:
+            nonlocal sent
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            if deadline is None and sent >= n_requests:
+                return None
+            q = questions[sent % len(questions)]
+            sent += 1
+            return q
+
+        async def worker():
+            while True:
+                q = next_question()
+                if q is None:
+                    return
+                t0 = time.perf_counter()
+                try:
+                    r = await client.post("/rag/ask", json={"question": q})
+                    status = str(r.status_code)
+                    if r.status_code == 200:
+                        answer_statuses[r.json().get("status", "?")] += 1
+                except httpx.TimeoutException:
+                    status = "timeout"
+                except httpx.HTTPError as e:
+                    status = type(e).__name__
+                elapsed = time.perf_counter() - t0
+                statuses[status] += 1
+                if status == "200":
+                    latencies.append(elapsed)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - start
+        after = await _queue_stats(client)
+
+    total = sum(statuses.values())
+    ok = statuses.get("200", 0)
+    report = {
+        "concurrency": concurrency,
+        "requests": total,
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(ok / wall, 3) if wall > 0 else None,
+        "latency_s": _percentiles(latencies),
+        "status_codes": dict(sorted(statuses.items())),
+        "answer_status": dict(sorted(answer_statuses.items())),
+        "error_rate": round((total - ok) / total, 4) if total else 0.0,
+    }
+    if after is not None:
+        report["queue"] = {
+            # เวลารอในคิวของ Scheduler (หน้าต่างล่าสุด 1000 งาน) และงานที่ถูกปฏิเสธ/หมดเวลาระหว่างทดสอบ
+            "wait_seconds": after.get("wait_seconds"),
+            "num_parallel": after.get("num_parallel"),
+            **{k: after.get(k, 0) - (before or {}).get(k, 0)
+               for k in ("submitted", "completed", "failed", "rejected", "expired", "coalesced")},
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test of /rag/ask")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="จำนวน Request ทั้งหมด (ถ้าไม่กำหนด --duration)")
+    parser.add_argument("--duration", type=float, default=None, help="ยิงต่อเนื่องกี่วินาที")
+    parser.add_argument("--questions-file", help="ไฟล์คำถาม บรรทัดละคำถาม (ค่าเริ่มต้น: คำถามจำลอง)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--json", help="เขียนผลลัพธ์เป็นไฟล์ JSON")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions_file, max(args.requests, 1), args.seed)
+    target = f"{args.duration}s" if args.duration else f"{args.requests} requests"
+    print(f"[INFO] {args.url}/rag/ask | concurrency {args.concurrency} | {target}")
+    report = asyncio.run(run_load(
+        args.url, questions, args.concurrency, args.requests, args.duration, args.timeout
+    ))
+
+    lat = report["latency_s"]
+    print(f"[OK] {report['requests']} requests in {report['wall_s']}s | {report['throughput_rps']} req/s | "
+          f"p50={lat['p50']}s p95={lat['p95']}s p99={lat['p99']}s | error rate {report['error_rate']:.1%}")
+    print(f"     status codes: {report['status_codes']}")
+    if "queue" in report:
+        wait = report["queue"]["wait_seconds"] or {}
+        print(f"     queue wait p50={wait.get('p50')}s p95={wait.get('p95')}s | "
+              f"rejected={report['queue']['rejected']} expired={report['queue']['expired']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"[OK] Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# src/benchmarks/retrieval_bench.py
+"""
+Benchmark ของ DocumentRepository / RetrievalService บน corpus จำลองหลายขนาด (รันแบบ offline ทั้งหมด)
+วัดเวลาโหลดเอกสาร, เวลา build Index, ขนาด Index บนดิสก์และใน RAM, latency ต่อคำถาม (p50/p99)
+
+    python -m src.benchmarks.retrieval_bench --sizes 1000,10000 --json bench.json
+    python -m src.benchmarks.retrieval_bench --sizes 100000 --queries 500 --work-dir /data/bench --keep
+
+ผลลัพธ์ JSON เรียง key คงที่ นำไป diff ระหว่าง commit ได้
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from typing import Dict, List, Optional
+import numpy as np
+from src.config.settings import CHUNK_CONFIG, DENSE_CONFIG, FILE_PATHS, INDEX_CONFIG, RAG_CONFIG
+from src.benchmarks.synthetic_corpus import SyntheticCorpus, write_corpus
+
+
+def _rss_bytes() -> Optional[int]:
+    """Resident memory ของ process ปัจจุบัน (Linux เท่านั้น)"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    arr = np.asarray(samples) if samples else np.zeros(1)
+    return {
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+        "mean": round(float(arr.mean()), 3),
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _use_work_dir(work_dir: str) -> str:
+    """ชี้ FILE_PATHS ไปที่โฟลเดอร์ทดสอบ (ต้องเรียกก่อนสร้าง DocumentRepository)"""
+    doc_file = os.path.join(work_dir, "month_document_contents_filtered.json")
+    FILE_PATHS["month_document_contents_filtered"] = doc_file
+    FILE_PATHS["tfidf_index"] = os.path.join(work_dir, "tfidf_index")
+    FILE_PATHS["dense_index"] = os.path.join(work_dir, "dense_index")
+    return doc_file
+
+
+def run_size(n_docs: int, n_queries: int, work_dir: str, seed: int) -> Dict:
+    from src.api.services.retrieval_service import RetrievalService
+    from src.core.index_holder import IndexHolder
+    from src.repository.document_repository import DocumentRepository
+
+    doc_file = _use_work_dir(work_dir)
+    start = time.perf_counter()
+    write_corpus(doc_file, n_docs, seed)
+    generate_s = time.perf_counter() - start
+
+    repo = DocumentRepository()
+    start = time.perf_counter()
+    chunks = repo.load_documents()
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = repo.get_index(chunks)
+    build_s = time.perf_counter() - start
+    del index
+
+    # cold start ของ worker: โหลดเอกสาร + เปิด Index แบบ mmap
+    rss_before = _rss_bytes()
+    holder = IndexHolder(repo)
+    start = time.perf_counter()
+    snapshot = holder.get()
+    open_s = time.perf_counter() - start
+    rss_after = _rss_bytes()
+
+    index_bytes = 0
+    for s in snapshot.shards:
+        for m in (s.scorer.matrix, s.scorer.inverted):
+            if m is not None:
+                index_bytes += m.data.nbytes + m.indices.nbytes + m.indptr.nbytes
+
+    service = RetrievalService()
+    service.index_holder = holder
+    questions = SyntheticCorpus(seed=seed + 1).questions(n_queries)
+
+    retrieve_ms, context_ms = [], []
+    budget = RAG_CONFIG["context_tokens"] or 600
+    for q in questions:
+        t0 = time.perf_counter()
+        _, hits = service.retrieve_hits(q)
+        t1 = time.perf_counter()
+        service.build_context(service.dedupe_by_document(hits, service.top_k), budget)
+        t2 = time.perf_counter()
+        retrieve_ms.append((t1 - t0) * 1000)
+        context_ms.append((t2 - t1) * 1000)
+
+    start = time.perf_counter()
+    service.retrieve_hits_many(questions)
+    batch_s = time.perf_counter() - start
+
+    return {
+        "docs": n_docs,
+        "passages": len(chunks),
+        "shards": len(snapshot.shards),
+        "vocabulary": snapshot.vectorizer.n_features,
+        "corpus_mb": round(os.path.getsize(doc_file) / 1024 / 1024, 2),
+        "generate_s": round(generate_s, 3),
+        "load_documents_s": round(load_s, 3),
+        "build_index_s": round(build_s, 3),
+        "open_index_s": round(open_s, 3),
+        "index_disk_mb": round(_dir_size(FILE_PATHS["tfidf_index"]) / 1024 / 1024, 2),
+        "index_arrays_mb": round(index_bytes / 1024 / 1024, 2),
+        "rss_delta_mb": round((rss_after - rss_before) / 1024 / 1024, 2) if rss_before and rss_after else None,
+        "queries": n_queries,
+        "retrieve_ms": _percentiles(retrieve_ms),
+        "build_context_ms": _percentiles(context_ms),
+        "batch_qps": round(n_queries / batch_s, 1) if batch_s > 0 else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline retrieval benchmark on synthetic corpora")
+    parser.add_argument("--sizes", default="1000,10000", help="จำนวนเอกสาร คั่นด้วย comma")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="โฟลเดอร์สำหรับ corpus/Index (ค่าเริ่มต้น: temp)")
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบ corpus/Index หลังรันเสร็จ")
+    parser.add_argument("--json", help="เขียนผลลัพธ์เป็นไฟล์ JSON")
+    args = parser.parse_args()
+
+    # offline: ไม่เรียก Ollama
+    DENSE_CONFIG["enabled"] = False
+    base_dir = args.work_dir or tempfile.mkdtemp(prefix="rag-bench-")
+
+    results = []
+    try:
+        for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+            print(f"[INFO] Benchmark {size} documents...")
+            work_dir = os.path.join(base_dir, f"docs-{size}")
+            shutil.rmtree(work_dir, ignore_errors=True)
+            os.makedirs(work_dir)
+            r = run_size(size, args.queries, work_dir, args.seed)
+            results.append(r)
+            print(f"  passages={r['passages']} build={r['build_index_s']}s open={r['open_index_s']}s "
+                  f"disk={r['index_disk_mb']}MB arrays={r['index_arrays_mb']}MB "
+                  f"retrieve p50={r['retrieve_ms']['p50']}ms p99={r['retrieve_ms']['p99']}ms "
+                  f"batch={r['batch_qps']} q/s")
+    finally:
+        if not args.keep:
+            # ลบเฉพาะสิ่งที่ benchmark สร้างเอง
+            target = os.path.join(base_dir, "docs-*") if args.work_dir else base_dir
+            for path in glob.glob(target):
+                shutil.rmtree(path, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "index_config": {k: list(v) if isinstance(v, tuple) else v for k, v in INDEX_CONFIG.items()},
+            "chunk_config": CHUNK_CONFIG,
+        },
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        print(f"[OK] Saved: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+# src/benchmarks/scoring_bench.py
+"""
+Micro-benchmark: cosine_similarity + argsort (แบบเดิม) เทียบกับ SparseScorer
+
+    python -m src.benchmarks.scoring_bench --docs 50000 --queries 200
+    python -m src.benchmarks.scoring_bench --use-index
+"""
+import argparse
+import time
+import numpy as np
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+from src.core.sparse_scorer import SparseScorer
+
+
+def random_index(n_docs: int, n_features: int, nnz_per_row: int, n_queries: int, q_nnz: int, seed: int = 0):
+    """สร้าง Matrix แบบสุ่มที่มีการกระจายของ feature แบบ Zipf (ใกล้เคียง n-gram จริง)"""
+    rng = np.random.default_rng(seed)
+
+    def _rows(n, per_row):
+        cols = np.minimum(rng.zipf(1.3, size=n * per_row) - 1, n_features - 1)
+        rows = np.repeat(np.arange(n), per_row)
+        m = sp.csr_matrix((rng.random(n * per_row), (rows, cols)), shape=(n, n_features))
+        m.sum_duplicates()
+        return normalize(m)
+
+    return _rows(n_docs, nnz_per_row), _rows(n_queries, q_nnz)
+
+
+def load_real_index(n_queries: int):
+    from src.core.index_holder import get_index_holder
+    snapshot = get_index_holder().get()
+    questions = [c["title"] for c in snapshot.chunks[:n_queries]]
+    matrix = sp.vstack([s.scorer.matrix for s in snapshot.shards], format="csr")
+    return matrix, snapshot.vectorizer.transform(questions)
+
+
+def _time_per_query(fn, queries) -> float:
+    start = time.perf_counter()
+    for i in range(queries.shape[0]):
+        fn(queries[i])
+    return (time.perf_counter() - start) / queries.shape[0] * 1000
+
+
+def run(matrix, queries, top_k: int):
+    scorer = SparseScorer(matrix)
+
+    def baseline(q):
+        scores = cosine_similarity(q, matrix).flatten()
+        return scores.argsort()[::-1][:top_k]
+
+    results = {
+        "baseline (cosine_similarity + argsort)": _time_per_query(baseline, queries),
+        "SparseScorer csr": _time_per_query(lambda q: scorer.top_k(q, top_k, mode="csr"), queries),
+        "SparseScorer inverted": _time_per_query(lambda q: scorer.top_k(q, top_k, mode="inverted"), queries),
+        "SparseScorer auto": _time_per_query(lambda q: scorer.top_k(q, top_k), queries),
+    }
+
+    # ตรวจว่าผลลัพธ์ตรงกับแบบเดิม
+    mismatches = 0
+    for i in range(queries.shape[0]):
+        q = queries[i]
+        expected = cosine_similarity(q, matrix).flatten()
+        _, got = scorer.top_k(q, top_k, min_score=1e-12)
+        top = np.sort(expected)[::-1][:len(got)]
+        if not np.allclose(top, got):
+            mismatches += 1
+
+    print(f"Matrix: {matrix.shape[0]} docs x {matrix.shape[1]} features, nnz={matrix.nnz}")
+    print(f"Queries: {queries.shape[0]}, top_k={top_k}")
+    for name, ms in results.items():
+        print(f"  {name:<40} {ms:8.3f} ms/query")
+    print(f"  top-k mismatches vs baseline: {mismatches}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sparse top-k scoring micro-benchmark")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--features", type=int, default=200000)
+    parser.add_argument("--nnz-per-row", type=int, default=400)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--query-nnz", type=int, default=60)
+    parser.add_argument("--top-k", type=int, default=2)
+    parser.add_argument("--use-index", action="store_true", help="ใช้ Index จริงจาก output/ แทนข้อมูลสุ่ม")
+    args = parser.parse_args()
+
+    if args.use_index:
+        matrix, queries = load_real_index(args.queries)
+    else:
+        matrix, queries = random_index(args.docs, args.features, args.nnz_per_row, args.queries, args.query_nnz)
+    run(matrix, queries, args.top_k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# src/benchmarks/synthetic_corpus.py
+"""
+สร้าง corpus จำลองในรูปแบบเดียวกับ month_document_contents_filtered.json
+(รายการ {year, month, documents: [{title, url, เลขที่หนังสือ, ..., ข้อหารือ, แนววินิจฉัย}]})
+คำศัพท์สุ่มจากพจนานุกรมภาษีแบบ Zipf ให้การกระจายของ n-gram ใกล้เคียงข้อมูลจริง
+
+    python -m src.benchmarks.synthetic_corpus --docs 10000 --out output/synthetic_10k.json
+"""
+import argparse
+import json
+import os
+from typing import Dict, List
+import numpy as np
+from src.config.settings import TH_MONTH_MAP
+from src.core.thai_tokenizer import load_lexicon
+
+MONTHS = sorted(TH_MONTH_MAP, key=TH_MONTH_MAP.get)
+
+
+class SyntheticCorpus:
+    def __init__(self, seed: int = 0, start_year: int = 2560, years: int = 8,
+                 question_words: int = 60, answer_words: int = 140):
+        self.rng = np.random.default_rng(seed)
+        self.words = np.asarray(load_lexicon())
+        self.start_year = start_year
+        self.years = years
+        self.question_words = question_words
+        self.answer_words = answer_words
+        # ความถี่ของคำแบบ Zipf (คำต้น ๆ ของพจนานุกรมเป็นศัพท์ภาษี จึงถูกสุ่มบ่อยกว่า)
+        ranks = np.arange(1, len(self.words) + 1)
+        self.rng.shuffle(ranks)
+        weights = 1.0 / ranks
+        self.p = weights / weights.sum()
+
+    def _text(self, n_words: int) -> str:
+        n = max(5, int(self.rng.normal(n_words, n_words * 0.3)))
+        words = self.words[self.rng.choice(len(self.words), size=n, p=self.p)]
+        # ภาษาไทยเขียนติดกัน เว้นวรรคเฉพาะระหว่างวลี
+        gaps = self.rng.random(n) < 0.25
+        return "".join(w + (" " if g else "") for w, g in zip(words, gaps)).strip()
+
+    def document(self, n: int, year: int) -> Dict:
+        subject = self._text(6)
+        number = f"กค 0702/{self.rng.integers(1, 20000)}"
+        return {
+            "title": subject,
+            "url": f"https://www.rd.go.th/synthetic/{year}/{n}.html",
+            "เลขที่หนังสือ": number,
+            "วันที่": f"{self.rng.integers(1, 29)} {MONTHS[self.rng.integers(0, 12)]} {year}",
+            "เรื่อง": subject,
+            "ข้อกฎหมาย": f"มาตรา {self.rng.integers(39, 91)} แห่งประมวลรัษฎากร",
+            "ข้อหารือ": self._text(self.question_words),
+            "แนววินิจฉัย": self._text(self.answer_words),
+        }
+
+    def generate(self, n_docs: int) -> List[Dict]:
+        """แบ่งเอกสาร n_docs ฉบับลงแต่ละเดือนเท่า ๆ กัน (เรียงจากปี/เดือนล่าสุด เหมือนไฟล์จริง)"""
+        slots = [(self.start_year + y, m) for y in range(self.years) for m in MONTHS][::-1]
+        per_slot = np.full(len(slots), n_docs // len(slots))
+        per_slot[:n_docs % len(slots)] += 1
+
+        result, n = [], 0
+        for (year, month), count in zip(slots, per_slot):
+            if count == 0:
+                continue
+            docs = []
+            for _ in range(count):
+                docs.append(self.document(n, year))
+                n += 1
+            result.append({"year": str(year), "month": month, "documents": docs})
+        return result
+
+    def questions(self, n: int) -> List[str]:
+        """คำถามจำลองสั้น ๆ จากคำศัพท์ชุดเดียวกัน"""
+        return [self._text(8) + " ต้องเสียภาษีอย่างไร" for _ in range(n)]
+
+
+def write_corpus(path: str, n_docs: int, seed: int = 0) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    data = SyntheticCorpus(seed=seed).generate(n_docs)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic rulings corpus")
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+
+    write_corpus(args.out, args.docs, args.seed)
+    print(f"[OK] {args.docs} documents -> {args.out} ({os.path.getsize(args.out) / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,7 +15,11 @@ FILE_PATHS = {
     "month_document_urls_summary": os.path.join(OUTPUT_DIR, "month_document_urls_summary.json"),
 
     # RAG files
-    "tfidf_embeddings": os.path.join(OUTPUT_DIR, "tfidf_embeddings.pkl"),
+    "tfidf_embeddings": os.path.join(OUTPUT_DIR, "tfidf_embeddings.pkl"),  # รูปแบบเก่า (ใช้กับ convert_index)
+    "tfidf_index": os.path.join(OUTPUT_DIR, "tfidf_index"),
+    "dense_index": os.path.join(OUTPUT_DIR, "dense_index"),
+    # อัตราส่วน token ต่อตัวอักษรของแต่ละโมเดล (src.utils.calibrate_tokens)
+    "token_calibration": os.path.join(OUTPUT_DIR, "token_calibration.json"),
 }
 
 SCRAPER_CONFIG = {
@@ -33,6 +37,47 @@ SCRAPER_CONFIG = {
 # Ollama Configuration (using IP Server Computer)
 OLLAMA_BASE_URL = "http://127.0.0.1:11434"
 
+# เครื่อง Ollama สำหรับสร้างคำตอบ (หลายเครื่องคั่นด้วย comma ใน env OLLAMA_BACKENDS)
+# max_concurrency ควรเท่ากับ OLLAMA_NUM_PARALLEL ของเครื่องนั้น (แก้รายเครื่องได้ในรายการนี้)
+# num_thread = จำนวน CPU thread ที่ Ollama ใช้บนเครื่องนั้น (None = ให้ Ollama เลือกเอง)
+OLLAMA_BACKENDS = [
+    {
+        "url": url.strip(),
+        "max_concurrency": int(os.getenv("OLLAMA_NUM_PARALLEL", "1")),
+        "num_thread": int(os.getenv("OLLAMA_NUM_THREAD", "4")) or None,
+    }
+    for url in os.getenv("OLLAMA_BACKENDS", OLLAMA_BASE_URL).split(",") if url.strip()
+]
+
+BACKEND_CONFIG = {
+    # error/timeout ติดกันกี่ครั้งจึงนำเครื่องออกจากการใช้งาน
+    "failure_threshold": 2,
+    # probe เครื่องที่ถูกนำออกทุกกี่วินาที
+    "probe_interval": 10,
+    "probe_timeout": 2,
+    # เวลาสูงสุดที่รอ slot ว่าง เมื่อบางเครื่องถูกนำออก
+    "acquire_timeout": 120,
+}
+
+# HTTP client ที่ใช้ร่วมกันสำหรับเรียก Ollama (src/core/ollama_client.py)
+OLLAMA_HTTP_CONFIG = {
+    "max_connections": 32,
+    "max_keepalive_connections": 8,
+    "keepalive_expiry": 60,
+    "connect_timeout": 10,
+    "read_timeout": 240,
+}
+
+# Scheduler ของงานที่ส่งไป Ollama (src/core/ollama_queue.py)
+SCHEDULER_CONFIG = {
+    # จำนวนงานที่ส่งพร้อมกัน (None = ผลรวม max_concurrency ของ OLLAMA_BACKENDS)
+    "num_parallel": None,
+    # จำนวนงานที่รอในคิวได้สูงสุด เกินนี้ตอบ 503 + Retry-After ทันที
+    "max_queue": 16,
+    # เวลาสูงสุด (วินาที) ที่งานรอในคิวได้ก่อนถูกทิ้ง (0 = ไม่จำกัด)
+    "deadline": 180,
+}
+
 RAG_CONFIG = {
     "model": "qwen3:8b",  # เปลี่ยนเป็นรุ่น 3b เพื่อทำเวลาให้ได้ 1-2 นาที (7b ช้าเกินไปสำหรับ CPU)
     "top_k": 2,
@@ -41,7 +86,106 @@ RAG_CONFIG = {
     "strict_threshold": 0.05,
     "rewrite_question": False,
     "enable_fallback": False,
-    "debug": True
+    "debug": True,
+    # num_ctx ต่อ Request = ขั้นที่เล็กที่สุด (num_ctx x 2^n ไม่เกิน max_num_ctx) ที่พอสำหรับ prompt + num_predict
+    # ใช้เป็นขั้นเพราะ Ollama ต้องโหลดโมเดลใหม่ทุกครั้งที่ num_ctx เปลี่ยน
+    "num_ctx": 1024,
+    "max_num_ctx": 4096,
+    # จำนวน token สูงสุดของคำตอบ แยกตามชนิดคำถาม (classify_question)
+    "num_predict": 512,
+    "num_predict_by_type": {"yes_no": 384, "explain": 768},
+    # เวลาที่ Ollama เก็บโมเดลไว้ใน Memory หลังใช้งานล่าสุด ("30m", "24h", -1 = ตลอดไป, 0 = ปล่อยทันที)
+    "keep_alive": "30m",
+    # โหลดโมเดลและ prompt prefix ไว้ล่วงหน้าตอน startup (คำถามแรกไม่ต้องรอโหลดโมเดล)
+    "warmup": True,
+    # จำนวน thread สำหรับงาน Retrieval (CPU-bound) ที่แยกออกจาก event loop (None = จำนวน CPU)
+    "retrieval_workers": None,
+    # งบ token ของ context (None = คำนวณจาก max_num_ctx - num_predict - ความยาว prompt)
+    "context_tokens": None,
+    # จำนวน passage ที่ดึงมาให้ context builder เลือกบรรจุ
+    "passage_candidates": 8,
+    # ขนาดสูงสุดของ /rag/retrieve/batch (เกินนี้ตอบ 422)
+    "batch_max_questions": 64,
+    "batch_max_top_k": 20,
+}
+
+# Cache คำตอบของ LLM (src/core/answer_cache.py) ล้างอัตโนมัติเมื่อ Index เปลี่ยนเวอร์ชัน
+CACHE_CONFIG = {
+    "enabled": True,
+    "path": os.path.join(OUTPUT_DIR, "answer_cache.sqlite3"),
+    "memory_entries": 512,
+    "ttl_seconds": 7 * 24 * 3600,
+}
+
+# งานถาม-ตอบแบบ asynchronous (/rag/jobs) เก็บใน SQLite อยู่รอดข้ามการ restart
+JOB_CONFIG = {
+    "path": os.path.join(OUTPUT_DIR, "rag_jobs.sqlite3"),
+    # จำนวนงานที่ทำพร้อมกัน (None = เท่ากับจำนวน slot ของ Ollama Scheduler)
+    "workers": None,
+    # lane ของ Scheduler (งาน job ไม่มีคนรอ connection อยู่ จึงให้คำถามแบบ interactive ได้ทำก่อน)
+    "priority": "bulk",
+    # จำนวนงานที่รอได้สูงสุด (เกินแล้วตอบ 503)
+    "max_pending": 1000,
+    # บันทึกคำตอบบางส่วนลงดิสก์ทุกกี่วินาที
+    "flush_interval": 1.0,
+    # ลบงานที่จบแล้วหลังผ่านไปกี่วินาที
+    "ttl_seconds": 7 * 24 * 3600,
+}
+
+# ประวัติการถาม-ตอบ (src/repository/log_repository.py) เก็บแบบ append-only ใน SQLite
+LOG_CONFIG = {
+    "path": os.path.join(OUTPUT_DIR, "pipeline_feedback.sqlite3"),
+    # ไฟล์ JSON แบบเก่า นำเข้าอัตโนมัติครั้งแรก
+    "legacy_json": os.path.join(OUTPUT_DIR, "pipeline_feedback.json"),
+    # เกณฑ์เก็บย้อนหลัง (None = ไม่จำกัด) รายการที่เกินจะถูกลบตอน compact
+    "max_entries": None,
+    "max_bytes": 200 * 1024 * 1024,
+    "max_age_days": 180,
+    # compact อัตโนมัติทุกกี่รายการที่เขียน (0 = ไม่ทำอัตโนมัติ)
+    "compact_every": 1000,
+    # LogSink: Request แค่ใส่ log ลง buffer แล้ว thread เบื้องหลังเขียนเป็น batch
+    # buffer เต็ม = ทิ้ง log (นับใน dropped) แทนการให้ Request รอดิสก์
+    "buffer_size": 10000,
+    "batch_size": 200,
+    "flush_interval": 1.0,
+}
+
+# การแบ่งเอกสารเป็น passage (ซ้อนกัน) สำหรับ Index และ Context
+CHUNK_CONFIG = {
+    "passage_chars": 600,
+    "overlap_chars": 120,
+}
+
+INDEX_CONFIG = {
+    # แบ่ง Index เป็น shard ตามช่วงเวลา: "year" หรือ "month"
+    "shard_by": "year",
+    # "char_wb" (char n-gram) หรือ "thai_word" (ตัดคำด้วยพจนานุกรม: Index เล็กกว่ามาก)
+    # เปรียบเทียบบน corpus จริงได้ด้วย: python -m src.benchmarks.analyzer_compare
+    "analyzer": "char_wb",
+    "ngram_range": (2, 4),
+    "word_ngram_range": (1, 2),
+    # สัดส่วนเอกสารที่เพิ่ม/ลบ นับจาก Full Fit ครั้งล่าสุด ถ้าเกินจะ Refit ทั้งหมด
+    "refit_drift_threshold": 0.2,
+    # สัดส่วน n-gram ของเอกสารใหม่ที่ไม่อยู่ใน Vocabulary เดิม ถ้าเกินจะ Refit ทั้งหมด
+    "refit_oov_threshold": 0.05,
+    # ใช้ Inverted Scan เมื่อ posting ที่ต้องแตะ <= สัดส่วนนี้ของ nnz ทั้ง Matrix
+    "inverted_max_ratio": 0.25,
+}
+
+# Dense Retrieval (Ollama Embeddings + IVF) ใช้ร่วมกับ TF-IDF ด้วย Reciprocal Rank Fusion
+# สร้าง Index ก่อนด้วย: python -m src.utils.build_dense_index
+DENSE_CONFIG = {
+    "enabled": False,
+    "model": "bge-m3",
+    "batch_size": 32,
+    "timeout": 120,         # embed เอกสารตอนสร้าง Index (offline)
+    "query_timeout": 5,     # embed คำถามตอนให้บริการ เกินนี้ใช้ TF-IDF อย่างเดียว
+    "dtype": "float16",
+    "n_lists": None,        # None = sqrt(จำนวนเอกสาร)
+    "n_probe": 8,
+    "candidates": 20,       # จำนวนผลลัพธ์จากแต่ละฝั่งก่อนนำมา fuse
+    "min_similarity": 0.3,
+    "rrf_k": 60,
 }
 
 TH_MONTH_MAP = {
@@ -0,0 +1,165 @@
+# src/core/ann_index.py
+"""
+ANN Index แบบ IVF (Inverted File) ด้วย NumPy ล้วน สำหรับ Dense Retrieval
+
+    <dir>/CURRENT                 ชื่อโฟลเดอร์ของเวอร์ชันที่ใช้งานอยู่ (สลับแบบ atomic เหมือน tfidf_index)
+    <dir>/v-<id>/meta.json        model, dim, dtype, doc_hashes
+    <dir>/v-<id>/vectors.npy      embedding (L2-normalized) เรียงตาม list
+    <dir>/v-<id>/row_ids.npy      แถวเดิม (ตำแหน่งใน doc_hashes) ของแต่ละ vector
+    <dir>/v-<id>/centroids.npy
+    <dir>/v-<id>/list_offsets.npy ขอบเขตของแต่ละ list ใน vectors (ยาว n_lists + 1)
+"""
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+from src.core.sparse_scorer import select_top_k
+
+POINTER_FILE = "CURRENT"
+KEEP_VERSIONS = 2
+
+
+def l2_normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def train_centroids(vectors: np.ndarray, n_lists: int, iterations: int = 10,
+                    sample_size: int = 50000, seed: int = 0) -> np.ndarray:
+    """Spherical k-means (ใช้ตัวอย่างไม่เกิน sample_size แถว)"""
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if vectors.shape[0] > sample_size:
+        sample = vectors[rng.choice(vectors.shape[0], sample_size, replace=False)]
+    sample = np.asarray(sample, dtype=np.float32)
+
+    centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = assign_lists(sample, centroids)
+        for c in range(n_lists):
+            members = sample[assign == c]
+            if members.shape[0]:
+                centroids[c] = members.sum(axis=0)
+            else:
+                # list ว่าง: สุ่มจุดใหม่
+                centroids[c] = sample[rng.integers(sample.shape[0])]
+        centroids = l2_normalize(centroids)
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+    out = np.empty(vectors.shape[0], dtype=np.int64)
+    for s in range(0, vectors.shape[0], block):
+        sims = np.asarray(vectors[s:s + block], dtype=np.float32) @ centroids.T
+        out[s:s + block] = sims.argmax(axis=1)
+    return out
+
+
+class IVFIndex:
+    def __init__(self, vectors: np.ndarray, row_ids: np.ndarray, centroids: np.ndarray,
+                 list_offsets: np.ndarray, meta: Dict[str, Any], path: Optional[str] = None):
+        self.vectors = vectors
+        self.row_ids = row_ids
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.meta = meta
+        self.path = path
+
+    @property
+    def doc_hashes(self) -> List[str]:
+        return self.meta["doc_hashes"]
+
+    @property
+    def n_lists(self) -> int:
+        return self.centroids.shape[0]
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, meta: Dict[str, Any], n_lists: Optional[int] = None,
+              dtype: str = "float16") -> "IVFIndex":
+        embeddings = l2_normalize(embeddings)
+        n = embeddings.shape[0]
+        n_lists = max(1, min(n_lists or int(np.sqrt(n)), n))
+        centroids = train_centroids(embeddings, n_lists)
+        assign = assign_lists(embeddings, centroids)
+
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(embeddings[order].astype(dtype), order.astype(np.int64),
+                   centroids.astype(np.float32), offsets, dict(meta, dim=int(embeddings.shape[1]), dtype=dtype))
+
+    def search(self, query: np.ndarray, k: int, n_probe: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+        """คืน (row_ids, scores) เรียงจากคะแนนมากไปน้อย"""
+        if self.vectors.shape[0] == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        q = l2_normalize(query).ravel()
+        probe = np.argsort(-(self.centroids @ q))[:max(1, min(n_probe, self.n_lists))]
+
+        ranges = [(self.list_offsets[c], self.list_offsets[c + 1]) for c in probe]
+        idx = np.concatenate([np.arange(s, e) for s, e in ranges]) if ranges else np.empty(0, dtype=np.int64)
+        if idx.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        scores = (np.asarray(self.vectors[idx], dtype=np.float32) @ q).astype(np.float64)
+        top, top_scores = select_top_k(idx, scores, k, min_score=-1.0)
+        return self.row_ids[top], top_scores
+
+    def save(self, folder: str) -> str:
+        """
+        เขียนเวอร์ชันใหม่ลงโฟลเดอร์ v-<id> แล้วสลับ CURRENT แบบ atomic
+        ผู้ที่กำลังโหลดเวอร์ชันเดิมจึงไม่เจอช่วงที่ไม่มี Index (เวอร์ชันเก่าถูกลบทีหลัง)
+        """
+        os.makedirs(folder, exist_ok=True)
+        name = f"v-{time.time_ns()}"
+        tmp = os.path.join(folder, f"{name}.tmp-{os.getpid()}")
+        os.makedirs(tmp, exist_ok=True)
+        np.save(os.path.join(tmp, "vectors.npy"), self.vectors)
+        np.save(os.path.join(tmp, "row_ids.npy"), self.row_ids)
+        np.save(os.path.join(tmp, "centroids.npy"), self.centroids)
+        np.save(os.path.join(tmp, "list_offsets.npy"), self.list_offsets)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(folder, name))
+
+        pointer = os.path.join(folder, POINTER_FILE)
+        with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+            f.write(name)
+        os.replace(f"{pointer}.tmp", pointer)
+
+        _cleanup_old_versions(folder)
+        return os.path.join(folder, name)
+
+    @classmethod
+    def load(cls, folder: str, mmap: bool = True) -> Optional["IVFIndex"]:
+        """โหลดเวอร์ชันที่ CURRENT ชี้อยู่ (คืน None ถ้ายังไม่มี Index)"""
+        pointer = os.path.join(folder, POINTER_FILE)
+        if os.path.exists(pointer):
+            with open(pointer, "r", encoding="utf-8") as f:
+                folder = os.path.join(folder, f.read().strip())
+        meta_file = os.path.join(folder, "meta.json")
+        if not os.path.exists(meta_file):
+            return None
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "r" if mmap else None
+        arrays = [
+            np.load(os.path.join(folder, f"{name}.npy"), mmap_mode=mode)
+            for name in ("vectors", "row_ids", "centroids", "list_offsets")
+        ]
+        return cls(*arrays, meta=meta, path=folder)
+
+
+def _cleanup_old_versions(folder: str):
+    """เก็บไว้ KEEP_VERSIONS เวอร์ชันล่าสุด (worker ที่ยังไม่ reload ยังเปิดเวอร์ชันก่อนหน้าได้)"""
+    versions = sorted(
+        (d for d in os.listdir(folder) if d.startswith("v-") and ".tmp-" not in d),
+        key=lambda d: int(d[len("v-"):]),
+        reverse=True
+    )
+    for d in versions[KEEP_VERSIONS:]:
+        # บน Windows ไฟล์ที่ยังถูก mmap อยู่จะลบไม่ได้ ข้ามไปก่อนแล้วลบในรอบถัดไป
+        shutil.rmtree(os.path.join(folder, d), ignore_errors=True)
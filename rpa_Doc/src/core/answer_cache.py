@@ -0,0 +1,140 @@
+# src/core/answer_cache.py
+"""
+Cache คำตอบของ LLM
+- key = คำถามที่ normalize แล้ว + hash ของ passage ที่ดึงมาได้ + ชื่อโมเดล + เวอร์ชันของ prompt template
+- LRU ใน Memory (จำกัดจำนวน) + SQLite บนดิสก์ (มีอายุ TTL) ใช้ต่อได้หลัง restart
+- คำตอบผูกกับเวอร์ชันของ Index: อ่านได้เฉพาะคำตอบของเวอร์ชันที่ถามมา
+  คำตอบของเวอร์ชันอื่นถูกลบครั้งเดียวตอน IndexHolder สลับเวอร์ชัน (purge) ไม่ใช่ทุกครั้งที่เวอร์ชันไม่ตรง
+  ระหว่าง reload คำถามที่ยังใช้เวอร์ชันเก่าอยู่จึงไม่ลบคำตอบของเวอร์ชันใหม่ (และกลับกัน)
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import CACHE_CONFIG
+
+logger = logging.getLogger("rag.cache")
+
+_SPACES = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s?？!.。]+$")
+
+
+def normalize_question(question: str) -> str:
+    """ตัดความต่างที่ไม่มีผลต่อคำตอบ: Unicode form, ตัวพิมพ์, ช่องว่าง, เครื่องหมายท้ายประโยค"""
+    text = unicodedata.normalize("NFC", question).lower()
+    text = _SPACES.sub(" ", text).strip()
+    return _TRAILING.sub("", text)
+
+
+def make_cache_key(question: str, hit_ids: List[str], model: str, prompt_version: Any, options: Dict) -> str:
+    payload = json.dumps(
+        [normalize_question(question), hit_ids, model, prompt_version, options],
+        ensure_ascii=False, sort_keys=True
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 ttl_seconds: Optional[float] = None):
+        self.path = path or CACHE_CONFIG["path"]
+        self.max_entries = max_entries or CACHE_CONFIG["memory_entries"]
+        self.ttl = ttl_seconds if ttl_seconds is not None else CACHE_CONFIG["ttl_seconds"]
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._index_version: Optional[str] = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "invalidations": 0}
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY, index_version TEXT, created_at REAL, value TEXT)"
+        )
+        # จำนวนแถวบนดิสก์ นับครั้งเดียวตอนเปิด แล้วปรับตามที่ process นี้เขียน/ลบ (stats() ไม่ต้อง COUNT(*) ทุกครั้ง)
+        # worker อื่นที่ใช้ไฟล์เดียวกันเขียนเพิ่มจะไม่ถูกนับ จึงเป็นค่าประมาณ
+        self._disk_entries = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def get(self, key: str, index_version: Optional[str]) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry["index_version"] == index_version \
+                    and not self._expired(entry["created_at"], now):
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return entry["value"]
+
+            row = self._db.execute(
+                "SELECT created_at, value FROM answers WHERE key = ? AND index_version IS ?",
+                (key, index_version)
+            ).fetchone()
+            if row is None or self._expired(row[0], now):
+                self.counters["misses"] += 1
+                return None
+            value = json.loads(row[1])
+            self._remember(key, {"created_at": row[0], "index_version": index_version, "value": value})
+            self.counters["disk_hits"] += 1
+            return value
+
+    def put(self, key: str, index_version: Optional[str], value: Dict):
+        now = time.time()
+        with self._lock:
+            self._remember(key, {"created_at": now, "index_version": index_version, "value": value})
+            exists = self._db.execute("SELECT 1 FROM answers WHERE key = ?", (key,)).fetchone() is not None
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, index_version, created_at, value) VALUES (?, ?, ?, ?)",
+                (key, index_version, now, json.dumps(value, ensure_ascii=False))
+            )
+            if not exists:
+                self._disk_entries += 1
+            self.counters["stores"] += 1
+            if self.ttl and self.counters["stores"] % 100 == 0:
+                self._disk_entries -= self._db.execute(
+                    "DELETE FROM answers WHERE created_at < ?", (now - self.ttl,)
+                ).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.counters["memory_hits"] + self.counters["disk_hits"]
+            total = hits + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": max(self._disk_entries, 0),
+                "index_version": self._index_version,
+            }
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl) and now - created_at > self.ttl
+
+    def _remember(self, key: str, entry: Dict):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def purge(self, index_version: Optional[str]):
+        """ลบคำตอบของเวอร์ชันอื่นทั้งใน Memory และดิสก์ (เรียกเมื่อ IndexHolder โหลดเวอร์ชันใหม่)"""
+        with self._lock:
+            if index_version == self._index_version:
+                return
+            if self._index_version is not None:
+                logger.info(f"Index version changed ({self._index_version} -> {index_version}), answer cache invalidated")
+                self.counters["invalidations"] += 1
+            for key in [k for k, e in self._memory.items() if e["index_version"] != index_version]:
+                del self._memory[key]
+            self._disk_entries -= self._db.execute(
+                "DELETE FROM answers WHERE index_version IS NOT ?", (index_version,)
+            ).rowcount
+            self._index_version = index_version
@@ -0,0 +1,39 @@
+# src/core/chunker.py
+from typing import List, Tuple
+
+# ตำแหน่งที่เหมาะจะตัด (เรียงจากดีที่สุด): ขึ้นบรรทัดใหม่ > จบประโยค > เว้นวรรค
+_BREAKS = ("\n", "ฯ ", ". ", " ")
+
+
+def _find_break(text: str, start: int, end: int, min_end: int) -> int:
+    """หาจุดตัดที่ใกล้ end ที่สุด โดยไม่ถอยเกิน min_end"""
+    for sep in _BREAKS:
+        pos = text.rfind(sep, min_end, end)
+        if pos != -1:
+            return pos + len(sep)
+    return end
+
+
+def split_passages(text: str, max_chars: int, overlap_chars: int) -> List[Tuple[int, int]]:
+    """
+    แบ่งข้อความเป็นช่วงซ้อนกัน (start, end) ยาวไม่เกิน max_chars
+    พยายามตัดที่ขอบบรรทัด/ประโยค/ช่องว่าง และให้แต่ละช่วงซ้อนกับช่วงก่อนหน้าประมาณ overlap_chars
+    """
+    n = len(text)
+    if n <= max_chars:
+        return [(0, n)] if n else []
+
+    spans = []
+    start = 0
+    while start < n:
+        end = min(start + max_chars, n)
+        if end < n:
+            end = _find_break(text, start, end, start + max_chars // 2)
+        spans.append((start, end))
+        if end >= n:
+            break
+        # เริ่มช่วงถัดไปย้อนหลัง overlap_chars และขยับไปที่ขอบคำ
+        next_start = max(end - overlap_chars, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+    return spans
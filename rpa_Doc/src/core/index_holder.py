@@ -0,0 +1,186 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.config.settings import INDEX_CONFIG
+from src.core.ann_index import IVFIndex
+from src.core.sparse_scorer import SparseScorer
+from src.repository.document_repository import DocumentRepository
+
+logger = logging.getLogger("rag.index")
+
+
+@dataclass
+class ShardView:
+    """shard หนึ่งช่วงเวลา พร้อม Chunks และ Scorer ของตัวเอง"""
+    key: str
+    year: Optional[int]
+    offset: int
+    chunks: List[Dict]
+    scorer: SparseScorer
+
+
+@dataclass
+class IndexSnapshot:
+    """ชุดข้อมูล (Chunks + TF-IDF) ที่โหลดไว้ใน Memory ณ เวลาหนึ่ง"""
+    chunks: List[Dict]
+    vectorizer: Any
+    shards: List[ShardView]
+    signature: Tuple
+    version: Optional[str] = None
+    dense: Optional[IVFIndex] = None
+    # chunk ของแต่ละแถวใน Dense Index (None ถ้าเอกสารนั้นไม่อยู่ในชุดปัจจุบันแล้ว)
+    dense_chunks: Optional[List[Optional[Dict]]] = None
+    # ขนาดไฟล์ .npy บนดิสก์ (bytes) ที่ Snapshot นี้เปิดใช้ แยกเป็น "sparse" (shard TF-IDF) และ "dense"
+    size_bytes: Dict[str, int] = field(default_factory=dict)
+
+    def select_shards(self, year_from: Optional[int] = None, year_to: Optional[int] = None) -> List[ShardView]:
+        """เลือกเฉพาะ shard ที่อยู่ในช่วงปี (พ.ศ.) ที่ต้องการ"""
+        if year_from is None and year_to is None:
+            return self.shards
+        return [
+            s for s in self.shards
+            if s.year is not None
+            and (year_from is None or s.year >= year_from)
+            and (year_to is None or s.year <= year_to)
+        ]
+
+
+class IndexHolder:
+    """
+    เก็บ Corpus และ TF-IDF Index ไว้ใน Memory ระดับ Process
+    - โหลดครั้งแรกแบบ Sync
+    - ทุกครั้งที่ถูกเรียกจะเช็คแค่ stat ของไฟล์ (inode/size/mtime)
+    - ถ้าไฟล์เปลี่ยน จะ Reload ใน Background และให้บริการ Snapshot เดิมไปก่อน
+    - ส่วนที่ผูกกับเวอร์ชันของ Index (เช่น Cache คำตอบ) ลงทะเบียนด้วย on_load
+    """
+
+    def __init__(self, doc_repo: Optional[DocumentRepository] = None):
+        self.doc_repo = doc_repo or DocumentRepository()
+        self._snapshot: Optional[IndexSnapshot] = None
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._failed_signature: Optional[Tuple] = None
+        self._listeners: List[Callable[[IndexSnapshot], None]] = []
+
+    def get(self) -> IndexSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._lock:
+                loaded = self._snapshot is None
+                if loaded:
+                    self._snapshot = self._load()
+                snapshot = self._snapshot
+            if loaded:
+                self._notify(snapshot)
+            return snapshot
+
+        signature = self._signature()
+        if signature != snapshot.signature and signature != self._failed_signature:
+            self._reload_in_background()
+        return snapshot
+
+    def on_load(self, callback: Callable[[IndexSnapshot], None]):
+        """
+        เรียก callback(snapshot) ทุกครั้งที่โหลด Snapshot ใหม่ (ครั้งแรกและทุก reload)
+        ถ้าโหลดไว้แล้วจะเรียกทันทีหนึ่งครั้งด้วย Snapshot ปัจจุบัน
+        """
+        self._listeners.append(callback)
+        if self._snapshot is not None:
+            self._notify(self._snapshot, [callback])
+
+    def peek(self) -> Optional[IndexSnapshot]:
+        """Snapshot ที่ใช้อยู่ โดยไม่โหลดและไม่ตรวจไฟล์ (None ถ้ายังไม่เคยโหลด)"""
+        return self._snapshot
+
+    def _signature(self) -> Tuple:
+        sig = []
+        for path in self.doc_repo.watch_paths():
+            try:
+                st = os.stat(path)
+                sig.append((st.st_ino, st.st_size, st.st_mtime_ns))
+            except FileNotFoundError:
+                sig.append(None)
+        return tuple(sig)
+
+    def _load(self) -> IndexSnapshot:
+        chunks = self.doc_repo.load_documents()
+        index = self.doc_repo.get_index(chunks)
+        index_shards = index.shard_map()
+
+        ordered, views = [], []
+        for key, year, group in self.doc_repo.group_by_shard(chunks):
+            shard = index_shards[key]
+            scorer = SparseScorer(shard.matrix, INDEX_CONFIG["inverted_max_ratio"], inverted=shard.inverted)
+            views.append(ShardView(key, year, len(ordered), group, scorer))
+            ordered.extend(group)
+
+        dense = self.doc_repo.load_dense_index()
+        dense_chunks = None
+        if dense is not None:
+            by_hash = {c["content_hash"]: c for c in ordered}
+            dense_chunks = [by_hash.get(h) for h in dense.doc_hashes]
+
+        size_bytes = {"sparse": sum(_npy_bytes(s.path) for s in index.shards if s.path)}
+        if dense is not None:
+            size_bytes["dense"] = _npy_bytes(dense.path)
+
+        # อ่าน signature หลัง get_index เพราะอาจมีการเขียนไฟล์ Index ใหม่
+        snapshot = IndexSnapshot(
+            ordered, index.encoder, views, self._signature(), index.version, dense, dense_chunks, size_bytes
+        )
+        logger.info(f"Index loaded: {len(ordered)} chunks in {len(views)} shards (version {index.version})")
+        return snapshot
+
+    def _reload_in_background(self):
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload_worker, daemon=True).start()
+
+    def _reload_worker(self):
+        signature = self._signature()
+        try:
+            snapshot = self._load()
+            with self._lock:
+                self._snapshot = snapshot
+                self._failed_signature = None
+            self._notify(snapshot)
+        except Exception:
+            # ใช้ Snapshot เดิมต่อไป และจะลองใหม่เมื่อไฟล์เปลี่ยนอีกครั้ง
+            self._failed_signature = signature
+            logger.exception("Index reload failed, keep serving previous snapshot")
+        finally:
+            with self._lock:
+                self._reloading = False
+
+    def _notify(self, snapshot: IndexSnapshot, listeners: Optional[List[Callable]] = None):
+        for callback in listeners or list(self._listeners):
+            try:
+                callback(snapshot)
+            except Exception:
+                logger.exception("Index load listener failed")
+
+
+def _npy_bytes(folder: str) -> int:
+    try:
+        return sum(e.stat().st_size for e in os.scandir(folder) if e.name.endswith(".npy"))
+    except OSError:
+        return 0
+
+
+_holder: Optional[IndexHolder] = None
+_holder_lock = threading.Lock()
+
+
+def get_index_holder() -> IndexHolder:
+    """คืน IndexHolder ตัวเดียวที่ใช้ร่วมกันทั้ง Process"""
+    global _holder
+    if _holder is None:
+        with _holder_lock:
+            if _holder is None:
+                _holder = IndexHolder()
+    return _holder
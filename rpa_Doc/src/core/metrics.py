@@ -0,0 +1,149 @@
+# src/core/metrics.py
+"""
+Metrics แบบ Prometheus (text exposition format) สำหรับ /metrics ไม่ต้องใช้ไลบรารีหรือบริการภายนอก
+- Histogram/Counter บันทึกบน hot path: หา bucket ด้วย bisect แล้วบวกตัวนับภายใต้ lock (ไม่มี I/O ไม่จองหน่วยความจำเพิ่ม)
+- ค่าปัจจุบัน (ความลึกคิว, ขนาด Index, Cache ฯลฯ) ไม่เก็บซ้ำ อ่านจาก stats() ของแต่ละส่วนตอน /metrics ถูกเรียกเท่านั้น
+"""
+import math
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+# วินาที: ตั้งแต่ขั้นตอน CPU สั้นๆ (retrieval/log) จนถึงการ generate ที่ใช้หลายนาที
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# token ต่อวินาทีของการ generate (CPU ไม่กี่ token/s ถึง GPU หลายร้อย)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 50, 75, 100, 150, 250, 500)
+
+
+class Sample(NamedTuple):
+    """ค่าหนึ่งค่าที่อ่านตอน scrape (gauge หรือ counter)"""
+    name: str
+    kind: str
+    help: str
+    value: float
+    labels: Optional[Dict[str, str]] = None
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Sequence[float], label: Optional[str] = None):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.label = label
+        self._lock = threading.Lock()
+        # label value -> [จำนวนต่อ bucket (ช่องสุดท้าย = +Inf), sum, count]
+        self._series: Dict[str, list] = {}
+
+    def observe(self, value: float, label_value: str = ""):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label_value, (counts, total, count) in sorted(snapshot.items()):
+            base = {self.label: label_value} if self.label else {}
+            cumulative = 0
+            for bound, n in zip((*self.buckets, math.inf), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels({**base, 'le': _number(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(base)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(base)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label: Optional[str] = None):
+        self.name = name
+        self.help = help
+        self.label = label
+        self._lock = threading.Lock()
+        self._values: Dict[str, float] = {}
+
+    def inc(self, amount: float = 1, label_value: str = ""):
+        with self._lock:
+            self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(values.items()):
+            labels = {self.label: label_value} if self.label else {}
+            lines.append(f"{self.name}{_labels(labels)} {_number(value)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, object] = {}
+
+    def histogram(self, name: str, help: str, buckets: Sequence[float] = STAGE_BUCKETS,
+                  label: Optional[str] = None) -> Histogram:
+        """คืน Histogram ชื่อนี้ (สร้างใหม่ถ้ายังไม่มี)"""
+        return self._get_or_create(name, lambda: Histogram(name, help, buckets, label))
+
+    def counter(self, name: str, help: str, label: Optional[str] = None) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, help, label))
+
+    def render(self, samples: Iterable[Sample] = ()) -> str:
+        """ข้อความสำหรับ /metrics: metric ที่บันทึกไว้ + samples ที่ผู้เรียกอ่านมาตอนนี้"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        seen = set()
+        for s in samples:
+            if s.name not in seen:
+                seen.add(s.name)
+                lines.append(f"# HELP {s.name} {s.help}")
+                lines.append(f"# TYPE {s.name} {s.kind}")
+            lines.append(f"{s.name}{_labels(s.labels or {})} {_number(s.value)}")
+        return "\n".join(lines) + "\n"
+
+    def _get_or_create(self, name: str, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    value = float(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+_registry: Optional[MetricsRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """คืน MetricsRegistry ตัวเดียวที่ใช้ร่วมกันทั้ง Process"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = MetricsRegistry()
+    return _registry
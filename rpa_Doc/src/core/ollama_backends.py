@@ -0,0 +1,207 @@
+# src/core/ollama_backends.py
+"""
+กลุ่มเครื่อง Ollama หลายเครื่อง (OLLAMA_BACKENDS)
+- เลือกเครื่องที่ยังปกติและมีงานค้างน้อยที่สุด (least outstanding) ไม่เกิน max_concurrency ของแต่ละเครื่อง
+- เครื่องที่ error/timeout ติดกันจะถูกนำออกจากการใช้งาน แล้ว probe (/api/tags) ใน background จนกว่าจะกลับมา
+"""
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from src.config.settings import BACKEND_CONFIG, OLLAMA_BACKENDS
+from src.core.ollama_client import get_ollama_client
+
+logger = logging.getLogger("rag.backends")
+
+
+class NoBackendAvailableError(Exception):
+    pass
+
+
+class Backend:
+    def __init__(self, url: str, max_concurrency: int = 1, num_thread: Optional[int] = None):
+        self.url = url.rstrip("/")
+        self.max_concurrency = max(1, max_concurrency)
+        self.num_thread = num_thread
+        self.outstanding = 0
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+        self.down_since: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+
+    def state(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "max_concurrency": self.max_concurrency,
+            "num_thread": self.num_thread,
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "down_seconds": round(time.time() - self.down_since, 1) if self.down_since else None,
+        }
+
+
+def is_backend_failure(e: BaseException) -> bool:
+    """Error ที่แปลว่าเครื่องมีปัญหา (ต่อไม่ได้, timeout, 5xx) ไม่ใช่ปัญหาของ Request"""
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return isinstance(e, httpx.TransportError)
+
+
+class BackendPool:
+    def __init__(self, backends: Optional[List[Dict]] = None):
+        self.backends = [
+            Backend(b["url"], b.get("max_concurrency", 1), b.get("num_thread"))
+            for b in (backends or OLLAMA_BACKENDS)
+        ]
+        self.failure_threshold = BACKEND_CONFIG["failure_threshold"]
+        self.probe_interval = BACKEND_CONFIG["probe_interval"]
+        self.probe_timeout = BACKEND_CONFIG["probe_timeout"]
+        self.acquire_timeout = BACKEND_CONFIG["acquire_timeout"]
+        self._lock = threading.Lock()
+
+    @property
+    def total_concurrency(self) -> int:
+        return sum(b.max_concurrency for b in self.backends)
+
+    def try_acquire(self, backend: Optional[Backend] = None, exclude=()) -> Optional[Backend]:
+        """จองเครื่องที่ปกติและมีงานค้างน้อยที่สุด (None = ทุกเครื่องเต็ม) raise ถ้าไม่มีเครื่องที่ปกติเลย"""
+        with self._lock:
+            candidates = [backend] if backend is not None else self.backends
+            healthy = [b for b in candidates if b.healthy and b not in exclude]
+            if not healthy:
+                raise NoBackendAvailableError("No healthy Ollama backend")
+            free = [b for b in healthy if b.outstanding < b.max_concurrency]
+            if not free:
+                return None
+            chosen = min(free, key=lambda b: b.outstanding / b.max_concurrency)
+            chosen.outstanding += 1
+            chosen.requests += 1
+            return chosen
+
+    def release(self, backend: Backend, error: Optional[BaseException] = None):
+        """
+        คืน slot: error None = สำเร็จ (ล้างตัวนับ failure), error ของเครื่อง = นับ failure
+        error อื่น (4xx, ถูกยกเลิก/หมดเวลาฝั่งผู้เรียก) ไม่ได้บอกว่าเครื่องปกติหรือไม่ จึงไม่เปลี่ยนตัวนับ
+        """
+        with self._lock:
+            backend.outstanding -= 1
+            if error is None:
+                backend.consecutive_failures = 0
+            elif is_backend_failure(error):
+                self._mark_failure(backend, error)
+
+    def pick(self) -> Backend:
+        """
+        เครื่องที่ปกติและมีงานค้างน้อยที่สุด โดยไม่จอง slot (ใช้กับงานสั้นที่ไม่ผ่าน Scheduler เช่น embedding คำถาม)
+        ผู้เรียกต้องแจ้งผลด้วย report_success/report_failure
+        """
+        with self._lock:
+            healthy = [b for b in self.backends if b.healthy]
+            if not healthy:
+                raise NoBackendAvailableError("No healthy Ollama backend")
+            chosen = min(healthy, key=lambda b: b.outstanding / b.max_concurrency)
+            chosen.requests += 1
+            return chosen
+
+    def report_success(self, backend: Backend):
+        with self._lock:
+            backend.consecutive_failures = 0
+
+    def report_failure(self, backend: Backend, error: BaseException):
+        with self._lock:
+            self._mark_failure(backend, error)
+
+    @asynccontextmanager
+    async def lease(self, backend: Optional[Backend] = None, timeout: Optional[float] = None, exclude=()):
+        """
+        ใช้เครื่องหนึ่งเครื่องตลอดช่วง async with (คืน slot อัตโนมัติ และบันทึกผลสำเร็จ/ล้มเหลว)
+        backend = บังคับใช้เครื่องนี้, exclude = เครื่องที่ไม่ต้องการ (เช่น เครื่องที่เพิ่งต่อไม่ได้)
+        ปกติ Scheduler ส่งงานไม่เกินจำนวน slot รวม จึงได้เครื่องทันที
+        จะต้องรอก็ต่อเมื่อบางเครื่องถูกนำออก (slot ลดลง) จึงใช้การ poll สั้นๆ แทน primitive ที่ผูกกับ event loop
+        """
+        deadline = time.monotonic() + (timeout if timeout is not None else self.acquire_timeout)
+        chosen = self.try_acquire(backend, exclude)
+        while chosen is None:
+            if time.monotonic() > deadline:
+                raise NoBackendAvailableError("All Ollama backends are busy")
+            await asyncio.sleep(0.05)
+            chosen = self.try_acquire(backend, exclude)
+        try:
+            yield chosen
+        except BaseException as e:
+            self.release(chosen, e)
+            raise
+        else:
+            self.release(chosen)
+
+    def _mark_failure(self, backend: Backend, error: BaseException):
+        backend.failures += 1
+        backend.consecutive_failures += 1
+        backend.last_error = f"{type(error).__name__}: {error}"
+        if backend.healthy and backend.consecutive_failures >= self.failure_threshold:
+            backend.healthy = False
+            backend.down_since = time.time()
+            logger.warning(f"Ollama backend {backend.url} removed from rotation: {backend.last_error}")
+
+    # ---------- Health probing ----------
+
+    async def probe(self, backend: Backend) -> bool:
+        try:
+            r = await get_ollama_client().get(f"{backend.url}/api/tags", timeout=self.probe_timeout)
+            r.raise_for_status()
+        except Exception as e:
+            # probe ล้มเหลว = เครื่องใช้ไม่ได้แน่นอน นำออกทันทีโดยไม่รอครบ failure_threshold
+            with self._lock:
+                if backend.healthy:
+                    backend.consecutive_failures = self.failure_threshold - 1
+                    self._mark_failure(backend, e)
+                else:
+                    backend.last_error = f"{type(e).__name__}: {e}"
+            return False
+        with self._lock:
+            if not backend.healthy:
+                logger.info(f"Ollama backend {backend.url} back in rotation")
+            backend.healthy = True
+            backend.consecutive_failures = 0
+            backend.down_since = None
+        return True
+
+    async def probe_all(self) -> List[Dict[str, Any]]:
+        await asyncio.gather(*(self.probe(b) for b in self.backends))
+        return self.states()
+
+    async def probe_forever(self):
+        """probe เฉพาะเครื่องที่ถูกนำออก (เครื่องปกติถูกตรวจจากงานจริงอยู่แล้ว)"""
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            down = [b for b in self.backends if not b.healthy]
+            if down:
+                await asyncio.gather(*(self.probe(b) for b in down))
+
+    def states(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [b.state() for b in self.backends]
+
+
+_pool: Optional[BackendPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_backend_pool() -> BackendPool:
+    """คืน BackendPool ตัวเดียวที่ใช้ร่วมกันทั้ง Process"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BackendPool()
+    return _pool
@@ -0,0 +1,42 @@
+# src/core/ollama_client.py
+"""
+HTTP client (httpx.AsyncClient) ตัวเดียวที่ใช้ร่วมกันทั้ง Process สำหรับเรียก Ollama
+มี connection pool + keep-alive จึงไม่ต้องเปิด connection ใหม่ทุก Request
+สร้างตอน startup และปิดตอน shutdown ผ่าน lifespan ของ FastAPI (main.py)
+"""
+import asyncio
+import weakref
+import httpx
+
+from src.config.settings import OLLAMA_BASE_URL, OLLAMA_HTTP_CONFIG
+
+# แยก client ตาม event loop (httpx.AsyncClient ใช้ข้าม loop ไม่ได้ เช่นกรณีเรียกผ่าน asyncio.run)
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def _new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=OLLAMA_BASE_URL,
+        limits=httpx.Limits(
+            max_connections=OLLAMA_HTTP_CONFIG["max_connections"],
+            max_keepalive_connections=OLLAMA_HTTP_CONFIG["max_keepalive_connections"],
+            keepalive_expiry=OLLAMA_HTTP_CONFIG["keepalive_expiry"],
+        ),
+        timeout=httpx.Timeout(OLLAMA_HTTP_CONFIG["read_timeout"], connect=OLLAMA_HTTP_CONFIG["connect_timeout"]),
+    )
+
+
+def get_ollama_client() -> httpx.AsyncClient:
+    """คืน client ของ event loop ปัจจุบัน (สร้างใหม่ถ้ายังไม่มีหรือถูกปิดไปแล้ว)"""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = _new_client()
+        _clients[loop] = client
+    return client
+
+
+async def close_ollama_client():
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -1,28 +1,297 @@
-import threading
+# src/core/ollama_queue.py
+"""
+Scheduler สำหรับงานที่เรียก Ollama
+- worker หลายตัว (ค่าเริ่มต้น = จำนวน slot รวมของทุกเครื่องใน OLLAMA_BACKENDS)
+- คิวมีขนาดจำกัด ถ้าเต็มจะปฏิเสธทันที (QueueFullError พร้อมเวลาที่ควรลองใหม่)
+- แต่ละงานมี deadline ถ้ายังไม่ได้เริ่มเมื่อเลยเวลา จะถูกทิ้งก่อนถึงโมเดล
+- priority lane: งาน interactive ได้ทำก่อนงาน bulk
+- Exception จากงานถูกส่งกลับไปที่ผู้เรียกตามปกติ
+- รองรับทั้งงานแบบ sync (submit/enqueue) และ coroutine (run/enqueue_async)
+"""
+import asyncio
+import itertools
+import logging
+import math
 import queue
+import threading
 import time
+from collections import deque
+from concurrent.futures import CancelledError as FutureCancelledError, Future, TimeoutError as FutureTimeoutError
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from src.config.settings import SCHEDULER_CONFIG
+from src.core.ollama_backends import get_backend_pool
+
+logger = logging.getLogger("rag.scheduler")
+
+PRIORITIES = {"interactive": 0, "bulk": 10}
+
+
+class SchedulerError(Exception):
+    pass
+
+
+class QueueFullError(SchedulerError):
+    def __init__(self, depth: int, retry_after: int):
+        super().__init__(f"Ollama queue is full ({depth} waiting)")
+        self.depth = depth
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(SchedulerError):
+    def __init__(self, waited: float):
+        super().__init__(f"Job expired after waiting {waited:.1f}s in queue")
+        self.waited = waited
+
+
+class _JobFuture(Future):
+    # True = ถูกยกเลิกเพราะหมด deadline ฝั่งผู้เรียก (นับเป็น expired ไม่ใช่ cancelled)
+    expired = False
+
+
+class _Job:
+    __slots__ = ("func", "args", "kwargs", "future", "lane", "enqueued_at", "deadline")
+
+    def __init__(self, func, args, kwargs, lane: str, deadline: Optional[float]):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = _JobFuture()
+        self.lane = lane
+        self.enqueued_at = time.monotonic()
+        self.deadline = deadline
+
+
+class OllamaScheduler:
+    def __init__(self, num_parallel: Optional[int] = None, max_queue: Optional[int] = None,
+                 default_deadline: Optional[float] = None):
+        self.num_parallel = max(1, num_parallel or SCHEDULER_CONFIG["num_parallel"] or get_backend_pool().total_concurrency)
+        self.max_queue = max_queue if max_queue is not None else SCHEDULER_CONFIG["max_queue"]
+        self.default_deadline = default_deadline if default_deadline is not None else SCHEDULER_CONFIG["deadline"]
+
+        self._queue: "queue.PriorityQueue" = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = {lane: 0 for lane in PRIORITIES}
+        self._running = 0
+        # expired = หมด deadline ก่อนได้เริ่ม (ทั้งที่ worker และฝั่งผู้เรียก)
+        # cancelled = ผู้เรียกเลิกรอ (เช่น client ตัดการเชื่อมต่อ) ทั้งก่อนได้เริ่มและระหว่างทำ
+        self._counters = {
+            "submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "expired": 0, "cancelled": 0
+        }
+        self._waits = deque(maxlen=1000)
+        self._service_times = deque(maxlen=100)
+
+        self.workers = [
+            threading.Thread(target=self._worker_loop, name=f"ollama-worker-{i}", daemon=True)
+            for i in range(self.num_parallel)
+        ]
+        for w in self.workers:
+            w.start()
+
+    # ---------- Public API ----------
+
+    def enqueue(self, func: Callable, *args, priority: str = "interactive",
+                deadline: Optional[float] = None, **kwargs) -> Future:
+        """
+        ใส่งานเข้าคิวโดยไม่รอผล คืน Future ของงาน
+        deadline = จำนวนวินาทีที่ยอมรอในคิว (None = ค่าเริ่มต้นจาก SCHEDULER_CONFIG, 0 = ไม่จำกัด)
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority lane: {priority}")
+        wait_limit = self.default_deadline if deadline is None else deadline
+        job = _Job(func, args, kwargs, priority, time.monotonic() + wait_limit if wait_limit else None)
+
+        with self._lock:
+            depth = sum(self._pending.values())
+            if depth >= self.max_queue:
+                self._counters["rejected"] += 1
+                raise QueueFullError(depth, self._retry_after(depth))
+            self._pending[priority] += 1
+            self._counters["submitted"] += 1
+        job.future.add_done_callback(lambda f: self._on_cancelled(job) if f.cancelled() else None)
+        self._queue.put((PRIORITIES[priority], next(self._seq), job))
+        return job.future
+
+    def submit(self, func: Callable, *args, priority: str = "interactive",
+               deadline: Optional[float] = None, **kwargs) -> Any:
+        """ใส่งานเข้าคิวแล้วรอผล (Exception ของงานจะถูก raise ต่อ)"""
+        future = self.enqueue(func, *args, priority=priority, deadline=deadline, **kwargs)
+        wait_limit = self.default_deadline if deadline is None else deadline
+        if not wait_limit:
+            return future.result()
+        try:
+            return future.result(timeout=wait_limit)
+        except FutureTimeoutError:
+            # ยังไม่ได้เริ่ม = ยกเลิกได้, ถ้าเริ่มแล้วให้รอจนเสร็จ
+            if self._expire(future):
+                raise DeadlineExceededError(wait_limit)
+            return future.result()
 
-class OllamaQueue:
-    def __init__(self):
-        self.q = queue.Queue()
-        self.worker = threading.Thread(
-            target=self._worker_loop,
-            daemon=True
-        )
-        self.worker.start()
+    def enqueue_async(self, coro_factory: Callable[[], Awaitable], priority: str = "interactive",
+                      deadline: Optional[float] = None) -> "AsyncJob":
+        """
+        ใส่งานแบบ coroutine เข้าคิว (เรียกจากใน event loop) คืน AsyncJob
+        เมื่อถึงคิว worker จะสั่งให้ coroutine ทำงานบน event loop ของผู้เรียก และถือ slot ไว้จนเสร็จ
+        ผู้ที่รอคิวอยู่จึงไม่กิน thread ใดๆ (รอเป็น asyncio Future เท่านั้น)
+        """
+        loop = asyncio.get_running_loop()
+        job = AsyncJob(self, deadline)
 
-    def submit(self, func, *args, **kwargs):
-        result_q = queue.Queue()
-        self.q.put((func, args, kwargs, result_q))
-        return result_q.get()  # block แบบมีคิว
+        def _run_on_loop():
+            if job.cancelled:
+                raise asyncio.CancelledError()
+            job.task = asyncio.run_coroutine_threadsafe(coro_factory(), loop)
+            return job.task.result()
+
+        job.future = self.enqueue(_run_on_loop, priority=priority, deadline=deadline)
+        return job
+
+    async def run(self, coro_factory: Callable[[], Awaitable], priority: str = "interactive",
+                  deadline: Optional[float] = None) -> Any:
+        """ใส่งานแบบ coroutine เข้าคิวแล้วรอผล"""
+        return await self.enqueue_async(coro_factory, priority, deadline).result()
+
+    def pending(self, lane: str) -> int:
+        """จำนวนงานที่รอใน lane นี้ (ยังไม่ได้เริ่ม)"""
+        with self._lock:
+            return self._pending[lane]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits)
+            return {
+                "num_parallel": self.num_parallel,
+                "max_queue": self.max_queue,
+                "queue_depth": sum(self._pending.values()),
+                "queue_depth_by_lane": dict(self._pending),
+                "running": self._running,
+                **self._counters,
+                "wait_seconds": {
+                    "mean": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    "p50": round(_percentile(waits, 0.50), 3),
+                    "p95": round(_percentile(waits, 0.95), 3),
+                    "max": round(waits[-1], 3) if waits else 0.0,
+                },
+            }
+
+    # ---------- Internals ----------
+
+    def _on_cancelled(self, job: _Job):
+        # worker จะข้ามงานนี้ไปเอง จึงหักออกจาก pending ตั้งแต่ตอนยกเลิก
+        with self._lock:
+            self._pending[job.lane] -= 1
+            self._counters["expired" if job.future.expired else "cancelled"] += 1
+
+    def _expire(self, future: _JobFuture) -> bool:
+        """ยกเลิกงานที่ยังไม่ได้เริ่มเพราะหมด deadline (False = งานเริ่มไปแล้ว)"""
+        future.expired = True
+        if future.cancel():
+            return True
+        future.expired = False
+        return False
+
+    def _retry_after(self, depth: int) -> int:
+        """ประมาณเวลาที่คิวจะว่าง จากเวลาทำงานเฉลี่ยล่าสุด"""
+        avg = sum(self._service_times) / len(self._service_times) if self._service_times else 10.0
+        return max(1, math.ceil(avg * depth / self.num_parallel))
 
     def _worker_loop(self):
         while True:
-            func, args, kwargs, result_q = self.q.get()
+            _, _, job = self._queue.get()
             try:
-                result = func(*args, **kwargs)
-                result_q.put(result)
-            except Exception as e:
-                result_q.put(f"Error: {e}")
+                self._run(job)
             finally:
-                self.q.task_done()
+                self._queue.task_done()
+
+    def _run(self, job: _Job):
+        if not job.future.set_running_or_notify_cancel():
+            return
+
+        now = time.monotonic()
+        waited = now - job.enqueued_at
+        with self._lock:
+            self._pending[job.lane] -= 1
+            self._waits.append(waited)
+            expired = job.deadline is not None and now > job.deadline
+            if expired:
+                self._counters["expired"] += 1
+            else:
+                self._running += 1
+
+        if expired:
+            logger.warning(f"Dropped expired {job.lane} job after {waited:.1f}s in queue")
+            job.future.set_exception(DeadlineExceededError(waited))
+            return
+
+        try:
+            result = job.func(*job.args, **job.kwargs)
+        except (asyncio.CancelledError, FutureCancelledError) as e:
+            # ผู้เรียกยกเลิกระหว่างทำ (client ตัดการเชื่อมต่อ) ไม่ใช่ความผิดพลาดของ Ollama
+            with self._lock:
+                self._counters["cancelled"] += 1
+            job.future.set_exception(e)
+        except BaseException as e:
+            with self._lock:
+                self._counters["failed"] += 1
+            job.future.set_exception(e)
+        else:
+            with self._lock:
+                self._counters["completed"] += 1
+            job.future.set_result(result)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._service_times.append(time.monotonic() - now)
+
+
+class AsyncJob:
+    """งาน coroutine ในคิว: รอผลด้วย await result(), ยกเลิกด้วย cancel() (ทั้งตอนรอคิวและตอนกำลังทำ)"""
+
+    def __init__(self, scheduler: OllamaScheduler, deadline: Optional[float]):
+        self.scheduler = scheduler
+        self.wait_limit = scheduler.default_deadline if deadline is None else deadline
+        self.future: Optional[Future] = None
+        self.task: Optional[Future] = None
+        self.cancelled = False
+
+    async def result(self) -> Any:
+        try:
+            if self.wait_limit:
+                try:
+                    return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(self.future)), self.wait_limit)
+                except asyncio.TimeoutError:
+                    # ยังไม่ได้เริ่ม = ยกเลิกได้, ถ้าเริ่มแล้วให้รอจนเสร็จ
+                    if self.scheduler._expire(self.future):
+                        raise DeadlineExceededError(self.wait_limit)
+            return await asyncio.wrap_future(self.future)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+        if self.task is not None:
+            self.task.cancel()
+
+
+def _percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+_scheduler: Optional[OllamaScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_ollama_scheduler() -> OllamaScheduler:
+    """คืน Scheduler ตัวเดียวที่ใช้ร่วมกันทั้ง Process (จำกัดจำนวนงานที่ส่งถึง Ollama พร้อมกัน)"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = OllamaScheduler()
+    return _scheduler
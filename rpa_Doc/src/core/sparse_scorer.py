@@ -0,0 +1,94 @@
+from typing import List, Tuple
+import numpy as np
+import scipy.sparse as sp
+
+
+def select_top_k(rows: np.ndarray, scores: np.ndarray, k: int, min_score: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """เลือก Top-K จาก (rows, scores) ด้วย argpartition แล้วเรียงเฉพาะ K ตัวที่ได้"""
+    keep = scores >= min_score
+    rows, scores = rows[keep], scores[keep]
+    if k <= 0 or rows.size == 0:
+        return rows[:0], scores[:0]
+    if rows.size > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[part], scores[part]
+    order = np.argsort(-scores, kind="stable")
+    return rows[order], scores[order]
+
+
+class SparseScorer:
+    """
+    คำนวณคะแนน Cosine บน TF-IDF Matrix ที่ L2-normalize แล้ว (cosine = dot product)
+    - "csr": sparse dot กับทุกแถว (ต้นทุนตาม nnz ของ Matrix)
+    - "inverted": เดินตามคอลัมน์ (Inverted Index) เฉพาะ n-gram ที่อยู่ในคำถาม
+      ต้นทุนตามจำนวนแถวที่ match เท่านั้น
+    - "auto": เลือก inverted เมื่อจำนวน posting ที่ต้องแตะ น้อยกว่า inverted_max_ratio ของ nnz ทั้งหมด
+    """
+
+    def __init__(self, matrix, inverted_max_ratio: float = 0.25, inverted=None):
+        self.matrix = sp.csr_matrix(matrix)
+        # รับ CSC ที่คำนวณไว้แล้ว (เช่นจากไฟล์ mmap) เพื่อไม่ต้องสร้างสำเนาใหม่ในทุก Process
+        self.inverted = inverted if inverted is not None else self.matrix.tocsc()
+        self.col_nnz = np.diff(self.inverted.indptr)
+        self.inverted_max_ratio = inverted_max_ratio
+
+    @property
+    def n_rows(self) -> int:
+        return self.matrix.shape[0]
+
+    def score(self, q_vec, mode: str = "auto") -> Tuple[np.ndarray, np.ndarray]:
+        """คืน (rows, scores) เฉพาะแถวที่มีคะแนน > 0"""
+        q = sp.csr_matrix(q_vec)
+        if q.nnz == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        if mode == "auto":
+            touched = int(self.col_nnz[q.indices].sum())
+            mode = "inverted" if touched <= self.inverted_max_ratio * max(self.matrix.nnz, 1) else "csr"
+
+        if mode == "inverted":
+            return self._score_inverted(q.indices, q.data)
+        return self._score_csr(q)
+
+    def top_k(self, q_vec, k: int, min_score: float = 0.0, mode: str = "auto") -> Tuple[np.ndarray, np.ndarray]:
+        rows, scores = self.score(q_vec, mode)
+        return select_top_k(rows, scores, k, min_score)
+
+    def top_k_many(self, q_matrix, k: int, min_score: float = 0.0, block_size: int = 256) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        ให้คะแนนหลายคำถามด้วย sparse matrix-matrix product ครั้งเดียว แล้วเลือก Top-K รายแถว
+        แบ่งเป็น block เพื่อไม่ให้ Matrix ผลลัพธ์ใหญ่เกินหน่วยความจำ
+        """
+        q_matrix = sp.csr_matrix(q_matrix)
+        results = []
+        # transpose ของ CSC คือ CSR (features x docs) โดยไม่ต้อง copy
+        matrix_t = self.inverted.T
+        for start in range(0, q_matrix.shape[0], block_size):
+            block = (q_matrix[start:start + block_size] @ matrix_t).tocsr()
+            for r in range(block.shape[0]):
+                s, e = block.indptr[r], block.indptr[r + 1]
+                rows = block.indices[s:e].astype(np.int64, copy=False)
+                scores = block.data[s:e].astype(np.float64, copy=False)
+                results.append(select_top_k(rows, scores, k, min_score))
+        return results
+
+    def _score_csr(self, q) -> Tuple[np.ndarray, np.ndarray]:
+        res = (self.matrix @ q.T).tocsc()
+        return res.indices.astype(np.int64, copy=False), res.data.astype(np.float64, copy=False)
+
+    def _score_inverted(self, cols: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        indptr, indices, data = self.inverted.indptr, self.inverted.indices, self.inverted.data
+        row_parts, val_parts = [], []
+        for c, w in zip(cols, weights):
+            s, e = indptr[c], indptr[c + 1]
+            if s == e:
+                continue
+            row_parts.append(indices[s:e])
+            val_parts.append(data[s:e] * w)
+        if not row_parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        rows = np.concatenate(row_parts)
+        vals = np.concatenate(val_parts)
+        uniq, inv = np.unique(rows, return_inverse=True)
+        return uniq.astype(np.int64, copy=False), np.bincount(inv, weights=vals)
@@ -0,0 +1,317 @@
+# src/core/tfidf_index.py
+"""
+รูปแบบ Index บนดิสก์ที่ไม่ใช้ pickle (เปิดด้วย np.load(mmap_mode='r'))
+
+    <index_dir>/CURRENT                 ชื่อไฟล์ meta ของเวอร์ชันที่ใช้งานอยู่
+    <index_dir>/meta-<version>.json     พารามิเตอร์ analyzer, รายการ shard, manifest
+    <index_dir>/enc-<id>/               vocabulary + IDF (ใช้ร่วมกันทุก shard)
+        terms.npy                       เรียงตามตัวอักษร = ลำดับคอลัมน์
+        idf.npy
+    <index_dir>/shard-<key>-<hash>/     Matrix ของแต่ละช่วงเวลา (ปี/เดือน)
+        data.npy / indices.npy / indptr.npy              CSR (doc x term)
+        inv_data.npy / inv_indices.npy / inv_indptr.npy  CSC (inverted view)
+
+โฟลเดอร์ encoder/shard ตั้งชื่อตามเนื้อหา จึงใช้ซ้ำข้ามเวอร์ชันได้
+(scrape เดือนใหม่ จะเขียนใหม่เฉพาะ shard ที่เปลี่ยน)
+ทุก worker ที่เปิดไฟล์เดียวกันจะแชร์ page cache ร่วมกัน ไม่ต้องมีสำเนาส่วนตัว
+"""
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+from src.core.thai_tokenizer import make_word_analyzer
+
+logger = logging.getLogger("rag.index")
+
+FORMAT_VERSION = 2
+POINTER_FILE = "CURRENT"
+KEEP_VERSIONS = 2
+
+
+WORD_ANALYZER = "thai_word"
+
+
+def make_analyzer(analyzer: str, ngram_range: Tuple[int, int]):
+    """
+    สร้างฟังก์ชันตัดคำตามพารามิเตอร์ที่บันทึกไว้ใน meta
+    - "char", "char_wb", "word": analyzer ของ scikit-learn
+    - "thai_word": ตัดคำภาษาไทยด้วยพจนานุกรม (src/core/thai_tokenizer.py)
+    """
+    if analyzer == WORD_ANALYZER:
+        return make_word_analyzer(tuple(ngram_range))
+    return TfidfVectorizer(analyzer=analyzer, ngram_range=tuple(ngram_range)).build_analyzer()
+
+
+def make_vectorizer(analyzer: str, ngram_range: Tuple[int, int]) -> TfidfVectorizer:
+    """TfidfVectorizer สำหรับ fit Index ใหม่ ด้วย analyzer ตามชื่อ"""
+    if analyzer == WORD_ANALYZER:
+        return TfidfVectorizer(analyzer=make_analyzer(analyzer, ngram_range))
+    return TfidfVectorizer(analyzer=analyzer, ngram_range=tuple(ngram_range))
+
+
+class TfidfEncoder:
+    """
+    แปลงข้อความเป็น TF-IDF vector (L2-normalized) จาก vocabulary + IDF ที่อ่านจากดิสก์
+    ให้ผลเหมือน TfidfVectorizer.transform แต่ไม่ผูกกับเวอร์ชัน scikit-learn
+    """
+
+    def __init__(self, terms: np.ndarray, idf: np.ndarray, analyzer: str, ngram_range: Tuple[int, int],
+                 encoder_id: Optional[str] = None):
+        self.terms = terms
+        self.idf = idf
+        self.analyzer = analyzer
+        self.ngram_range = tuple(ngram_range)
+        self.encoder_id = encoder_id or f"enc-{time.time_ns()}"
+        self._analyze = make_analyzer(analyzer, self.ngram_range)
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer: TfidfVectorizer, analyzer: Optional[str] = None,
+                        ngram_range: Optional[Tuple[int, int]] = None) -> "TfidfEncoder":
+        """analyzer/ngram_range ต้องระบุเองเมื่อ vectorizer ใช้ analyzer แบบ callable"""
+        terms = np.asarray(vectorizer.get_feature_names_out(), dtype=str)
+        return cls(terms, np.asarray(vectorizer.idf_, dtype=np.float64),
+                   analyzer or vectorizer.analyzer, ngram_range or vectorizer.ngram_range)
+
+    @property
+    def n_features(self) -> int:
+        return self.terms.shape[0]
+
+    def build_analyzer(self):
+        return self._analyze
+
+    def lookup(self, tokens: List[str]) -> np.ndarray:
+        """คืนเลขคอลัมน์ของแต่ละ token (-1 ถ้าไม่อยู่ใน vocabulary)"""
+        if not tokens or self.n_features == 0:
+            return np.full(len(tokens), -1, dtype=np.int64)
+        arr = np.asarray(tokens, dtype=str)
+        pos = np.searchsorted(self.terms, arr)
+        pos = np.minimum(pos, self.n_features - 1)
+        return np.where(self.terms[pos] == arr, pos, -1)
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        rows, cols = [], []
+        for r, text in enumerate(texts):
+            ids = self.lookup(self._analyze(text))
+            ids = ids[ids >= 0]
+            rows.append(np.full(ids.shape[0], r, dtype=np.int64))
+            cols.append(ids)
+
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        cols = np.concatenate(cols) if cols else np.empty(0, dtype=np.int64)
+        counts = sp.csr_matrix(
+            (np.ones(rows.shape[0], dtype=np.float64), (rows, cols)),
+            shape=(len(texts), self.n_features)
+        )
+        counts.sum_duplicates()
+        counts.data *= self.idf[counts.indices]
+        return normalize(counts, norm="l2", copy=False)
+
+    def oov_ratio(self, texts: List[str]) -> float:
+        """สัดส่วน token ที่ไม่อยู่ใน vocabulary"""
+        total = missing = 0
+        for text in texts:
+            ids = self.lookup(self._analyze(text))
+            total += ids.shape[0]
+            missing += int((ids < 0).sum())
+        return missing / total if total else 0.0
+
+
+class IndexShard:
+    """Matrix ของเอกสารหนึ่งช่วงเวลา (ปีหรือเดือน)"""
+
+    def __init__(self, key: str, year: Optional[int], matrix: sp.csr_matrix,
+                 inverted: Optional[sp.csc_matrix], doc_hashes: List[str], path: Optional[str] = None):
+        self.key = key
+        self.year = year
+        self.matrix = matrix
+        self.inverted = inverted
+        self.doc_hashes = doc_hashes
+        self.path = path
+
+    @property
+    def n_rows(self) -> int:
+        return self.matrix.shape[0]
+
+
+class TfidfIndex:
+    """Index ที่โหลดจากดิสก์: encoder + shards + manifest"""
+
+    def __init__(self, encoder: TfidfEncoder, shards: List[IndexShard], manifest: Dict[str, Any],
+                 version: Optional[str] = None):
+        self.encoder = encoder
+        self.shards = shards
+        self.manifest = manifest
+        self.version = version
+
+    @property
+    def n_rows(self) -> int:
+        return sum(s.n_rows for s in self.shards)
+
+    def shard_map(self) -> Dict[str, IndexShard]:
+        return {s.key: s for s in self.shards}
+
+
+def _save_csr(folder: str, prefix: str, m):
+    np.save(os.path.join(folder, f"{prefix}data.npy"), m.data)
+    np.save(os.path.join(folder, f"{prefix}indices.npy"), m.indices)
+    np.save(os.path.join(folder, f"{prefix}indptr.npy"), m.indptr)
+
+
+def _load_arrays(folder: str, prefix: str, mmap: bool):
+    mode = "r" if mmap else None
+    return tuple(
+        np.load(os.path.join(folder, f"{prefix}{name}.npy"), mmap_mode=mode)
+        for name in ("data", "indices", "indptr")
+    )
+
+
+def _write_folder(index_dir: str, name: str, writer):
+    """เขียนลงโฟลเดอร์ชั่วคราวแล้ว rename (ถ้ามีโฟลเดอร์ชื่อเดียวกันอยู่แล้วถือว่าเนื้อหาเหมือนกัน)"""
+    folder = os.path.join(index_dir, name)
+    if os.path.isdir(folder):
+        return name
+    tmp = f"{folder}.tmp-{os.getpid()}"
+    os.makedirs(tmp, exist_ok=True)
+    writer(tmp)
+    try:
+        os.replace(tmp, folder)
+    except OSError:
+        # worker อื่นเขียนโฟลเดอร์เดียวกันเสร็จก่อน
+        shutil.rmtree(tmp, ignore_errors=True)
+    return name
+
+
+def save_encoder(index_dir: str, encoder: TfidfEncoder) -> str:
+    def _write(folder):
+        np.save(os.path.join(folder, "terms.npy"), np.asarray(encoder.terms, dtype=str))
+        np.save(os.path.join(folder, "idf.npy"), np.asarray(encoder.idf, dtype=np.float64))
+    return _write_folder(index_dir, encoder.encoder_id, _write)
+
+
+def shard_folder_name(key: str, shard_hash: str, encoder_id: str) -> str:
+    return f"shard-{key}-{shard_hash[:12]}-{encoder_id[-8:]}"
+
+
+def save_shard(index_dir: str, key: str, shard_hash: str, encoder_id: str, matrix) -> str:
+    matrix = sp.csr_matrix(matrix)
+
+    def _write(folder):
+        _save_csr(folder, "", matrix)
+        _save_csr(folder, "inv_", matrix.tocsc())
+    return _write_folder(index_dir, shard_folder_name(key, shard_hash, encoder_id), _write)
+
+
+def save_index(index_dir: str, encoder: TfidfEncoder, shards: List[Dict[str, Any]], manifest: Dict[str, Any]) -> str:
+    """
+    เขียน meta ของเวอร์ชันใหม่ แล้วสลับ CURRENT แบบ atomic
+    shards: [{"key", "year", "shard_hash", "doc_hashes", "matrix" (None = ใช้โฟลเดอร์เดิม)}]
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    save_encoder(index_dir, encoder)
+
+    shard_meta = []
+    for s in shards:
+        name = shard_folder_name(s["key"], s["shard_hash"], encoder.encoder_id)
+        if s.get("matrix") is not None:
+            name = save_shard(index_dir, s["key"], s["shard_hash"], encoder.encoder_id, s["matrix"])
+        shard_meta.append({
+            "key": s["key"],
+            "year": s.get("year"),
+            "path": name,
+            "rows": len(s["doc_hashes"]),
+            "shard_hash": s["shard_hash"],
+            "doc_hashes": s["doc_hashes"],
+        })
+
+    version = f"{manifest.get('build_hash', 'index')[:12]}-{time.time_ns()}"
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "analyzer": encoder.analyzer,
+        "ngram_range": list(encoder.ngram_range),
+        "n_features": encoder.n_features,
+        "encoder": encoder.encoder_id,
+        "shards": shard_meta,
+        "manifest": manifest,
+    }
+    meta_name = f"meta-{version}.json"
+    with open(os.path.join(index_dir, meta_name), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    pointer = os.path.join(index_dir, POINTER_FILE)
+    with open(f"{pointer}.tmp", "w", encoding="utf-8") as f:
+        f.write(meta_name)
+    os.replace(f"{pointer}.tmp", pointer)
+
+    _cleanup_old_versions(index_dir)
+    return version
+
+
+def load_index(index_dir: str, mmap: bool = True) -> Optional[TfidfIndex]:
+    """โหลดเวอร์ชันที่ CURRENT ชี้อยู่ (คืน None ถ้ายังไม่มี Index)"""
+    pointer = os.path.join(index_dir, POINTER_FILE)
+    if not os.path.exists(pointer):
+        return None
+    with open(pointer, "r", encoding="utf-8") as f:
+        meta_name = f.read().strip()
+
+    try:
+        with open(os.path.join(index_dir, meta_name), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        logger.warning(f"Index meta not readable: {meta_name}")
+        return None
+    if meta.get("format_version") != FORMAT_VERSION:
+        return None
+
+    mode = "r" if mmap else None
+    enc_folder = os.path.join(index_dir, meta["encoder"])
+    terms = np.load(os.path.join(enc_folder, "terms.npy"), mmap_mode=mode)
+    idf = np.load(os.path.join(enc_folder, "idf.npy"), mmap_mode=mode)
+    encoder = TfidfEncoder(terms, idf, meta["analyzer"], tuple(meta["ngram_range"]), meta["encoder"])
+
+    shards = []
+    for s in meta["shards"]:
+        folder = os.path.join(index_dir, s["path"])
+        shape = (s["rows"], meta["n_features"])
+        matrix = sp.csr_matrix(_load_arrays(folder, "", mmap), shape=shape, copy=False)
+        inverted = sp.csc_matrix(_load_arrays(folder, "inv_", mmap), shape=shape, copy=False)
+        shards.append(IndexShard(s["key"], s.get("year"), matrix, inverted, s["doc_hashes"], folder))
+
+    version = meta_name[len("meta-"):-len(".json")]
+    return TfidfIndex(encoder, shards, meta.get("manifest", {}), version)
+
+
+def _cleanup_old_versions(index_dir: str):
+    """ลบ meta เก่า และโฟลเดอร์ encoder/shard ที่ไม่มี meta ไหนอ้างถึงแล้ว"""
+    metas = sorted(
+        (f for f in os.listdir(index_dir) if f.startswith("meta-") and f.endswith(".json")),
+        key=lambda f: os.path.getmtime(os.path.join(index_dir, f)),
+        reverse=True
+    )
+    for f in metas[KEEP_VERSIONS:]:
+        try:
+            os.remove(os.path.join(index_dir, f))
+        except OSError:
+            pass
+
+    referenced = set()
+    for f in metas[:KEEP_VERSIONS]:
+        try:
+            with open(os.path.join(index_dir, f), "r", encoding="utf-8") as fp:
+                meta = json.load(fp)
+        except (OSError, ValueError):
+            return  # ไม่แน่ใจว่าอะไรยังถูกใช้อยู่ ไม่ลบอะไรในรอบนี้
+        referenced.add(meta["encoder"])
+        referenced.update(s["path"] for s in meta["shards"])
+
+    for d in os.listdir(index_dir):
+        if not d.startswith(("enc-", "shard-")) or ".tmp-" in d or d in referenced:
+            continue
+        # บน Windows ไฟล์ที่ยังถูก mmap อยู่จะลบไม่ได้ ข้ามไปก่อนแล้วลบในรอบถัดไป
+        shutil.rmtree(os.path.join(index_dir, d), ignore_errors=True)
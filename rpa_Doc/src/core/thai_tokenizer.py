@@ -0,0 +1,117 @@
+# src/core/thai_tokenizer.py
+"""
+ตัดคำภาษาไทยแบบ offline ด้วย Maximal Matching (เลือกการตัดที่มีคำนอกพจนานุกรมน้อยที่สุด และจำนวนคำน้อยที่สุด)
+ใช้พจนานุกรมที่แนบมากับโปรเจกต์ (lexicon/thai_tax_terms.txt) ไม่ต้องพึ่ง library ภายนอก
+"""
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LEXICON_FILE = os.path.join(os.path.dirname(__file__), "lexicon", "thai_tax_terms.txt")
+
+_THAI_RUN = re.compile(r"[ก-๛]+")
+_OTHER_TOKEN = re.compile(r"[A-Za-z]+|\d+(?:[.,]\d+)*")
+_END = ""
+
+
+def load_lexicon(path: str = LEXICON_FILE) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+class ThaiWordTokenizer:
+    def __init__(self, words: Optional[Iterable[str]] = None):
+        self.trie: Dict = {}
+        for w in (words if words is not None else load_lexicon()):
+            # คำที่มีช่องว่าง (เช่น "หัก ณ ที่จ่าย") ตัดตามช่องว่างอยู่แล้ว ใช้เฉพาะส่วนที่เป็นคำเดียว
+            for part in w.split():
+                node = self.trie
+                for ch in part:
+                    node = node.setdefault(ch, {})
+                node[_END] = True
+
+    def _prefix_ends(self, text: str, i: int) -> List[int]:
+        """ตำแหน่งสิ้นสุดของคำในพจนานุกรมที่เริ่มที่ i"""
+        ends = []
+        node = self.trie
+        for j in range(i, len(text)):
+            node = node.get(text[j])
+            if node is None:
+                break
+            if _END in node:
+                ends.append(j + 1)
+        return ends
+
+    def segment_thai(self, text: str) -> List[str]:
+        """ตัดข้อความภาษาไทยล้วน (ไม่มีช่องว่าง) ตัวอักษรที่ไม่อยู่ในคำใดจะถูกรวมเป็นคำเดียวกัน"""
+        n = len(text)
+        # best[i] = (จำนวนตัวอักษรนอกพจนานุกรม, จำนวนคำ) ของการตัด text[i:]
+        best: List[Tuple[int, int]] = [(0, 0)] * (n + 1)
+        choice = [0] * (n + 1)
+        for i in range(n - 1, -1, -1):
+            unknown, words = best[i + 1]
+            cand, nxt = (unknown + 1, words + 1), i + 1
+            for end in self._prefix_ends(text, i):
+                u, w = best[end]
+                if (u, w + 1) < cand:
+                    cand, nxt = (u, w + 1), end
+            best[i], choice[i] = cand, nxt
+
+        tokens, i, pending = [], 0, ""
+        while i < n:
+            j = choice[i]
+            piece = text[i:j]
+            if j == i + 1 and not self._is_word(piece):
+                pending += piece
+            else:
+                if pending:
+                    tokens.append(pending)
+                    pending = ""
+                tokens.append(piece)
+            i = j
+        if pending:
+            tokens.append(pending)
+        return tokens
+
+    def _is_word(self, piece: str) -> bool:
+        node = self.trie
+        for ch in piece:
+            node = node.get(ch)
+            if node is None:
+                return False
+        return _END in node
+
+    def tokenize(self, text: str) -> List[str]:
+        """ตัดคำทั้งข้อความ: ภาษาไทยใช้พจนานุกรม, ภาษาอังกฤษ/ตัวเลขตัดตามคำ"""
+        text = text.lower()
+        tokens = []
+        pos = 0
+        for m in _THAI_RUN.finditer(text):
+            tokens.extend(_OTHER_TOKEN.findall(text[pos:m.start()]))
+            tokens.extend(self.segment_thai(m.group()))
+            pos = m.end()
+        tokens.extend(_OTHER_TOKEN.findall(text[pos:]))
+        return tokens
+
+
+@lru_cache(maxsize=1)
+def default_tokenizer() -> ThaiWordTokenizer:
+    return ThaiWordTokenizer()
+
+
+def make_word_analyzer(ngram_range: Tuple[int, int] = (1, 1)):
+    """Analyzer สำหรับ TfidfVectorizer: คำ + word n-gram (ต่อคำด้วยช่องว่าง)"""
+    lo, hi = ngram_range
+    tokenizer = default_tokenizer()
+
+    def analyze(text: str) -> List[str]:
+        words = tokenizer.tokenize(text)
+        if hi <= 1:
+            return words
+        grams = list(words) if lo <= 1 else []
+        for n in range(max(lo, 2), hi + 1):
+            grams.extend(" ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+        return grams
+
+    return analyze
@@ -0,0 +1,94 @@
+# src/core/token_estimator.py
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config.settings import FILE_PATHS
+
+logger = logging.getLogger("rag.tokens")
+
+# จำนวน token ต่อตัวอักษรโดยประมาณ แยกตามชนิดตัวอักษร (ภาษาไทยใช้ token มากกว่าภาษาอังกฤษต่อตัวอักษร)
+DEFAULT_RATIOS = {
+    "thai": 0.45,
+    "latin": 0.28,
+    "digit": 0.5,
+    "space": 0.1,
+    "other": 1.0,
+}
+
+_CLASSES = {
+    "thai": re.compile(r"[฀-๿]"),
+    "latin": re.compile(r"[A-Za-z]"),
+    "digit": re.compile(r"[0-9]"),
+    "space": re.compile(r"\s"),
+}
+
+
+class TokenEstimator:
+    """
+    ประมาณจำนวน token ของข้อความ (ใช้จัดงบ context แทนการนับตัวอักษร)
+    อัตราส่วนต่อชนิดตัวอักษรปรับให้ตรงกับ tokenizer ของโมเดลได้ด้วย src.utils.calibrate_tokens
+    """
+
+    def __init__(self, ratios=None):
+        self.ratios = dict(DEFAULT_RATIOS, **(ratios or {}))
+
+    @classmethod
+    def for_model(cls, model: str, path: Optional[str] = None) -> "TokenEstimator":
+        """ใช้อัตราส่วนที่ calibrate ไว้แล้วของโมเดลนี้ (ถ้ายังไม่มีใช้ค่าเริ่มต้น)"""
+        path = path or FILE_PATHS["token_calibration"]
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f).get(model)
+                if entry:
+                    return cls(entry["ratios"])
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Cannot read token calibration {path}: {e}")
+        return cls()
+
+    @staticmethod
+    def fit(samples: List[Tuple[str, int]]) -> Dict[str, float]:
+        """
+        หาอัตราส่วน token ต่อตัวอักษรจากตัวอย่าง (ข้อความ, จำนวน token จริงจาก tokenizer ของโมเดล)
+        ด้วย least squares ชนิดตัวอักษรที่ไม่มีในตัวอย่างใช้ค่าเริ่มต้น
+        """
+        names = list(DEFAULT_RATIOS)
+        estimator = TokenEstimator()
+        X = np.array([[estimator.char_counts(text)[n] for n in names] for text, _ in samples], dtype=np.float64)
+        y = np.array([tokens for _, tokens in samples], dtype=np.float64)
+        seen = X.sum(axis=0) > 0
+        ratios = dict(DEFAULT_RATIOS)
+        if seen.any():
+            coef, *_ = np.linalg.lstsq(X[:, seen], y, rcond=None)
+            for name, value in zip([n for n, s in zip(names, seen) if s], coef):
+                ratios[name] = round(max(float(value), 0.01), 4)
+        return ratios
+
+    def char_counts(self, text: str):
+        counts = {name: len(rx.findall(text)) for name, rx in _CLASSES.items()}
+        counts["other"] = len(text) - sum(counts.values())
+        return counts
+
+    def estimate(self, text: str) -> int:
+        if not text:
+            return 0
+        counts = self.char_counts(text)
+        return int(sum(self.ratios[k] * v for k, v in counts.items())) + 1
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """ตัดข้อความให้ไม่เกิน max_tokens (ค้นหาแบบ binary search บนความยาว)"""
+        if self.estimate(text) <= max_tokens:
+            return text
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self.estimate(text[:mid]) <= max_tokens:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo]
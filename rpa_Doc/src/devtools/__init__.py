@@ -0,0 +1 @@
+"""Local development and testing tools (not used in production)"""
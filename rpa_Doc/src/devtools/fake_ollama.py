@@ -0,0 +1,193 @@
+# src/devtools/fake_ollama.py
+"""
+Ollama จำลองสำหรับทดสอบในเครื่อง (ไม่ต้องใช้ CPU/GPU รันโมเดลจริง)
+
+    python -m src.devtools.fake_ollama --port 11500 --dim 256
+    python -m src.devtools.fake_ollama --port 11500 --latency 0.8 --tokens-per-second 15 --error-rate 0.02 --parallel 2
+
+Endpoints:
+    GET  /api/tags
+    POST /api/embed    embedding แบบ deterministic จาก hash ของ char trigram
+    POST /api/generate คำตอบจำลอง (stream / non-stream) ใช้เวลาตาม latency + จำนวน token / tokens_per_second
+"""
+import argparse
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger("fake_ollama")
+
+
+class FakeOllamaConfig:
+    """
+    latency = เวลาก่อนได้ token แรก (โหลด prompt), tokens_per_second = ความเร็ว generate
+    response_tokens = ความยาวคำตอบ (ไม่เกิน num_predict ของ Request), error_rate = สัดส่วน Request ที่ตอบ 500
+    parallel = จำนวน Request ที่ generate พร้อมกันได้ (เหมือน OLLAMA_NUM_PARALLEL, 0 = ไม่จำกัด)
+    """
+
+    def __init__(self, dim: int = 256, model: str = "fake-model", latency: float = 0.0,
+                 tokens_per_second: float = 50.0, response_tokens: int = 64, error_rate: float = 0.0,
+                 parallel: int = 0, seed: Optional[int] = None):
+        self.dim = dim
+        self.model = model
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.response_tokens = response_tokens
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.slots = threading.Semaphore(parallel) if parallel else None
+
+
+def fake_embedding(text: str, dim: int) -> List[float]:
+    """ข้อความที่มี trigram ร่วมกันมากจะได้ vector ที่ใกล้กัน (พอสำหรับทดสอบ retrieval)"""
+    vec = np.zeros(dim, dtype=np.float32)
+    text = f"  {text.lower()}  "
+    for i in range(len(text) - 2):
+        h = int.from_bytes(hashlib.blake2b(text[i:i + 3].encode("utf-8"), digest_size=8).digest(), "little")
+        vec[h % dim] += 1.0 if (h >> 63) == 0 else -1.0
+    norm = np.linalg.norm(vec)
+    return (vec / norm if norm else vec).tolist()
+
+
+def fake_answer_tokens(prompt: str, n: int) -> List[str]:
+    """คำตอบจำลอง n token (ขึ้นกับ prompt เพื่อให้คำถามต่างกันได้คำตอบต่างกัน)"""
+    seed = int.from_bytes(hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).digest(), "little")
+    words = ["ภาษี", "มูลค่าเพิ่ม", "ได้รับ", "ยกเว้น", "ตาม", "มาตรา", "ประมวลรัษฎากร", "ผู้ประกอบการ", "ต้อง", "เสีย"]
+    return [words[(seed + i * 7) % len(words)] + " " for i in range(n)]
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    config: FakeOllamaConfig = FakeOllamaConfig()
+
+    def log_message(self, fmt, *args):
+        logger.debug(fmt, *args)
+
+    def _send_json(self, status: int, payload: Dict):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self) -> Dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            return self._send_json(200, {"models": [{"name": self.config.model}]})
+        self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        payload = self._read_json()
+        if self.path == "/api/embed":
+            inputs = payload.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            return self._send_json(200, {
+                "model": payload.get("model", self.config.model),
+                "embeddings": [fake_embedding(t, self.config.dim) for t in inputs],
+            })
+        if self.path == "/api/generate":
+            return self._generate(payload)
+        self._send_json(404, {"error": "not found"})
+
+    def _generate(self, payload: Dict):
+        cfg = self.config
+        if cfg.error_rate and cfg.rng.random() < cfg.error_rate:
+            return self._send_json(500, {"error": "fake ollama: injected error"})
+
+        prompt = payload.get("prompt", "")
+        num_predict = (payload.get("options") or {}).get("num_predict") or cfg.response_tokens
+        tokens = fake_answer_tokens(prompt, max(1, min(cfg.response_tokens, num_predict)))
+        per_token = 1.0 / cfg.tokens_per_second if cfg.tokens_per_second > 0 else 0.0
+        model = payload.get("model", cfg.model)
+
+        if cfg.slots is not None:
+            cfg.slots.acquire()
+        try:
+            start = time.perf_counter()
+            time.sleep(cfg.latency)
+            prompt_done = time.perf_counter()
+
+            def final_stats() -> Dict:
+                now = time.perf_counter()
+                return {
+                    "model": model,
+                    "done": True,
+                    "done_reason": "stop" if len(tokens) < num_predict else "length",
+                    "total_duration": int((now - start) * 1e9),
+                    "load_duration": 0,
+                    "prompt_eval_count": max(1, len(prompt) // 3),
+                    "prompt_eval_duration": int((prompt_done - start) * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": int((now - prompt_done) * 1e9),
+                }
+
+            if not payload.get("stream", True):
+                time.sleep(per_token * len(tokens))
+                return self._send_json(200, {"response": "".join(tokens), **final_stats()})
+
+            # stream: NDJSON หนึ่งบรรทัดต่อ token (HTTP/1.0 ไม่มี Content-Length = จบเมื่อปิด connection)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            try:
+                for tok in tokens:
+                    time.sleep(per_token)
+                    self._write_line({"model": model, "response": tok, "done": False})
+                self._write_line({"response": "", **final_stats()})
+            except (BrokenPipeError, ConnectionResetError):
+                logger.debug("client disconnected during stream")
+        finally:
+            if cfg.slots is not None:
+                cfg.slots.release()
+
+    def _write_line(self, payload: Dict):
+        self.wfile.write(json.dumps(payload, ensure_ascii=False).encode("utf-8") + b"\n")
+        self.wfile.flush()
+
+
+def start_fake_ollama(host: str = "127.0.0.1", port: int = 0, config: FakeOllamaConfig = None) -> ThreadingHTTPServer:
+    """เปิด server ใน background thread (port=0 = สุ่ม port ว่าง) ดู port จริงได้ที่ server.server_address"""
+    handler = type("ConfiguredFakeOllamaHandler", (FakeOllamaHandler,), {"config": config or FakeOllamaConfig()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Ollama server for local testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.0, help="วินาทีก่อนได้ token แรก")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="สัดส่วน /api/generate ที่ตอบ 500 (0-1)")
+    parser.add_argument("--parallel", type=int, default=0, help="จำนวน generate พร้อมกัน (0 = ไม่จำกัด)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeOllamaConfig(
+        args.dim, latency=args.latency, tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens, error_rate=args.error_rate, parallel=args.parallel, seed=args.seed
+    )
+    handler = type("ConfiguredFakeOllamaHandler", (FakeOllamaHandler,), {"config": config})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    print(f"[OK] Fake Ollama listening on http://{args.host}:{args.port} "
+          f"(latency {args.latency}s, {args.tokens_per_second} tok/s, error rate {args.error_rate})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 # app.py
 import streamlit as st
-from src.rag.pipeline import run_pipeline
+from src.rag.pipeline import run_pipeline_result
 
 st.set_page_config(
     page_title="RAG Legal Chatbot",
@@ -25,21 +25,13 @@ if st.button("ถาม AI"):
     else:
         with st.spinner("AI กำลังประมวลผล..."):
             try:
-                answer = run_pipeline(question, keywords=None, use_summary=use_summary)
+                result = run_pipeline_result(question, keywords=None, use_summary=use_summary)
 
                 st.subheader("📌 คำตอบ")
-                st.write(answer)
-
-                # โหลดเอกสาร Top-K จาก pipeline log
-                import json, os
-                log_file = "output/pipeline_feedback.json"
-                if os.path.exists(log_file):
-                    with open(log_file, "r", encoding="utf-8") as f:
-                        logs = json.load(f)
-                    last_entry = logs[-1]  # ใช้ entry ล่าสุด
-                    refs = last_entry.get("refs", [])
-                else:
-                    refs = []
+                st.write(result.answer)
+
+                # เอกสาร Top-K ของคำถามนี้ (ไม่อ่านจาก Log ซึ่งอาจเป็นของ Request อื่น)
+                refs = result.refs
 
                 if refs:
                     st.subheader("📚 เอกสารอ้างอิง")
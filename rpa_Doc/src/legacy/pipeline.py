@@ -4,17 +4,24 @@ Backward Compatibility Layer:
 This file is kept to ensure that older components (like Streamlit UI) 
 can still call run_pipeline without breaking.
 """
-from src.api.services.rag_service import RAGService
+import asyncio
+from src.api.services.rag_service import AnswerResult, RAGService
 
 # Singleton instance
 _service = RAGService()
 
+def run_pipeline_result(question: str, **kwargs) -> AnswerResult:
+    """
+    เหมือน run_pipeline แต่คืน AnswerResult ทั้งก้อน (คำตอบ + เอกสารอ้างอิงของคำถามนี้)
+    """
+    return asyncio.run(_service.ask_question(question))
+
 def run_pipeline(question: str, **kwargs) -> str:
     """
     Wrapper around the new RAGService for backward compatibility.
     """
-    return _service.ask_question(question)
+    return run_pipeline_result(question, **kwargs).answer
 
 # For direct testing
 if __name__ == "__main__":
-    print(run_pipeline("นำเข้าอาหารสัตว์ต้องเสีย vat ไหม"))
\ No newline at end of file
+    print(run_pipeline("นำเข้าอาหารสัตว์ต้องเสีย vat ไหม"))
@@ -1,19 +1,44 @@
 # src/repository/document_repository.py
+import hashlib
 import json
+import logging
 import os
-import pickle
-from typing import List, Dict, Any
-from sklearn.feature_extraction.text import TfidfVectorizer
-from src.config.settings import FILE_PATHS, SCRAPER_CONFIG
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+from src.config.settings import FILE_PATHS, SCRAPER_CONFIG, INDEX_CONFIG, DENSE_CONFIG, CHUNK_CONFIG, TH_MONTH_MAP
+from src.core.ann_index import POINTER_FILE as DENSE_POINTER_FILE, IVFIndex
+from src.core.chunker import split_passages
+from src.core.tfidf_index import (
+    POINTER_FILE, WORD_ANALYZER, IndexShard, TfidfEncoder, TfidfIndex, load_index, make_vectorizer, save_index
+)
+
+logger = logging.getLogger("rag.index")
+
+
+def content_hash(text: str) -> str:
+    """Hash ของเนื้อหาเอกสาร ใช้ตรวจว่าเอกสารเปลี่ยนหรือไม่"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def build_hash(doc_hashes: List[str]) -> str:
+    """Hash ของทั้ง Index (ลำดับเอกสารมีผล)"""
+    h = hashlib.sha1()
+    for d in doc_hashes:
+        h.update(d.encode("utf-8"))
+    return h.hexdigest()
+
 
 class DocumentRepository:
     def __init__(self):
         self.doc_file = FILE_PATHS.get("month_document_contents_filtered", FILE_PATHS["month_document_urls_filtered"])
-        self.embed_file = FILE_PATHS["tfidf_embeddings"]
+        self.index_dir = FILE_PATHS["tfidf_index"]
+        self.dense_dir = os.path.join(FILE_PATHS["dense_index"], "index")
         self.debug = True
 
     def load_documents(self) -> List[Dict]:
-        """โหลดเอกสารและแปลงเป็น Chunks สำหรับ Search"""
+        """โหลดเอกสารและแปลงเป็น Chunks (passage) สำหรับ Search"""
         if not os.path.exists(self.doc_file):
             raise FileNotFoundError(f"ไม่พบไฟล์เอกสาร: {self.doc_file}")
 
@@ -24,39 +49,211 @@ class DocumentRepository:
         if isinstance(raw_data, list) and len(raw_data) > 0 and "month" in raw_data[0]:
             for month_data in raw_data:
                 for doc in month_data.get("documents", []):
-                    search_text = f"{doc.get('title', '')} {doc.get('ข้อหารือ', '')} {doc.get('แนววินิจฉัย', '')}"
-                    chunks.append({
-                        "search_text": search_text,
-                        "title": doc.get("title", ""),
-                        "content": f"ข้อหารือ: {doc.get('ข้อหารือ', '')}\nแนววินิจฉัย: {doc.get('แนววินิจฉัย', '')}",
-                        "full_obj": doc
-                    })
+                    content = f"ข้อหารือ: {doc.get('ข้อหารือ', '')}\nแนววินิจฉัย: {doc.get('แนววินิจฉัย', '')}"
+                    chunks.extend(self._passages(doc, content, month_data.get("year"), month_data.get("month")))
         else:
             for doc in raw_data:
-                chunks.append({
-                    "search_text": f"{doc.get('title', '')} {doc.get('content', '')}",
-                    "title": doc.get("title", ""),
-                    "content": doc.get("content", ""),
-                    "full_obj": doc
-                })
-        
+                chunks.extend(self._passages(doc, doc.get("content", ""), doc.get("year"), doc.get("month")))
+
         return chunks
 
+    def _passages(self, doc: Dict, content: str, year, month) -> List[Dict]:
+        """แบ่งเอกสาร 1 ฉบับเป็น passage ซ้อนกัน แต่ละ passage อ้างกลับเอกสารแม่ด้วย doc_id + offset"""
+        title = doc.get("title", "")
+        doc_id = content_hash(f"{title}\n{content}")[:16]
+        spans = split_passages(content, CHUNK_CONFIG["passage_chars"], CHUNK_CONFIG["overlap_chars"]) or [(0, 0)]
+
+        passages = []
+        for n, (start, end) in enumerate(spans):
+            text = content[start:end]
+            search_text = f"{title} {text}"
+            passages.append({
+                "search_text": search_text,
+                "title": title,
+                "content": text,
+                "content_hash": content_hash(search_text),
+                "doc_id": doc_id,
+                "passage_id": f"{doc_id}:{start}",
+                "passage_no": n,
+                "start": start,
+                "end": end,
+                "doc_content": content,
+                "year": year,
+                "month": month,
+                "month_no": TH_MONTH_MAP.get(month),
+                "full_obj": doc
+            })
+        return passages
+
+    def watch_paths(self) -> List[str]:
+        """ไฟล์ที่ต้องเฝ้าดูว่ามีการเปลี่ยนแปลงหรือไม่ (ใช้โดย IndexHolder)"""
+        paths = [self.doc_file, os.path.join(self.index_dir, POINTER_FILE)]
+        if DENSE_CONFIG["enabled"]:
+            paths.append(os.path.join(self.dense_dir, DENSE_POINTER_FILE))
+        return paths
+
+    def load_index(self) -> Optional[TfidfIndex]:
+        return load_index(self.index_dir, mmap=True)
+
+    def load_dense_index(self) -> Optional[IVFIndex]:
+        """โหลด Dense Index (ถ้าเปิดใช้และสร้างไว้แล้ว)"""
+        if not DENSE_CONFIG["enabled"]:
+            return None
+        index = IVFIndex.load(self.dense_dir, mmap=True)
+        if index is None:
+            logger.warning(f"Dense retrieval enabled but no index at {self.dense_dir}")
+        return index
+
+    def shard_key(self, chunk: Dict) -> str:
+        """คีย์ของ shard ที่เอกสารนี้อยู่ ("2567" หรือ "2567-03" ตาม INDEX_CONFIG["shard_by"])"""
+        year = str(chunk.get("year") or "unknown")
+        if INDEX_CONFIG["shard_by"] == "month" and chunk.get("month_no"):
+            return f"{year}-{int(chunk['month_no']):02d}"
+        return year
+
+    def group_by_shard(self, chunks: List[Dict]) -> List[Tuple[str, Optional[int], List[Dict]]]:
+        """แบ่ง Chunks ตาม shard (เรียงจากใหม่ไปเก่า) คืน [(key, year, chunks)]"""
+        groups: Dict[str, List[Dict]] = {}
+        for c in chunks:
+            groups.setdefault(self.shard_key(c), []).append(c)
+        result = []
+        for key in sorted(groups, reverse=True):
+            year = groups[key][0].get("year")
+            result.append((key, int(year) if str(year).isdigit() else None, groups[key]))
+        return result
+
+    def get_index(self, chunks: List[Dict]) -> TfidfIndex:
+        """Load or Create TF-IDF Index แบบแบ่ง shard (ตรวจความสดใหม่ด้วย Content Hash)"""
+        groups = self.group_by_shard(chunks)
+        index_hash = build_hash([
+            f"{key}:{build_hash([c['content_hash'] for c in group])}" for key, _, group in groups
+        ])
+
+        index = self.load_index()
+        if index is not None and (index.encoder.analyzer, index.encoder.ngram_range) != self.analyzer_params():
+            logger.info("TF-IDF analyzer changed, full rebuild")
+            index = None
+        if index is not None:
+            if index.manifest.get("build_hash") == index_hash:
+                return index
+            updated = self._incremental_update(groups, index_hash, index)
+            if updated is not None:
+                return updated
+
+        return self._full_build(groups, index_hash)
+
     def get_retriever(self, chunks: List[Dict]):
-        """Load or Create TF-IDF Embeddings"""
-        corpus = [c["search_text"] for c in chunks]
-        
-        if os.path.exists(self.embed_file):
-            with open(self.embed_file, "rb") as f:
-                vectorizer, matrix = pickle.load(f)
-            if matrix.shape[0] == len(chunks):
-                return vectorizer, matrix
-        
-        vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4))
-        matrix = vectorizer.fit_transform(corpus)
-        
-        os.makedirs(os.path.dirname(self.embed_file), exist_ok=True)
-        with open(self.embed_file, "wb") as f:
-            pickle.dump((vectorizer, matrix), f)
-            
-        return vectorizer, matrix
+        """คืน (vectorizer, matrix) แบบเดิม (ลำดับแถวตาม group_by_shard) สำหรับโค้ดที่ยังเรียกใช้ API นี้"""
+        index = self.get_index(chunks)
+        return index.encoder, sp.vstack([s.matrix for s in index.shards], format="csr")
+
+    def analyzer_params(self) -> Tuple[str, Tuple[int, int]]:
+        """analyzer และ ngram_range ตาม INDEX_CONFIG ("thai_word" ใช้ word_ngram_range)"""
+        analyzer = INDEX_CONFIG["analyzer"]
+        key = "word_ngram_range" if analyzer == WORD_ANALYZER else "ngram_range"
+        return analyzer, tuple(INDEX_CONFIG[key])
+
+    def _full_build(self, groups, index_hash: str) -> TfidfIndex:
+        corpus = [c["search_text"] for _, _, group in groups for c in group]
+        analyzer, ngram_range = self.analyzer_params()
+        vectorizer = make_vectorizer(analyzer, ngram_range)
+        matrix = vectorizer.fit_transform(corpus).tocsr()
+
+        shards, offset = [], 0
+        for key, year, group in groups:
+            doc_hashes = [c["content_hash"] for c in group]
+            shards.append({
+                "key": key,
+                "year": year,
+                "shard_hash": build_hash(doc_hashes),
+                "doc_hashes": doc_hashes,
+                "matrix": matrix[offset:offset + len(group)],
+            })
+            offset += len(group)
+
+        encoder = TfidfEncoder.from_vectorizer(vectorizer, analyzer, ngram_range)
+        index = self._save(encoder, shards, index_hash, {
+            "mode": "full",
+            "fit_doc_count": len(corpus),
+            "drift_docs": 0,
+            "changed_shards": [s["key"] for s in shards],
+        })
+        logger.info(f"TF-IDF full build: {len(corpus)} docs in {len(shards)} shards")
+        return index
+
+    def _incremental_update(self, groups, index_hash: str, index: TfidfIndex) -> Optional[TfidfIndex]:
+        """
+        ใช้ shard เดิมที่ไม่เปลี่ยน และใน shard ที่เปลี่ยน transform เฉพาะเอกสารใหม่ (Vocabulary/IDF เดิม)
+        คืน None ถ้า Drift เกิน Threshold (ให้ไปทำ Full Refit แทน)
+        """
+        manifest, encoder = index.manifest, index.encoder
+        old_hashes = {h for shard in index.shards for h in shard.doc_hashes}
+        new_hashes = {c["content_hash"] for _, _, group in groups for c in group}
+        added = [c for _, _, group in groups for c in group if c["content_hash"] not in old_hashes]
+        removed = len(old_hashes - new_hashes)
+
+        drift_docs = manifest.get("drift_docs", 0) + len(added) + removed
+        drift = drift_docs / max(len(new_hashes), 1)
+        if drift > INDEX_CONFIG["refit_drift_threshold"]:
+            logger.info(f"TF-IDF drift {drift:.2%} exceeds threshold, full refit")
+            return None
+
+        oov = encoder.oov_ratio([c["search_text"] for c in added])
+        if oov > INDEX_CONFIG["refit_oov_threshold"]:
+            logger.info(f"TF-IDF OOV ratio {oov:.2%} exceeds threshold, full refit")
+            return None
+
+        old_shards = index.shard_map()
+        shards, changed = [], []
+        for key, year, group in groups:
+            doc_hashes = [c["content_hash"] for c in group]
+            shard_hash = build_hash(doc_hashes)
+            prev = old_shards.get(key)
+            entry = {"key": key, "year": year, "shard_hash": shard_hash, "doc_hashes": doc_hashes, "matrix": None}
+            if prev is None or prev.doc_hashes != doc_hashes:
+                entry["matrix"] = self._rebuild_shard_rows(encoder, prev, group)
+                changed.append(key)
+            shards.append(entry)
+
+        updated = self._save(encoder, shards, index_hash, {
+            "mode": "incremental",
+            "fit_doc_count": manifest.get("fit_doc_count", index.n_rows),
+            "drift_docs": drift_docs,
+            "changed_shards": changed,
+        })
+        logger.info(
+            f"TF-IDF incremental update: +{len(added)} / -{removed} docs, shards {changed} "
+            f"(drift {drift:.2%}, oov {oov:.2%})"
+        )
+        return updated
+
+    def _rebuild_shard_rows(self, encoder: TfidfEncoder, prev: Optional[IndexShard], group: List[Dict]):
+        """สร้าง Matrix ของ shard ใหม่ โดยใช้แถวเดิมของเอกสารที่ยังอยู่ และ transform เฉพาะเอกสารใหม่"""
+        old_rows = {h: i for i, h in enumerate(prev.doc_hashes)} if prev is not None else {}
+        new_positions = [i for i, c in enumerate(group) if c["content_hash"] not in old_rows]
+        base_rows = prev.n_rows if prev is not None else 0
+
+        parts = [prev.matrix] if prev is not None else []
+        if new_positions:
+            parts.append(encoder.transform([group[i]["search_text"] for i in new_positions]))
+        stacked = sp.vstack(parts, format="csr")
+
+        # เรียงแถวให้ตรงกับลำดับเอกสารใน shard
+        new_row_of = {pos: base_rows + j for j, pos in enumerate(new_positions)}
+        order = np.fromiter(
+            (old_rows.get(c["content_hash"], new_row_of.get(i, -1)) for i, c in enumerate(group)),
+            dtype=np.int64,
+            count=len(group)
+        )
+        return stacked[order]
+
+    def _save(self, encoder: TfidfEncoder, shards: List[Dict], index_hash: str, build_info: Dict[str, Any]) -> TfidfIndex:
+        manifest = {
+            "build_hash": index_hash,
+            "built_at": datetime.now().isoformat(),
+            "doc_count": sum(len(s["doc_hashes"]) for s in shards),
+            **build_info,
+        }
+        save_index(self.index_dir, encoder, shards, manifest)
+        # เปิดกลับแบบ mmap เพื่อให้ทุก worker ใช้หน่วยความจำชุดเดียวกัน
+        return self.load_index()
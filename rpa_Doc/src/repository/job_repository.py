@@ -0,0 +1,77 @@
+# src/repository/job_repository.py
+"""
+เก็บงานถาม-ตอบแบบ asynchronous (/rag/jobs) ใน SQLite (WAL) งานที่ยังไม่เสร็จจึงอยู่รอดข้ามการ restart
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import JOB_CONFIG
+
+# สถานะของงาน: queued -> running -> succeeded / failed
+ACTIVE_STATUSES = ("queued", "running")
+
+_COLUMNS = ("id", "status", "question", "year_from", "year_to", "created_at", "updated_at",
+            "partial_answer", "result", "error")
+
+
+class JobRepository:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or JOB_CONFIG["path"]
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT, question TEXT, year_from INTEGER, year_to INTEGER,"
+            " created_at REAL, updated_at REAL, partial_answer TEXT, result TEXT, error TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def create(self, job_id: str, question: str, year_from: Optional[int], year_to: Optional[int]) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, question, year_from, year_to, created_at, updated_at, partial_answer)"
+                " VALUES (?, 'queued', ?, ?, ?, ?, ?, '')",
+                (job_id, question, year_from, year_to, now, now)
+            )
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields):
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+        fields["updated_at"] = time.time()
+        names = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {names} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_active(self) -> List[Dict[str, Any]]:
+        """งานที่ยังไม่เสร็จ เรียงตามเวลาที่ส่งเข้ามา (ใช้ต่องานหลัง restart)"""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    def purge(self, older_than: float) -> int:
+        """ลบงานที่จบแล้วและเก่ากว่าเวลาที่กำหนด"""
+        with self._lock:
+            cur = self._db.execute(
+                "DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND updated_at < ?", (older_than,)
+            )
+        return cur.rowcount
+
+    def _to_dict(self, row) -> Dict[str, Any]:
+        job = dict(zip(_COLUMNS, row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
@@ -1,34 +1,219 @@
 # src/repository/log_repository.py
+"""
+ประวัติการถาม-ตอบ เก็บแบบ append-only ใน SQLite (WAL)
+- บันทึกหนึ่งรายการ = INSERT หนึ่งแถว (ไม่ต้องอ่าน/เขียนไฟล์ทั้งไฟล์) หลาย worker เขียนพร้อมกันได้
+- เก็บย้อนหลังตาม LOG_CONFIG (จำนวน/ขนาด/อายุ) รายการที่เกินถูกลบตอน compact
+- ไฟล์ JSON แบบเก่า (pipeline_feedback.json) ถูกนำเข้าอัตโนมัติครั้งแรก
+- domain/status/main_reference แยกเป็นคอลัมน์ที่มี index ใช้กรองและแบ่งหน้า (query) โดยไม่ต้องอ่านทั้งหมด
+"""
 import json
+import logging
 import os
-from typing import List, Dict
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.config.settings import LOG_CONFIG
+
+logger = logging.getLogger("rag.logs")
+
+# คอลัมน์ที่ใช้กรองได้ (ค่าเดียวกับ field ใน log)
+FILTER_COLUMNS = ("domain", "status", "main_reference")
+
+# field ที่ส่งกลับในโหมด summary (ไม่มีคำตอบและรายการอ้างอิงฉบับเต็ม)
+SUMMARY_FIELDS = ("timestamp", "question", "answer_source")
+
+_INSERT = "INSERT INTO logs (created_at, size, domain, status, main_reference, entry) VALUES (?, ?, ?, ?, ?, ?)"
+
 
 class LogRepository:
-    def __init__(self):
-        self.log_file = "output/pipeline_feedback.json"
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or LOG_CONFIG["path"]
+        self.max_entries = LOG_CONFIG["max_entries"]
+        self.max_bytes = LOG_CONFIG["max_bytes"]
+        self.max_age = LOG_CONFIG["max_age_days"] * 86400 if LOG_CONFIG["max_age_days"] else None
+        self.compact_every = LOG_CONFIG["compact_every"]
+        self._lock = threading.Lock()
+        self._writes = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # timeout = เวลารอ lock เมื่อ worker อื่นกำลังเขียน
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS logs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, size INTEGER NOT NULL,"
+            " domain TEXT, status TEXT, main_reference TEXT, entry TEXT NOT NULL)"
+        )
+        self._migrate()
+        self._db.execute("CREATE INDEX IF NOT EXISTS logs_created_at ON logs (created_at)")
+        for col in FILTER_COLUMNS:
+            self._db.execute(f"CREATE INDEX IF NOT EXISTS logs_{col} ON logs ({col}, id)")
+        self._import_legacy(LOG_CONFIG["legacy_json"])
 
     def save_log(self, entry: Dict):
-        """Append log to JSON file"""
-        logs = self.get_all_logs()
-        logs.append(entry)
-        # Keep last 50 logs only
-        logs = logs[-50:]
-        
-        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
-        with open(self.log_file, "w", encoding="utf-8") as f:
-            json.dump(logs, f, ensure_ascii=False, indent=2)
+        """เพิ่ม log หนึ่งรายการต่อท้าย"""
+        self.save_logs([entry])
 
-    def get_all_logs(self) -> List[Dict]:
-        """ดึงประวัติการถาม-ตอบ ทั้งหมด"""
-        if os.path.exists(self.log_file):
+    def save_logs(self, entries: List[Dict]):
+        """เพิ่ม log หลายรายการใน transaction เดียว (ใช้โดย LogSink)"""
+        rows = [_to_row(entry) for entry in entries]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
             try:
-                with open(self.log_file, "r", encoding="utf-8") as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+                self._db.executemany(_INSERT, rows)
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            before = self._writes
+            self._writes += len(rows)
+            due = self.compact_every and self._writes // self.compact_every > before // self.compact_every
+        if due:
+            self.compact()
+
+    def get_all_logs(self) -> List[Dict]:
+        """ดึงประวัติการถาม-ตอบ ทั้งหมด (เก่าไปใหม่)"""
+        with self._lock:
+            rows = self._db.execute("SELECT entry FROM logs ORDER BY id").fetchall()
+        return [json.loads(r[0]) for r in rows]
 
     def get_last_log(self) -> Dict:
         """ดึง Log ล่าสุด"""
-        logs = self.get_all_logs()
-        return logs[-1] if logs else {}
+        with self._lock:
+            row = self._db.execute("SELECT entry FROM logs ORDER BY id DESC LIMIT 1").fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def query(self, limit: int = 50, cursor: Optional[int] = None, since: Optional[float] = None,
+              until: Optional[float] = None, summary: bool = False,
+              **filters: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        ดึง log ใหม่ไปเก่าทีละหน้า คืน (รายการ, cursor ของหน้าถัดไป หรือ None ถ้าหมดแล้ว)
+        cursor = id ของรายการสุดท้ายในหน้าก่อน, since/until = ช่วงเวลา (epoch seconds)
+        filters = domain/status/main_reference (ตรงทุกตัวอักษร), summary = ไม่ส่งคำตอบและรายการอ้างอิง
+        """
+        where, params = [], []
+        if cursor is not None:
+            where.append("id < ?")
+            params.append(cursor)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            params.append(until)
+        for col in FILTER_COLUMNS:
+            if filters.get(col) is not None:
+                where.append(f"{col} = ?")
+                params.append(filters[col])
+
+        if summary:
+            fields = ", ".join(f"json_extract(entry, '$.{f}')" for f in SUMMARY_FIELDS)
+            select = f"id, {', '.join(FILTER_COLUMNS)}, {fields}"
+        else:
+            select = "id, entry"
+        sql = f"SELECT {select} FROM logs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(sql, (*params, limit + 1)).fetchall()
+
+        items = []
+        for row in rows[:limit]:
+            if summary:
+                item = dict(zip(("id", *FILTER_COLUMNS, *SUMMARY_FIELDS), row))
+            else:
+                item = {"id": row[0], **json.loads(row[1])}
+            items.append(item)
+        next_cursor = items[-1]["id"] if len(rows) > limit else None
+        return items, next_cursor
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM logs").fetchone()[0]
+
+    def compact(self) -> int:
+        """ลบรายการที่เกินเกณฑ์เก็บย้อนหลัง แล้วคืนพื้นที่ของ WAL คืนจำนวนรายการที่ลบ"""
+        deleted = 0
+        with self._lock:
+            if self.max_age:
+                deleted += self._db.execute(
+                    "DELETE FROM logs WHERE created_at < ?", (time.time() - self.max_age,)
+                ).rowcount
+            if self.max_entries:
+                deleted += self._db.execute(
+                    "DELETE FROM logs WHERE id <= (SELECT id FROM logs ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (self.max_entries,)
+                ).rowcount
+            if self.max_bytes:
+                # เก็บรายการใหม่สุดที่ขนาดรวมไม่เกิน max_bytes
+                row = self._db.execute(
+                    "SELECT id FROM (SELECT id, SUM(size) OVER (ORDER BY id DESC) AS total FROM logs)"
+                    " WHERE total > ? ORDER BY id DESC LIMIT 1", (self.max_bytes,)
+                ).fetchone()
+                if row:
+                    deleted += self._db.execute("DELETE FROM logs WHERE id <= ?", (row[0],)).rowcount
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if deleted:
+            logger.info(f"Log store compacted: {deleted} entries removed")
+        return deleted
+
+    def vacuum(self):
+        """เขียนไฟล์ฐานข้อมูลใหม่เพื่อคืนพื้นที่ของแถวที่ถูกลบ (ใช้ตอนบำรุงรักษา ไม่ใช่ระหว่างให้บริการ)"""
+        with self._lock:
+            self._db.execute("VACUUM")
+
+    def _migrate(self):
+        """ฐานข้อมูลรุ่นก่อนไม่มีคอลัมน์สำหรับกรอง: เพิ่มคอลัมน์แล้วเติมค่าจาก entry"""
+        columns = {r[1] for r in self._db.execute("PRAGMA table_info(logs)")}
+        missing = [c for c in FILTER_COLUMNS if c not in columns]
+        if not missing:
+            return
+        for col in missing:
+            self._db.execute(f"ALTER TABLE logs ADD COLUMN {col} TEXT")
+        assignments = ", ".join(f"{c} = json_extract(entry, '$.{c}')" for c in missing)
+        self._db.execute(f"UPDATE logs SET {assignments}")
+        logger.info(f"Log store migrated: added columns {missing}")
+
+    def _import_legacy(self, json_path: Optional[str]):
+        """นำเข้า log จากไฟล์ JSON แบบเก่าครั้งเดียว แล้วเปลี่ยนชื่อไฟล์เป็น .migrated"""
+        if not json_path or not os.path.exists(json_path):
+            return
+        try:
+            with open(json_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cannot import legacy log file {json_path}: {e}")
+            return
+        rows = [_to_row(entry) for entry in entries]
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # worker อื่นอาจนำเข้าไปแล้ว
+                imported = os.path.exists(json_path)
+                if imported:
+                    self._db.executemany(_INSERT, rows)
+                    os.replace(json_path, json_path + ".migrated")
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        if imported:
+            logger.info(f"Imported {len(rows)} legacy log entries from {json_path}")
+
+
+def _to_row(entry: Dict) -> Tuple:
+    data = json.dumps(entry, ensure_ascii=False)
+    return (_entry_time(entry), len(data), *(entry.get(c) for c in FILTER_COLUMNS), data)
+
+
+def _entry_time(entry: Dict) -> float:
+    """เวลาของ log จาก field timestamp (ISO) ถ้าไม่มีใช้เวลาปัจจุบัน"""
+    try:
+        return datetime.fromisoformat(entry["timestamp"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return time.time()
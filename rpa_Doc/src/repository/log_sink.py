@@ -0,0 +1,156 @@
+# src/repository/log_sink.py
+"""
+ตัวเขียน Log เบื้องหลัง: Request ใส่ log ลง buffer ในหน่วยความจำแล้วไปต่อทันที (ไม่รอดิสก์)
+thread เบื้องหลังเขียนลง LogRepository เป็น batch เมื่อครบ batch_size หรือทุก flush_interval วินาที
+buffer มีขนาดจำกัด ถ้าเต็มจะทิ้ง log และนับใน dropped
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from src.config.settings import LOG_CONFIG
+from src.core.metrics import get_metrics
+from src.repository.log_repository import LogRepository
+
+logger = logging.getLogger("rag.logs")
+
+_STOP = object()
+
+WRITE_SECONDS = get_metrics().histogram("rag_log_write_seconds", "Time to write one batch of Q&A logs to the log store")
+
+
+class LogSink:
+    def __init__(self, repo: Optional[LogRepository] = None, buffer_size: Optional[int] = None,
+                 batch_size: Optional[int] = None, flush_interval: Optional[float] = None):
+        self.repo = repo or LogRepository()
+        self.batch_size = batch_size or LOG_CONFIG["batch_size"]
+        self.flush_interval = flush_interval if flush_interval is not None else LOG_CONFIG["flush_interval"]
+        self._buffer: "queue.Queue" = queue.Queue(maxsize=buffer_size or LOG_CONFIG["buffer_size"])
+        self._lock = threading.Lock()
+        # ใช้ร่วมกันระหว่าง thread เขียนและ flush() ที่ถูกเรียกจากภายนอก
+        self._write_lock = threading.Lock()
+        self.counters = {"submitted": 0, "written": 0, "dropped": 0, "batches": 0, "errors": 0}
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-sink", daemon=True)
+        self._thread.start()
+
+    def submit(self, entry: Dict):
+        """ใส่ log ลง buffer (ไม่บล็อก)"""
+        if self._closed:
+            # หลัง shutdown ไม่มี thread เบื้องหลังแล้ว เขียนตรง
+            self._write([entry])
+            return
+        try:
+            self._buffer.put_nowait(entry)
+        except queue.Full:
+            with self._lock:
+                self.counters["dropped"] += 1
+            return
+        with self._lock:
+            self.counters["submitted"] += 1
+
+    def flush(self, timeout: float = 10.0):
+        """เขียน log ที่ส่งเข้ามาก่อนหน้านี้ทั้งหมดให้เสร็จก่อนคืนค่า"""
+        if self._closed or not self._thread.is_alive():
+            while self._write(self._drain(self.batch_size)):
+                pass
+            return
+        # ส่ง marker ต่อท้ายคิว thread เขียนจะเขียน batch ที่ถืออยู่ทันทีเมื่อถึง marker
+        # (flush เองอ่านจากคิวไม่เห็น log ที่ thread ดึงไปรอครบ batch แล้ว)
+        done = threading.Event()
+        try:
+            self._buffer.put(done, timeout=timeout)
+        except queue.Full:
+            logger.warning("Log buffer still full, flush gave up")
+            return
+        done.wait(timeout)
+
+    def close(self, timeout: float = 10.0):
+        """หยุด thread เบื้องหลังหลังเขียน log ที่ค้างทั้งหมด (เรียกตอน shutdown)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._buffer.put(_STOP)
+        self._thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counters, "buffered": self._buffer.qsize(), "capacity": self._buffer.maxsize}
+
+    # ---------- Internals ----------
+
+    def _run(self):
+        while True:
+            batch: List[Dict] = []
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            flushed: Optional[threading.Event] = None
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._buffer.get(timeout=max(deadline - time.monotonic(), 0.0))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                if isinstance(item, threading.Event):
+                    flushed = item
+                    break
+                batch.append(item)
+            self._write(batch)
+            if flushed is not None:
+                flushed.set()
+            if stop:
+                return
+
+    def _drain(self, limit: int) -> List[Dict]:
+        batch: List[Dict] = []
+        while len(batch) < limit:
+            try:
+                item = self._buffer.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, threading.Event):
+                # marker ของ flush() ที่ค้างอยู่ตอนปิด: ไม่ให้ผู้เรียกรอจน timeout
+                item.set()
+            elif item is not _STOP:
+                batch.append(item)
+        return batch
+
+    def _write(self, batch: List[Dict]) -> int:
+        if not batch:
+            return 0
+        with self._write_lock:
+            started = time.perf_counter()
+            try:
+                self.repo.save_logs(batch)
+                WRITE_SECONDS.observe(time.perf_counter() - started)
+            except Exception:
+                logger.exception(f"Failed to write {len(batch)} log entries")
+                with self._lock:
+                    self.counters["errors"] += 1
+                    self.counters["dropped"] += len(batch)
+                return len(batch)
+        with self._lock:
+            self.counters["written"] += len(batch)
+            self.counters["batches"] += 1
+        return len(batch)
+
+
+_sink: Optional[LogSink] = None
+_sink_lock = threading.Lock()
+
+
+def get_log_sink() -> LogSink:
+    """คืน LogSink ตัวเดียวที่ใช้ร่วมกันทั้ง Process (log ที่ค้างจะถูกเขียนตอนปิดโปรแกรม)"""
+    global _sink
+    if _sink is None:
+        with _sink_lock:
+            if _sink is None:
+                _sink = LogSink()
+                atexit.register(_sink.close)
+    return _sink
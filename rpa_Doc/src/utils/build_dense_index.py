@@ -0,0 +1,122 @@
+# src/utils/build_dense_index.py
+"""
+สร้าง Dense Index (Ollama Embeddings + IVF) แบบ offline
+
+    python -m src.utils.build_dense_index
+    python -m src.utils.build_dense_index --batch-size 64 --base-url http://127.0.0.1:11500
+
+Embedding ถูกบันทึกเป็น batch ลงโฟลเดอร์ work/ ทันทีที่ได้ผล
+ถ้าหยุดกลางทาง รันคำสั่งเดิมซ้ำจะทำต่อจาก batch ล่าสุด (และเอกสารที่ไม่เปลี่ยนจะไม่ถูก embed ใหม่)
+"""
+import argparse
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+import numpy as np
+from src.config.settings import DENSE_CONFIG, FILE_PATHS, OLLAMA_BASE_URL
+from src.core.ann_index import IVFIndex
+from src.api.services.embedding_service import EmbeddingService
+from src.repository.document_repository import DocumentRepository
+
+
+class EmbeddingStore:
+    """เก็บ embedding ที่ได้แล้วเป็นไฟล์ batch-XXXXX.npy + .json (content hash ของแต่ละแถว)"""
+
+    def __init__(self, work_dir: str):
+        self.work_dir = work_dir
+        os.makedirs(work_dir, exist_ok=True)
+        self.location: Dict[str, Tuple[str, int]] = {}
+        self.n_batches = 0
+        for name in sorted(os.listdir(work_dir)):
+            if not (name.startswith("batch-") and name.endswith(".json")):
+                continue
+            npy = name[:-len(".json")] + ".npy"
+            if not os.path.exists(os.path.join(work_dir, npy)):
+                continue
+            with open(os.path.join(work_dir, name), "r", encoding="utf-8") as f:
+                for row, h in enumerate(json.load(f)):
+                    self.location[h] = (npy, row)
+            self.n_batches += 1
+
+    def __contains__(self, content_hash: str) -> bool:
+        return content_hash in self.location
+
+    def append(self, hashes: List[str], vectors: np.ndarray):
+        base = f"batch-{self.n_batches:05d}"
+        # เขียน .npy ก่อน .json (batch ที่มี .json ถือว่าสมบูรณ์)
+        np.save(os.path.join(self.work_dir, f"{base}.npy"), vectors.astype(np.float32))
+        tmp = os.path.join(self.work_dir, f"{base}.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(hashes, f)
+        os.replace(tmp, os.path.join(self.work_dir, f"{base}.json"))
+        for row, h in enumerate(hashes):
+            self.location[h] = (f"{base}.npy", row)
+        self.n_batches += 1
+
+    def gather(self, hashes: List[str]) -> np.ndarray:
+        cache: Dict[str, np.ndarray] = {}
+        rows = []
+        for h in hashes:
+            npy, row = self.location[h]
+            if npy not in cache:
+                cache[npy] = np.load(os.path.join(self.work_dir, npy), mmap_mode="r")
+            rows.append(cache[npy][row])
+        return np.vstack(rows) if rows else np.empty((0, 0), dtype=np.float32)
+
+
+def build_dense_index(base_url: str = OLLAMA_BASE_URL, batch_size: int = None) -> str:
+    repo = DocumentRepository()
+    chunks = repo.load_documents()
+    service = EmbeddingService(base_url)
+    batch_size = batch_size or service.batch_size
+
+    base_dir = FILE_PATHS["dense_index"]
+    model_dir = re.sub(r"[^A-Za-z0-9_.-]", "_", service.model)
+    store = EmbeddingStore(os.path.join(base_dir, "work", model_dir))
+
+    todo: Dict[str, str] = {}
+    for c in chunks:
+        if c["content_hash"] not in store:
+            todo.setdefault(c["content_hash"], c["search_text"])
+    print(f"[INFO] Documents: {len(chunks)} | already embedded: {len(chunks) - len(todo)} | to embed: {len(todo)}")
+
+    items = list(todo.items())
+    start = time.perf_counter()
+    for i in range(0, len(items), batch_size):
+        batch = items[i:i + batch_size]
+        vectors = service.embed([text for _, text in batch])
+        store.append([h for h, _ in batch], vectors)
+        done = i + len(batch)
+        rate = done / max(time.perf_counter() - start, 1e-9)
+        print(f"[INFO] Embedded {done}/{len(items)} ({rate:.1f} docs/s)")
+
+    hashes = [c["content_hash"] for c in chunks]
+    index = IVFIndex.build(
+        store.gather(hashes),
+        meta={
+            "model": service.model,
+            "built_at": datetime.now().isoformat(),
+            "doc_hashes": hashes,
+        },
+        n_lists=DENSE_CONFIG["n_lists"],
+        dtype=DENSE_CONFIG["dtype"],
+    )
+    folder = repo.dense_dir
+    index.save(folder)
+    print(f"[OK] Dense index: {len(hashes)} vectors, {index.n_lists} lists -> {folder}")
+    return folder
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build dense (embedding) index through Ollama")
+    parser.add_argument("--base-url", default=OLLAMA_BASE_URL)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+    build_dense_index(args.base_url, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
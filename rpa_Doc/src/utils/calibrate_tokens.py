@@ -0,0 +1,89 @@
+# src/utils/calibrate_tokens.py
+"""
+Calibrate TokenEstimator ให้ตรงกับ tokenizer ของโมเดลที่ใช้ตอบคำถาม
+
+    python -m src.utils.calibrate_tokens
+    python -m src.utils.calibrate_tokens --samples 300 --base-url http://127.0.0.1:11500
+
+ส่ง passage ตัวอย่างจาก corpus ไปที่ Ollama (raw, num_predict=1) แล้วใช้ prompt_eval_count เป็นจำนวน token จริง
+ผลลัพธ์ (อัตราส่วน token ต่อชนิดตัวอักษร) ถูกบันทึกใน FILE_PATHS["token_calibration"] แยกตามชื่อโมเดล
+LLMService/RetrievalService โหลดค่านี้ตอนเริ่มทำงาน
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime
+from typing import List, Tuple
+import requests
+from src.config.settings import FILE_PATHS, OLLAMA_BACKENDS, RAG_CONFIG
+from src.api.services.llm_service import PROMPT_PREFIX
+from src.core.token_estimator import TokenEstimator
+from src.repository.document_repository import DocumentRepository
+
+
+def count_tokens(session: requests.Session, base_url: str, model: str, text: str) -> int:
+    r = session.post(
+        f"{base_url}/api/generate",
+        json={"model": model, "prompt": text, "raw": True, "stream": False,
+              "options": {"num_predict": 1, "num_ctx": RAG_CONFIG["max_num_ctx"]}},
+        timeout=(10, 120)
+    )
+    r.raise_for_status()
+    return int(r.json()["prompt_eval_count"])
+
+
+def mean_abs_error(estimator: TokenEstimator, samples: List[Tuple[str, int]]) -> float:
+    errors = [abs(estimator.estimate(text) - tokens) / max(tokens, 1) for text, tokens in samples]
+    return round(sum(errors) / len(errors), 4)
+
+
+def calibrate(base_url: str, model: str, n_samples: int, seed: int = 0) -> dict:
+    chunks = DocumentRepository().load_documents()
+    rng = random.Random(seed)
+    texts = [c["content"] for c in rng.sample(chunks, min(n_samples, len(chunks)))]
+    texts.append(PROMPT_PREFIX)
+    print(f"[INFO] Counting tokens of {len(texts)} samples with {model} ({base_url})")
+
+    session = requests.Session()
+    samples = []
+    for i, text in enumerate(texts, 1):
+        samples.append((text, count_tokens(session, base_url, model, text)))
+        if i % 50 == 0:
+            print(f"[INFO] {i}/{len(texts)}")
+
+    ratios = TokenEstimator.fit(samples)
+    before = mean_abs_error(TokenEstimator(), samples)
+    after = mean_abs_error(TokenEstimator(ratios), samples)
+    print(f"[OK] ratios={ratios} | mean abs error {before:.1%} -> {after:.1%}")
+    return {
+        "ratios": ratios,
+        "samples": len(samples),
+        "mean_abs_error": after,
+        "calibrated_at": datetime.now().isoformat(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate token estimator against the model tokenizer")
+    parser.add_argument("--base-url", default=OLLAMA_BACKENDS[0]["url"])
+    parser.add_argument("--model", default=RAG_CONFIG["model"])
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    result = calibrate(args.base_url, args.model, args.samples)
+    path = FILE_PATHS["token_calibration"]
+    data = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    data[args.model] = result
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+    print(f"[OK] Saved: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+# src/utils/compact_logs.py
+"""
+ลบประวัติการถาม-ตอบที่เกินเกณฑ์เก็บย้อนหลัง (LOG_CONFIG) และคืนพื้นที่ไฟล์
+
+    python -m src.utils.compact_logs
+    python -m src.utils.compact_logs --vacuum
+"""
+import argparse
+import os
+from src.repository.log_repository import LogRepository
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply log retention and compact the Q&A log store")
+    parser.add_argument("--vacuum", action="store_true", help="เขียนไฟล์ใหม่ให้เล็กลง (ล็อกฐานข้อมูลระหว่างทำ)")
+    args = parser.parse_args()
+
+    repo = LogRepository()
+    deleted = repo.compact()
+    if args.vacuum:
+        repo.vacuum()
+    size_mb = os.path.getsize(repo.path) / 1024 / 1024
+    print(f"[OK] Removed {deleted} entries | {repo.count()} entries left | {size_mb:.1f} MB ({repo.path})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# src/utils/convert_index.py
+"""
+แปลง tfidf_embeddings.pkl (รูปแบบเก่า) เป็น Index แบบ mmap (.npy) ที่ไม่ใช้ pickle
+
+    python -m src.utils.convert_index
+    python -m src.utils.convert_index --pickle output/tfidf_embeddings.pkl
+"""
+import argparse
+import os
+import pickle
+from datetime import datetime
+from src.config.settings import FILE_PATHS
+from src.core.tfidf_index import TfidfEncoder, save_index
+from src.repository.document_repository import DocumentRepository, build_hash
+
+
+def convert_pickle_index(pickle_file: str, index_dir: str) -> str:
+    if not os.path.exists(pickle_file):
+        raise FileNotFoundError(f"ไม่พบไฟล์ Index เดิม: {pickle_file}")
+
+    with open(pickle_file, "rb") as f:
+        vectorizer, matrix = pickle.load(f)
+
+    # pickle เดิมไม่มี content hash และไม่ได้แบ่ง shard: ใช้เอกสารปัจจุบันจับคู่แถว ถ้าจำนวนตรงกัน
+    # ถ้าไม่ตรง จะเก็บเป็น shard เดียวที่ไม่มี hash และ Index จะถูก rebuild ตอนโหลดครั้งแรก
+    repo = DocumentRepository()
+    try:
+        chunks = repo.load_documents()
+    except FileNotFoundError as e:
+        print(f"[WARN] {e}")
+        chunks = []
+
+    shards = []
+    if chunks and len(chunks) == matrix.shape[0]:
+        row_of = {id(c): i for i, c in enumerate(chunks)}
+        for key, year, group in repo.group_by_shard(chunks):
+            doc_hashes = [c["content_hash"] for c in group]
+            shards.append({
+                "key": key,
+                "year": year,
+                "shard_hash": build_hash(doc_hashes),
+                "doc_hashes": doc_hashes,
+                "matrix": matrix[[row_of[id(c)] for c in group]],
+            })
+        index_hash = build_hash([f"{s['key']}:{s['shard_hash']}" for s in shards])
+    else:
+        print(f"[WARN] จำนวนเอกสาร ({len(chunks)}) ไม่ตรงกับ Index ({matrix.shape[0]})")
+        shards.append({"key": "unknown", "year": None, "shard_hash": build_hash([]),
+                       "doc_hashes": [""] * matrix.shape[0], "matrix": matrix})
+        index_hash = ""
+
+    manifest = {
+        "build_hash": index_hash,
+        "built_at": datetime.now().isoformat(),
+        "doc_count": matrix.shape[0],
+        "mode": "converted",
+        "fit_doc_count": matrix.shape[0],
+        "drift_docs": 0,
+        "changed_shards": [s["key"] for s in shards],
+    }
+    save_index(index_dir, TfidfEncoder.from_vectorizer(vectorizer), shards, manifest)
+    return index_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pickled TF-IDF index to mmap format")
+    parser.add_argument("--pickle", default=FILE_PATHS["tfidf_embeddings"])
+    parser.add_argument("--out", default=FILE_PATHS["tfidf_index"])
+    args = parser.parse_args()
+
+    folder = convert_pickle_index(args.pickle, args.out)
+    print(f"[OK] Converted {args.pickle} -> {folder}")
+
+
+if __name__ == "__main__":
+    main()
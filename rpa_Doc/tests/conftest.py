@@ -0,0 +1,25 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+# ให้ import src.* ได้เมื่อรัน pytest จากโฟลเดอร์ rpa_Doc หรือจาก root ของ repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def rag_router(tmp_path_factory):
+    """
+    src.api.controllers.rag_router (สร้าง Service ตอน import) โดยให้ไฟล์ SQLite อยู่ในโฟลเดอร์ชั่วคราว
+    test ที่ใช้ควรแทน rag_service ด้วย stub ผ่าน monkeypatch
+    """
+    from src.config import settings
+    tmp = tmp_path_factory.mktemp("api")
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setitem(settings.LOG_CONFIG, "path", str(tmp / "logs.sqlite3"))
+        mp.setitem(settings.LOG_CONFIG, "legacy_json", None)
+        mp.setitem(settings.CACHE_CONFIG, "path", str(tmp / "cache.sqlite3"))
+        mp.setitem(settings.JOB_CONFIG, "path", str(tmp / "jobs.sqlite3"))
+        from src.api.controllers import rag_router
+    return rag_router
@@ -0,0 +1,215 @@
+import asyncio
+import json
+import os
+import threading
+
+import httpx
+import numpy as np
+import pytest
+
+from src.api.services.embedding_service import EmbeddingService
+from src.api.services.retrieval_service import RetrievalService
+from src.core.ann_index import POINTER_FILE, IVFIndex, l2_normalize
+from src.core.ollama_backends import BackendPool
+from src.core.ollama_client import close_ollama_client
+from src.devtools.fake_ollama import FakeOllamaConfig, fake_embedding, start_fake_ollama
+from src.utils.build_dense_index import EmbeddingStore
+
+
+def _clustered(n: int, dim: int = 32, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    """vector รอบจุดศูนย์กลางหลายกลุ่ม (ใกล้กับ embedding จริงมากกว่าสุ่มล้วน)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+
+
+def _brute_force(vectors: np.ndarray, q: np.ndarray, k: int) -> np.ndarray:
+    return np.argsort(-(l2_normalize(vectors) @ l2_normalize(q).ravel()))[:k]
+
+
+@pytest.fixture(scope="module")
+def data():
+    vectors = _clustered(2000)
+    queries = _clustered(50, seed=1)
+    return vectors, queries
+
+
+def _index(vectors, dtype="float32", n_lists=None):
+    return IVFIndex.build(vectors, {"doc_hashes": [f"h{i}" for i in range(len(vectors))]}, n_lists, dtype)
+
+
+def test_ivf_recall_against_brute_force(data):
+    vectors, queries = data
+    index = _index(vectors, dtype="float16")
+    k = 10
+    found = 0
+    for q in queries:
+        rows, scores = index.search(q, k, n_probe=8)
+        assert np.all(np.diff(scores) <= 1e-6)
+        found += len(set(rows.tolist()) & set(_brute_force(vectors, q, k).tolist()))
+    assert found / (k * len(queries)) >= 0.9
+
+
+def test_probing_every_list_is_exact(data):
+    vectors, queries = data
+    index = _index(vectors)
+    for q in queries[:10]:
+        rows, scores = index.search(q, 5, n_probe=index.n_lists)
+        expected = _brute_force(vectors, q, 5)
+        assert rows.tolist() == expected.tolist()
+        np.testing.assert_allclose(scores, l2_normalize(vectors[expected]) @ l2_normalize(q).ravel(), rtol=1e-5)
+
+
+def test_lists_cover_every_row_once(data):
+    vectors, _ = data
+    index = _index(vectors, n_lists=16)
+    assert index.n_lists == 16
+    assert index.list_offsets[0] == 0 and index.list_offsets[-1] == len(vectors)
+    assert sorted(index.row_ids.tolist()) == list(range(len(vectors)))
+
+
+def test_save_load_round_trip_and_version_pointer(tmp_path, data):
+    vectors, queries = data
+    folder = str(tmp_path / "dense")
+    index = _index(vectors[:300])
+
+    first = index.save(folder)
+    loaded = IVFIndex.load(folder, mmap=True)
+    assert loaded.path == first
+    assert loaded.meta == index.meta
+    for name in ("vectors", "row_ids", "centroids", "list_offsets"):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(index, name))
+    assert loaded.search(queries[0], 5)[0].tolist() == index.search(queries[0], 5)[0].tolist()
+
+    # เวอร์ชันใหม่ไม่ลบเวอร์ชันที่ยังเปิดอยู่ทันที (เก็บไว้ 2 เวอร์ชันล่าสุด)
+    second = index.save(folder)
+    assert os.path.isdir(first) and IVFIndex.load(folder).path == second
+    third = index.save(folder)
+    assert not os.path.exists(first) and os.path.isdir(second)
+    with open(os.path.join(folder, POINTER_FILE), encoding="utf-8") as f:
+        assert os.path.join(folder, f.read().strip()) == third
+    assert not [d for d in os.listdir(folder) if ".tmp" in d]
+
+
+def test_load_missing_and_legacy_layout(tmp_path, data):
+    assert IVFIndex.load(str(tmp_path / "none")) is None
+
+    # รูปแบบเดิม: ไฟล์อยู่ในโฟลเดอร์ตรงๆ ไม่มี CURRENT
+    index = _index(data[0][:100])
+    version = index.save(str(tmp_path / "staging"))
+    legacy = tmp_path / "legacy"
+    os.rename(version, legacy)
+    loaded = IVFIndex.load(str(legacy))
+    assert loaded is not None and loaded.path == str(legacy)
+
+
+def test_empty_index_search():
+    index = IVFIndex(np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.int64),
+                     np.zeros((1, 4), dtype=np.float32), np.array([0, 0]), {"doc_hashes": []})
+    rows, scores = index.search(np.ones(4), 3)
+    assert rows.size == 0 and scores.size == 0
+
+
+# ---------- Reciprocal Rank Fusion ----------
+
+def _hit(name: str, score: float):
+    return {"score": score, "doc": {"content_hash": name}}
+
+
+def test_fuse_ranks_documents_found_by_both_sides_first():
+    svc = RetrievalService.__new__(RetrievalService)
+    sparse = [_hit("a", 0.9), _hit("b", 0.8), _hit("c", 0.7)]
+    dense = [_hit("c", 0.95), _hit("d", 0.9), _hit("b", 0.85)]
+
+    fused = svc._fuse(sparse, dense, top_k=3)
+    # b: 1/62 + 1/63, c: 1/63 + 1/61 (> b), a: 1/61, d: 1/62
+    assert [h["doc"]["content_hash"] for h in fused] == ["c", "b", "a"]
+    # คะแนนที่ส่งออกเป็น similarity ของ TF-IDF เมื่อมี
+    assert [h["score"] for h in fused] == [0.7, 0.8, 0.9]
+    assert fused[0]["rrf_score"] == pytest.approx(1 / 63 + 1 / 61)
+
+
+def test_fuse_with_one_side_empty_keeps_order():
+    svc = RetrievalService.__new__(RetrievalService)
+    dense = [_hit("x", 0.9), _hit("y", 0.5)]
+    assert [h["doc"]["content_hash"] for h in svc._fuse([], dense, 5)] == ["x", "y"]
+
+
+# ---------- EmbeddingStore ----------
+
+def test_embedding_store_resumes_and_gathers_in_order(tmp_path):
+    work = str(tmp_path / "work")
+    store = EmbeddingStore(work)
+    store.append(["a", "b"], np.array([[1, 0], [0, 1]], dtype=np.float32))
+    store.append(["c"], np.array([[1, 1]], dtype=np.float32))
+
+    # batch ที่เขียนไม่จบ (มี .npy แต่ไม่มี .json) ไม่ถูกนับ
+    np.save(os.path.join(work, "batch-00002.npy"), np.zeros((1, 2), dtype=np.float32))
+
+    reopened = EmbeddingStore(work)
+    assert reopened.n_batches == 2
+    assert "c" in reopened and "z" not in reopened
+    np.testing.assert_array_equal(reopened.gather(["c", "a", "b"]), [[1, 1], [1, 0], [0, 1]])
+
+    # batch ถัดไปเขียนทับไฟล์ที่ไม่สมบูรณ์
+    reopened.append(["d"], np.array([[2, 2]], dtype=np.float32))
+    with open(os.path.join(work, "batch-00002.json"), encoding="utf-8") as f:
+        assert json.load(f) == ["d"]
+    np.testing.assert_array_equal(EmbeddingStore(work).gather(["d"]), [[2, 2]])
+
+
+# ---------- EmbeddingService กับ Ollama จำลอง ----------
+
+@pytest.fixture
+def fake_server():
+    server = start_fake_ollama(config=FakeOllamaConfig(dim=16))
+    host, port = server.server_address[:2]
+    yield server, f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_embed_batch_direct(fake_server):
+    _, url = fake_server
+    service = EmbeddingService(url)
+    vectors = service.embed(["ภาษีป้าย", "VAT"])
+    assert vectors.shape == (2, 16) and vectors.dtype == np.float32
+    np.testing.assert_allclose(vectors[1], fake_embedding("VAT", 16), rtol=1e-6)
+
+
+def test_embed_query_and_session_per_thread(fake_server):
+    _, url = fake_server
+    service = EmbeddingService(url)
+    vector = service.embed_query("ภาษีมูลค่าเพิ่ม")
+    np.testing.assert_allclose(vector, fake_embedding("ภาษีมูลค่าเพิ่ม", 16), rtol=1e-6)
+
+    # requests.Session ไม่ thread-safe แต่ละ thread ต้องได้ของตัวเอง
+    sessions = []
+    worker = threading.Thread(target=lambda: sessions.append(service.session))
+    worker.start()
+    worker.join()
+    assert sessions[0] is not service.session and service.session is service.session
+
+
+def test_embed_query_async_through_pool_and_failure_reporting(fake_server):
+    server, url = fake_server
+    pool = BackendPool([{"url": url, "max_concurrency": 1}])
+    pool.failure_threshold = 1
+    service = EmbeddingService(url)
+    service.backends, service.base_url = pool, None
+
+    async def embed():
+        try:
+            return await service.embed_query_async("ภาษีมูลค่าเพิ่ม")
+        finally:
+            await close_ollama_client()
+
+    vector = asyncio.run(embed())
+    np.testing.assert_allclose(vector, fake_embedding("ภาษีมูลค่าเพิ่ม", 16), rtol=1e-6)
+    assert pool.backends[0].requests == 1 and pool.backends[0].healthy
+
+    server.shutdown()
+    server.server_close()
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(embed())
+    assert not pool.backends[0].healthy
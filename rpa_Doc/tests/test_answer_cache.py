@@ -0,0 +1,95 @@
+import unicodedata
+
+import pytest
+
+from src.core.answer_cache import AnswerCache, make_cache_key, normalize_question
+
+ARGS = (["a1", "b2"], "llama3", 2, {"temperature": 0.1})
+
+
+@pytest.mark.parametrize("variant", [
+    "ภาษีหัก ณ ที่จ่าย คืออะไร",
+    "  ภาษีหัก ณ   ที่จ่าย\tคืออะไร ?",
+    "ภาษีหัก ณ ที่จ่าย คืออะไร??",
+])
+def test_normalize_question_ignores_spacing_and_trailing_punctuation(variant):
+    assert normalize_question(variant) == "ภาษีหัก ณ ที่จ่าย คืออะไร"
+
+
+def test_normalize_question_case_and_unicode_form():
+    assert normalize_question("What is VAT?") == "what is vat"
+    # "ำ" แบบแยก (ํ + า) กับแบบรวมต้องได้ค่าเดียวกันหลัง NFC
+    assert normalize_question("ทำ") == normalize_question(unicodedata.normalize("NFD", "ทำ"))
+
+
+def test_cache_key_stable_for_equivalent_questions():
+    assert make_cache_key("VAT คืออะไร?", *ARGS) == make_cache_key("vat  คืออะไร", *ARGS)
+    hits, model, version, options = ARGS
+    assert make_cache_key("q", hits, model, version, {"a": 1, "b": 2}) == \
+        make_cache_key("q", hits, model, version, {"b": 2, "a": 1})
+
+
+@pytest.mark.parametrize("changed", [
+    ("VAT คืออะไร", ["a1"], "llama3", 2, {"temperature": 0.1}),
+    ("VAT คืออะไร", ["b2", "a1"], "llama3", 2, {"temperature": 0.1}),
+    ("VAT คืออะไร", ["a1", "b2"], "qwen2", 2, {"temperature": 0.1}),
+    ("VAT คืออะไร", ["a1", "b2"], "llama3", 3, {"temperature": 0.1}),
+    ("VAT คืออะไร", ["a1", "b2"], "llama3", 2, {"temperature": 0.2}),
+    ("VAT เท่าไร", ["a1", "b2"], "llama3", 2, {"temperature": 0.1}),
+])
+def test_cache_key_changes_with_every_component(changed):
+    assert make_cache_key(*changed) != make_cache_key("VAT คืออะไร", *ARGS)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnswerCache(str(tmp_path / "cache.db"), max_entries=2, ttl_seconds=3600)
+
+
+def test_get_is_scoped_to_index_version(cache):
+    cache.put("k", "v1", {"answer": "old"})
+    assert cache.get("k", "v1") == {"answer": "old"}
+    assert cache.get("k", "v2") is None
+
+    # อ่านจากดิสก์ได้ใน instance ใหม่ (เช่นหลัง restart)
+    reopened = AnswerCache(cache.path, max_entries=2, ttl_seconds=3600)
+    assert reopened.get("k", "v1") == {"answer": "old"}
+    assert reopened.stats()["disk_hits"] == 1
+
+
+def test_purge_drops_other_versions_only(cache):
+    cache.purge("v1")
+    cache.put("a", "v1", {"answer": "1"})
+    cache.put("b", "v2", {"answer": "2"})
+    cache.purge("v2")
+    assert cache.get("a", "v1") is None
+    assert cache.get("b", "v2") == {"answer": "2"}
+    stats = cache.stats()
+    assert stats["invalidations"] == 1 and stats["disk_entries"] == 1
+
+    # เวอร์ชันเดิมซ้ำไม่ลบอะไร
+    cache.purge("v2")
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_memory_lru_and_ttl(tmp_path):
+    cache = AnswerCache(str(tmp_path / "c.db"), max_entries=2, ttl_seconds=3600)
+    for key in ("a", "b", "c"):
+        cache.put(key, None, {"answer": key})
+    assert cache.stats()["memory_entries"] == 2
+    assert cache.get("a", None) == {"answer": "a"}
+    assert cache.stats()["disk_hits"] == 1
+
+    expired = AnswerCache(str(tmp_path / "c.db"), max_entries=2, ttl_seconds=1e-9)
+    assert expired.get("b", None) is None
+
+
+def test_disk_entry_count_tracks_writes_and_deletes(cache):
+    cache.put("a", "v1", {"answer": "1"})
+    cache.put("a", "v1", {"answer": "1 (ใหม่)"})
+    cache.put("b", "v2", {"answer": "2"})
+    assert cache.stats()["disk_entries"] == 2
+    assert AnswerCache(cache.path).stats()["disk_entries"] == 2
+
+    cache.purge("v2")
+    assert cache.stats()["disk_entries"] == 1
@@ -0,0 +1,106 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.api.services.retrieval_service import RetrievalService
+from src.config import settings
+from src.core.index_holder import IndexHolder
+from src.repository.document_repository import DocumentRepository
+
+DOCUMENTS = [
+    ("2567", "ขายอาหารสัตว์ต้องเสียภาษีมูลค่าเพิ่มหรือไม่", "การขายอาหารสัตว์ได้รับยกเว้นภาษีมูลค่าเพิ่ม"),
+    ("2567", "ค่าขนส่งสินค้าต้องหักภาษี ณ ที่จ่ายหรือไม่", "ผู้จ่ายค่าขนส่งต้องหักภาษี ณ ที่จ่ายร้อยละ 1"),
+    ("2566", "ภาษีป้ายคำนวณอย่างไร", "ภาษีป้ายคำนวณจากขนาดของป้ายและประเภทของป้าย"),
+    ("2566", "ให้บริการในต่างประเทศต้องเสีย VAT หรือไม่", "บริการที่ใช้ในต่างประเทศเสียภาษีมูลค่าเพิ่มอัตราร้อยละ 0"),
+    ("2565", "ดอกเบี้ยเงินฝากต้องหักภาษี ณ ที่จ่ายหรือไม่", "ดอกเบี้ยเงินฝากออมทรัพย์ได้รับยกเว้นภาษีเงินได้"),
+    ("2565", "ขายอาหารสำเร็จรูปต้องเสีย VAT หรือไม่", "การขายอาหารสำเร็จรูปต้องเสียภาษีมูลค่าเพิ่มร้อยละ 7"),
+    ("2564", "ค่าเช่าอาคารต้องหักภาษี ณ ที่จ่ายหรือไม่", "ค่าเช่าอาคารต้องหักภาษี ณ ที่จ่ายร้อยละ 5"),
+    ("2564", "ส่งออกสินค้าต้องเสีย VAT หรือไม่", "การส่งออกสินค้าเสียภาษีมูลค่าเพิ่มอัตราร้อยละ 0"),
+]
+QUESTIONS = [
+    "ขายอาหารสัตว์เสีย VAT ไหม",
+    "หักภาษี ณ ที่จ่าย ค่าขนส่ง",
+    "ภาษีป้าย",
+    "ส่งออก VAT ร้อยละ 0",
+    "คำถามที่ไม่ตรงกับเอกสารใดเลย xyz",
+]
+
+
+@pytest.fixture
+def retrieval(tmp_path, monkeypatch):
+    monkeypatch.setitem(settings.DENSE_CONFIG, "enabled", False)
+    repo = DocumentRepository()
+    repo.doc_file = str(tmp_path / "docs.json")
+    repo.index_dir = str(tmp_path / "tfidf_index")
+    months = [
+        {"year": year, "month": "มกราคม",
+         "documents": [{"title": f"กค 0702/{i}", "ข้อหารือ": q, "แนววินิจฉัย": a}]}
+        for i, (year, q, a) in enumerate(DOCUMENTS)
+    ]
+    with open(repo.doc_file, "w", encoding="utf-8") as f:
+        json.dump(months, f, ensure_ascii=False)
+
+    svc = RetrievalService()
+    svc.index_holder = IndexHolder(repo)
+    return svc
+
+
+def _key(hits):
+    return [(h["doc"]["content_hash"], round(h["score"], 9)) for h in hits]
+
+
+@pytest.mark.parametrize("year_from,year_to", [(None, None), (2566, None), (None, 2565), (2565, 2566), (2570, None)])
+def test_batch_matches_single_question_retrieval(retrieval, year_from, year_to):
+    batch = retrieval.retrieve_hits_many(QUESTIONS, retrieval.passage_k, year_from, year_to)
+    assert len(batch) == len(QUESTIONS)
+    for question, hits in zip(QUESTIONS, batch):
+        _, single = retrieval.retrieve_hits(question, year_from, year_to)
+        assert _key(hits) == _key(single)
+    if year_from != 2570:
+        assert any(batch)
+
+
+def test_batch_respects_top_k(retrieval):
+    batch = retrieval.retrieve_hits_many(QUESTIONS, top_k=1)
+    assert all(len(hits) <= 1 for hits in batch)
+    assert batch[0][0]["doc"]["title"] == "กค 0702/0"
+    assert retrieval.retrieve_hits_many([]) == []
+
+
+# ---------- POST /rag/retrieve/batch ----------
+
+@pytest.fixture
+def client(rag_router, retrieval, monkeypatch):
+    monkeypatch.setattr(rag_router.rag_service, "retrieval", retrieval)
+    app = FastAPI()
+    app.include_router(rag_router.router)
+    return TestClient(app)
+
+
+def test_batch_route_returns_refs_per_question(client):
+    r = client.post("/rag/retrieve/batch", json={"questions": QUESTIONS[:2], "top_k": 2})
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [x["question"] for x in results] == QUESTIONS[:2]
+    assert results[0]["refs"][0]["title"] == "กค 0702/0" and results[0]["refs"][0]["is_primary"]
+    assert all(len(x["refs"]) <= 2 for x in results)
+
+
+@pytest.mark.parametrize("body", [
+    {"questions": []},
+    {"questions": ["q"] * (settings.RAG_CONFIG["batch_max_questions"] + 1)},
+    {"questions": ["q"], "top_k": 0},
+    {"questions": ["q"], "top_k": settings.RAG_CONFIG["batch_max_top_k"] + 1},
+    {},
+])
+def test_batch_route_rejects_out_of_bounds_requests(client, body):
+    assert client.post("/rag/retrieve/batch", json=body).status_code == 422
+
+
+def test_batch_route_accepts_limits(client):
+    body = {"questions": ["VAT"] * settings.RAG_CONFIG["batch_max_questions"],
+            "top_k": settings.RAG_CONFIG["batch_max_top_k"]}
+    r = client.post("/rag/retrieve/batch", json=body)
+    assert r.status_code == 200 and len(r.json()["results"]) == settings.RAG_CONFIG["batch_max_questions"]
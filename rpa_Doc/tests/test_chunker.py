@@ -0,0 +1,46 @@
+import pytest
+
+from src.core.chunker import split_passages
+
+
+def _text(n_sentences: int) -> str:
+    return " ".join(f"ประโยคที่ {i} ว่าด้วยภาษีเงินได้หัก ณ ที่จ่าย." for i in range(n_sentences))
+
+
+def test_short_and_empty_text():
+    assert split_passages("", 100, 20) == []
+    assert split_passages("สั้น", 100, 20) == [(0, 4)]
+
+
+@pytest.mark.parametrize("max_chars,overlap", [(120, 30), (200, 0), (600, 120)])
+def test_spans_are_bounded_ordered_and_cover_text(max_chars, overlap):
+    text = _text(60)
+    spans = split_passages(text, max_chars, overlap)
+
+    assert spans[0][0] == 0 and spans[-1][1] == len(text)
+    for start, end in spans:
+        assert 0 <= start < end <= len(text)
+        assert end - start <= max_chars
+    for (s1, e1), (s2, e2) in zip(spans, spans[1:]):
+        assert s1 < s2 and e1 < e2
+        # ไม่มีช่องว่างระหว่างช่วง: ช่วงถัดไปเริ่มไม่เกินจุดจบของช่วงก่อน
+        assert s2 <= e1
+
+
+def test_overlap_and_word_boundaries():
+    text = _text(60)
+    spans = split_passages(text, 150, 40)
+    for (_, e1), (s2, _) in zip(spans, spans[1:]):
+        assert 0 < e1 - s2 <= 40
+        assert text[s2 - 1] == " "
+    # ตัดที่ขอบประโยค/ช่องว่าง ไม่ตัดกลางคำ
+    for _, end in spans[:-1]:
+        assert text[end - 1] == " "
+
+
+def test_falls_back_to_hard_cut_without_breaks():
+    text = "ก" * 250
+    spans = split_passages(text, 100, 10)
+    assert spans[0] == (0, 100)
+    assert spans[-1][1] == 250
+    assert all(e - s <= 100 for s, e in spans)
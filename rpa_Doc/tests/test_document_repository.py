@@ -0,0 +1,137 @@
+import numpy as np
+import pytest
+
+from src.config import settings
+from src.repository.document_repository import DocumentRepository, content_hash
+
+# เอกสารใหม่ในการทดสอบประกอบจากคำชุดเดียวกัน (char_wb ไม่ข้ามขอบคำ จึงไม่มี n-gram นอก Vocabulary)
+WORDS = ["ภาษี", "มูลค่าเพิ่ม", "หัก", "ณ", "ที่จ่าย", "ขนส่ง", "อาหารสัตว์", "ยกเว้น", "ป้าย", "บริการ"]
+
+
+def _text(n: int) -> str:
+    # แต่ละหลักของ n แทนด้วยคำหนึ่งคำ ข้อความจึงไม่ซ้ำกัน
+    return " ".join(WORDS[(n * k) % len(WORDS)] for k in range(1, 6)) + " " + " ".join(WORDS[int(d)] for d in str(n))
+
+
+def _chunk(n: int, year) -> dict:
+    text = _text(n)
+    return {"search_text": text, "content_hash": content_hash(text), "year": year, "month_no": 1}
+
+
+def _corpus():
+    # 3 ปี ปีละ 10 ฉบับ
+    return [_chunk(n, year) for year, start in ((2565, 0), (2566, 10), (2567, 20)) for n in range(start, start + 10)]
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.setitem(settings.INDEX_CONFIG, "shard_by", "year")
+    monkeypatch.setitem(settings.INDEX_CONFIG, "analyzer", "char_wb")
+    monkeypatch.setitem(settings.INDEX_CONFIG, "refit_drift_threshold", 0.2)
+    monkeypatch.setitem(settings.INDEX_CONFIG, "refit_oov_threshold", 0.05)
+    r = DocumentRepository()
+    r.index_dir = str(tmp_path / "tfidf_index")
+    return r
+
+
+def _dense(shard):
+    return np.asarray(shard.matrix.toarray())
+
+
+def _assert_fresh_rows(index, key, chunks):
+    """แถวของ shard ต้องเท่ากับการ transform เอกสารชุดนั้นใหม่ทั้งหมดด้วย encoder เดิม"""
+    group = [c for c in chunks if str(c["year"]) == key]
+    shard = index.shard_map()[key]
+    assert shard.doc_hashes == [c["content_hash"] for c in group]
+    expected = index.encoder.transform([c["search_text"] for c in group]).toarray()
+    np.testing.assert_allclose(_dense(shard), expected, rtol=1e-9, atol=1e-12)
+
+
+def test_unchanged_corpus_reuses_index(repo):
+    chunks = _corpus()
+    first = repo.get_index(chunks)
+    assert first.manifest["mode"] == "full"
+    assert repo.get_index(chunks).version == first.version
+
+
+def test_changing_one_shard_rewrites_only_its_rows(repo):
+    chunks = _corpus()
+    before = repo.get_index(chunks)
+    old = {s.key: _dense(s) for s in before.shards}
+
+    chunks[12] = _chunk(100, 2566)
+    after = repo.get_index(chunks)
+
+    assert after.manifest["mode"] == "incremental"
+    assert after.manifest["changed_shards"] == ["2566"]
+    assert after.encoder.encoder_id == before.encoder.encoder_id
+    for key in ("2565", "2567"):
+        np.testing.assert_array_equal(_dense(after.shard_map()[key]), old[key])
+    _assert_fresh_rows(after, "2566", chunks)
+
+
+def test_reorder_add_and_remove_inside_shard(repo):
+    chunks = _corpus()
+    repo.get_index(chunks)
+
+    shard = [c for c in chunks if c["year"] == 2567]
+    shard = shard[::-1]          # สลับลำดับ
+    del shard[3]                 # ลบ 1 ฉบับ
+    shard.insert(2, _chunk(101, 2567))  # เพิ่ม 1 ฉบับ
+    chunks = [c for c in chunks if c["year"] != 2567] + shard
+    after = repo.get_index(chunks)
+
+    assert after.manifest["mode"] == "incremental"
+    assert after.manifest["changed_shards"] == ["2567"]
+    _assert_fresh_rows(after, "2567", chunks)
+
+
+def test_document_moving_between_year_shards(repo):
+    chunks = _corpus()
+    repo.get_index(chunks)
+
+    moved = dict(chunks[5], year=2566)
+    chunks = chunks[:5] + chunks[6:] + [moved]
+    after = repo.get_index(chunks)
+
+    assert after.manifest["mode"] == "incremental"
+    assert sorted(after.manifest["changed_shards"]) == ["2565", "2566"]
+    # เนื้อหาไม่เปลี่ยน ไม่นับเป็น drift
+    assert after.manifest["drift_docs"] == 0
+    for key in ("2565", "2566", "2567"):
+        _assert_fresh_rows(after, key, chunks)
+
+
+def test_drift_over_threshold_triggers_full_refit(repo):
+    chunks = _corpus()
+    repo.get_index(chunks)
+
+    # แทนที่ 4 ฉบับ = เพิ่ม 4 + ลบ 4 (drift 8/30 = 27% > 20%)
+    for i in range(4):
+        chunks[i] = _chunk(200 + i, 2565)
+    after = repo.get_index(chunks)
+    assert after.manifest["mode"] == "full"
+    assert after.manifest["drift_docs"] == 0
+
+
+def test_drift_accumulates_across_incremental_updates(repo):
+    chunks = _corpus()
+    repo.get_index(chunks)
+
+    modes = []
+    for i in range(4):
+        chunks[i] = _chunk(300 + i, 2565)
+        modes.append(repo.get_index(chunks).manifest["mode"])
+    # แทนที่ทีละฉบับ drift สะสม 2/30, 4/30, 6/30 แล้วครั้งที่ 4 ได้ 8/30 เกิน threshold
+    assert modes == ["incremental"] * 3 + ["full"]
+
+
+def test_oov_over_threshold_triggers_full_refit(repo):
+    chunks = _corpus()
+    before = repo.get_index(chunks)
+
+    text = "withholding tax on freight services"
+    chunks[0] = {"search_text": text, "content_hash": content_hash(text), "year": 2565, "month_no": 1}
+    after = repo.get_index(chunks)
+    assert after.manifest["mode"] == "full"
+    assert after.encoder.encoder_id != before.encoder.encoder_id
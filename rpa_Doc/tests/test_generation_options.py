@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from src.api.services.llm_service import LLMService, classify_question
+from src.core.token_estimator import DEFAULT_RATIOS, TokenEstimator
+
+
+@pytest.fixture
+def llm():
+    svc = LLMService()
+    svc.num_ctx, svc.max_num_ctx = 1024, 4096
+    svc.num_predict, svc.num_predict_by_type = 512, {"yes_no": 384, "explain": 768}
+    return svc
+
+
+@pytest.mark.parametrize("prompt_tokens,num_predict,expected", [
+    (0, 0, 1024),        # ไม่ต่ำกว่า num_ctx
+    (100, 384, 1024),    # need 531
+    (547, 384, 1024),    # need 1024 พอดี
+    (548, 384, 2048),    # need 1025 ขึ้นขั้นถัดไป
+    (1500, 512, 4096),   # need 2213
+    (3000, 768, 4096),   # need 4144 เกิน max_num_ctx -> ใช้ max
+])
+def test_num_ctx_rounds_up_to_bucket_and_clamps(llm, prompt_tokens, num_predict, expected):
+    assert llm.num_ctx_for(prompt_tokens, num_predict) == expected
+
+
+def test_num_ctx_buckets_are_powers_of_two_of_base(llm):
+    seen = {llm.num_ctx_for(p, 0) for p in range(0, 5000, 37)}
+    assert seen == {1024, 2048, 4096}
+
+
+@pytest.mark.parametrize("question,kind", [
+    ("ภาษีป้ายคำนวณอย่างไร", "explain"),
+    ("ทำไมต้องหักภาษี ณ ที่จ่าย", "explain"),
+    ("ต้องเสียภาษีเท่าไร?", "explain"),
+    ("ขายอาหารสัตว์ต้องเสีย VAT ไหม", "yes_no"),
+    ("ต้องหักภาษี ณ ที่จ่ายหรือไม่ ?", "yes_no"),
+    ("ขอคืนภาษีได้ไหม？", "yes_no"),
+    ("ทำไมถึงขอคืนภาษีไม่ได้ใช่ไหม", "explain"),  # คำที่ต้องอธิบายมาก่อน
+    ("ภาษีมูลค่าเพิ่มสำหรับการส่งออก", "default"),
+    ("", "default"),
+])
+def test_classify_question(question, kind):
+    assert classify_question(question) == kind
+
+
+@pytest.mark.parametrize("question,expected", [
+    ("ภาษีป้ายคำนวณอย่างไร", 768),
+    ("ขายอาหารสัตว์ต้องเสีย VAT ไหม", 384),
+    ("ภาษีมูลค่าเพิ่มสำหรับการส่งออก", 512),
+])
+def test_num_predict_for_question_type(llm, question, expected):
+    assert llm.num_predict_for(question) == expected
+
+
+def test_generation_options_combine_prompt_length_and_question_type(llm):
+    options = llm.generation_options("ก" * 2000, "ภาษีป้ายคำนวณอย่างไร")
+    assert options["num_predict"] == 768
+    assert options["num_ctx"] == llm.num_ctx_for(llm.token_estimator.estimate("ก" * 2000), 768)
+    # ค่าเดียวกันทุกครั้งสำหรับ prompt/คำถามเดิม (ใช้เป็น key ของ Cache)
+    assert options == llm.generation_options("ก" * 2000, "ภาษีป้ายคำนวณอย่างไร")
+
+
+# ---------- TokenEstimator ----------
+
+SAMPLES = [
+    "ภาษีมูลค่าเพิ่ม 7%",
+    "VAT exemption for animal feed",
+    "หักภาษี ณ ที่จ่ายร้อยละ 1 ของค่าขนส่ง",
+    "Section 81(1)(e) of the Revenue Code",
+    "2567 2566 2565",
+    "ข้อหารือ: บริษัท A จำกัด ขายสินค้าให้ลูกค้าในต่างประเทศ",
+    "   ",
+    "กค 0702/1234 ลงวันที่ 15 มกราคม 2567",
+]
+
+
+def _true_tokens(ratios, text: str) -> int:
+    counts = TokenEstimator().char_counts(text)
+    return round(sum(ratios[k] * v for k, v in counts.items()))
+
+
+def test_fit_recovers_ratios_of_a_known_tokenizer():
+    true = {"thai": 0.6, "latin": 0.25, "digit": 0.4, "space": 0.05, "other": 0.9}
+    samples = [(t * 20, _true_tokens(true, t * 20)) for t in SAMPLES]
+    ratios = TokenEstimator.fit(samples)
+    for name, value in true.items():
+        assert ratios[name] == pytest.approx(value, abs=0.02)
+
+    calibrated = TokenEstimator(ratios)
+    for text, tokens in samples:
+        assert calibrated.estimate(text) == pytest.approx(tokens, rel=0.03, abs=2)
+
+
+def test_fit_keeps_defaults_for_unseen_character_classes():
+    ratios = TokenEstimator.fit([("ภาษี" * n, 3 * n) for n in (1, 5, 10)])
+    assert ratios["thai"] == pytest.approx(0.75)
+    assert {k: ratios[k] for k in ("latin", "digit", "space", "other")} == \
+        {k: DEFAULT_RATIOS[k] for k in ("latin", "digit", "space", "other")}
+
+
+def test_for_model_reads_calibration_file(tmp_path):
+    path = tmp_path / "token_calibration.json"
+    path.write_text(json.dumps({"qwen3:8b": {"ratios": {"thai": 0.7}}}), encoding="utf-8")
+
+    assert TokenEstimator.for_model("qwen3:8b", str(path)).ratios == dict(DEFAULT_RATIOS, thai=0.7)
+    assert TokenEstimator.for_model("other-model", str(path)).ratios == DEFAULT_RATIOS
+    assert TokenEstimator.for_model("qwen3:8b", str(tmp_path / "missing.json")).ratios == DEFAULT_RATIOS
+
+    path.write_text("{not json", encoding="utf-8")
+    assert TokenEstimator.for_model("qwen3:8b", str(path)).ratios == DEFAULT_RATIOS
+
+
+def test_truncate_stays_within_budget():
+    estimator = TokenEstimator()
+    text = "ภาษีมูลค่าเพิ่ม VAT 7% " * 50
+    cut = estimator.truncate(text, 100)
+    assert estimator.estimate(cut) <= 100 < estimator.estimate(cut + text[len(cut)])
+    assert text.startswith(cut)
+    assert estimator.truncate("สั้น", 100) == "สั้น"
@@ -0,0 +1,129 @@
+import json
+import time
+
+import pytest
+
+from src.config import settings
+from src.core.index_holder import IndexHolder, IndexSnapshot, ShardView
+from src.repository.document_repository import DocumentRepository
+
+
+def _month(year, month, title, question, answer):
+    """รูปแบบเดียวกับ month_document_contents_filtered.json"""
+    return {"year": year, "month": month, "documents": [{"title": title, "ข้อหารือ": question, "แนววินิจฉัย": answer}]}
+
+
+DOCS = [
+    _month("2567", "มกราคม", "กค 0702/1", "ขายอาหารสัตว์ต้องเสีย VAT ไหม", "ได้รับยกเว้นภาษีมูลค่าเพิ่ม"),
+    _month("2566", "มีนาคม", "กค 0702/2", "ค่าขนส่งต้องหักภาษีหรือไม่", "หักภาษี ณ ที่จ่ายร้อยละ 1"),
+    _month(None, None, "กค 0702/3", "ภาษีป้ายคิดอย่างไร", "คำนวณจากขนาดของป้าย"),
+]
+
+
+def _write(path, docs):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(docs, f, ensure_ascii=False)
+
+
+@pytest.fixture
+def holder(tmp_path, monkeypatch):
+    monkeypatch.setitem(settings.DENSE_CONFIG, "enabled", False)
+    repo = DocumentRepository()
+    repo.doc_file = str(tmp_path / "docs.json")
+    repo.index_dir = str(tmp_path / "tfidf_index")
+    _write(repo.doc_file, DOCS)
+    return IndexHolder(repo)
+
+
+def _wait_for(predicate, timeout: float = 10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+def test_first_get_loads_and_notifies(holder):
+    loaded = []
+    holder.on_load(loaded.append)
+    assert holder.peek() is None
+
+    snapshot = holder.get()
+    assert loaded == [snapshot] and holder.peek() is snapshot
+    assert [s.key for s in snapshot.shards] == ["unknown", "2567", "2566"]
+    assert len(snapshot.chunks) == 3 and snapshot.size_bytes["sparse"] > 0
+    # ไฟล์ไม่เปลี่ยน ได้ Snapshot เดิม
+    assert holder.get() is snapshot
+
+    # ลงทะเบียนหลังโหลดแล้ว ได้ callback ทันที
+    late = []
+    holder.on_load(late.append)
+    assert late == [snapshot]
+
+
+def test_reload_in_background_when_watched_file_changes(holder):
+    loaded = []
+    holder.on_load(loaded.append)
+    old = holder.get()
+
+    _write(holder.doc_repo.doc_file, DOCS + [
+        _month("2565", "ธันวาคม", "กค 0702/4", "ให้บริการต้องเสีย VAT เท่าไร", "ร้อยละ 7")
+    ])
+    # ระหว่าง reload ยังให้บริการ Snapshot เดิม
+    assert holder.get() is old
+    _wait_for(lambda: holder.peek() is not old)
+
+    new = holder.get()
+    assert len(new.chunks) == 4 and "2565" in [s.key for s in new.shards]
+    assert new.version != old.version
+    assert loaded == [old, new]
+
+
+def test_failed_reload_keeps_previous_snapshot_until_file_changes_again(holder):
+    old = holder.get()
+    loads = []
+    original_load = holder._load
+
+    def counting_load():
+        loads.append(1)
+        return original_load()
+
+    holder._load = counting_load
+
+    with open(holder.doc_repo.doc_file, "w", encoding="utf-8") as f:
+        f.write("{broken json")
+    holder.get()
+    _wait_for(lambda: holder._failed_signature is not None and not holder._reloading)
+    assert holder.peek() is old and len(loads) == 1
+
+    # signature เดิมที่เคยล้มเหลว ไม่ลองซ้ำทุก Request
+    for _ in range(3):
+        assert holder.get() is old
+    time.sleep(0.05)
+    assert len(loads) == 1
+
+    _write(holder.doc_repo.doc_file, DOCS[:2])
+    holder.get()
+    _wait_for(lambda: holder.peek() is not old)
+    assert len(holder.get().chunks) == 2 and holder._failed_signature is None
+
+
+# ---------- select_shards ----------
+
+def _snapshot(years):
+    shards = [ShardView(str(y or "unknown"), y, 0, [], None) for y in years]
+    return IndexSnapshot([], None, shards, ())
+
+
+@pytest.mark.parametrize("year_from,year_to,expected", [
+    (None, None, [2567, 2566, 2565, None]),
+    (2566, None, [2567, 2566]),
+    (None, 2566, [2566, 2565]),
+    (2566, 2566, [2566]),
+    (2565, 2567, [2567, 2566, 2565]),
+    (2570, None, []),
+    (None, 2500, []),
+    (2567, 2565, []),
+])
+def test_select_shards_by_year(year_from, year_to, expected):
+    snapshot = _snapshot([2567, 2566, 2565, None])
+    assert [s.year for s in snapshot.select_shards(year_from, year_to)] == expected
@@ -0,0 +1,204 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from src.api.services.job_service import JobService
+from src.repository.job_repository import JobRepository
+
+
+@pytest.fixture
+def repo(tmp_path):
+    return JobRepository(str(tmp_path / "jobs.sqlite3"))
+
+
+# ---------- JobRepository ----------
+
+def test_job_lifecycle(repo):
+    job = repo.create("j1", "VAT คืออะไร", 2565, None)
+    assert job["status"] == "queued" and job["partial_answer"] == "" and job["result"] is None
+    assert (job["year_from"], job["year_to"]) == (2565, None)
+
+    repo.update("j1", status="running", partial_answer="ภาษี")
+    assert repo.get("j1")["status"] == "running"
+
+    result = {"answer": "ภาษีมูลค่าเพิ่ม", "refs": [{"title": "กค 0702/1"}]}
+    repo.update("j1", status="succeeded", partial_answer=result["answer"], result=result)
+    done = repo.get("j1")
+    assert done["status"] == "succeeded" and done["result"] == result
+    assert done["updated_at"] >= done["created_at"]
+
+    repo.create("j2", "q", None, None)
+    repo.update("j2", status="failed", error="ollama down")
+    assert repo.get("j2")["error"] == "ollama down"
+    assert repo.get("missing") is None
+
+
+def test_list_active_survives_reopen_in_submit_order(repo):
+    for job_id, status in (("a", "succeeded"), ("b", "running"), ("c", "queued"), ("d", "failed")):
+        repo.create(job_id, job_id, None, None)
+        if status != "queued":
+            repo.update(job_id, status=status)
+
+    reopened = JobRepository(repo.path)
+    assert [(j["id"], j["status"]) for j in reopened.list_active()] == [("b", "running"), ("c", "queued")]
+
+
+def test_purge_removes_only_finished_jobs_older_than_cutoff(repo):
+    for job_id, status in (("done", "succeeded"), ("failed", "failed"), ("waiting", "queued"), ("busy", "running")):
+        repo.create(job_id, job_id, None, None)
+        repo.update(job_id, status=status)
+
+    assert repo.purge(time.time() - 3600) == 0
+    assert repo.purge(time.time() + 1) == 2
+    assert repo.get("done") is None and repo.get("failed") is None
+    assert {j["id"] for j in repo.list_active()} == {"waiting", "busy"}
+
+
+# ---------- JobService ----------
+
+class _StubRAG:
+    """แทน RAGService: stream_question ค้างไว้จนกว่าจะ set() gate ของคำถามนั้น"""
+
+    def __init__(self, bulk_pending: int = 0):
+        self.llm = SimpleNamespace(scheduler=SimpleNamespace(
+            num_parallel=1, pending=lambda lane: bulk_pending if lane == "bulk" else 0
+        ))
+        self.gates = {}
+        self.calls = []
+        self.fail_first = {}
+
+    def gate(self, question: str) -> asyncio.Event:
+        return self.gates.setdefault(question, asyncio.Event())
+
+    async def stream_question(self, question, year_from=None, year_to=None, priority="interactive", deadline=None):
+        self.calls.append((question, priority, deadline))
+        if self.fail_first.pop(question, None) is not None:
+            raise HTTPException(status_code=503, detail="busy", headers={"Retry-After": "0"})
+        yield "refs", {"main_reference": "ref", "refs": [{"title": "ref"}], "domain": "ทั่วไป"}
+        yield "token", {"text": f"คำตอบ {question}"}
+        await self.gate(question).wait()
+        if question.startswith("error"):
+            yield "error", {"detail": "ระบบขัดข้อง"}
+            return
+        yield "done", {"status": "success"}
+
+
+async def _wait(predicate, timeout: float = 5.0):
+    """predicate คืน bool หรือ coroutine ของ bool"""
+    deadline = time.monotonic() + timeout
+    while True:
+        ok = predicate()
+        if asyncio.iscoroutine(ok):
+            ok = await ok
+        if ok:
+            return
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+def test_queue_position_counts_scheduler_lane(repo):
+    async def scenario():
+        rag = _StubRAG(bulk_pending=2)
+        service = JobService(rag, repo)
+        await service.start()
+        try:
+            first = await service.submit("q1")
+            await _wait(lambda: _status(service, first, "running"))
+            second = await service.submit("q2")
+            third = await service.submit("q3")
+
+            # งานใน lane bulk ของ Scheduler 2 งานอยู่ก่อนงานในคิวของ JobService
+            assert (await service.get(first["job_id"]))["queue_position"] is None
+            assert second["queue_position"] == 3
+            assert third["queue_position"] == 4
+            # คำตอบบางส่วนอ่านจาก Memory ได้ทันที
+            assert (await service.get(first["job_id"]))["partial_answer"] == "คำตอบ q1"
+
+            rag.gate("q1").set()
+            await _wait(lambda: _status(service, second, "running"))
+            assert (await service.get(third["job_id"]))["queue_position"] == 3
+            assert service.stats() == {"pending_jobs": 1, "running_jobs": 1}
+
+            rag.gate("q2").set()
+            rag.gate("q3").set()
+            await _wait(lambda: _status(service, third, "succeeded"))
+            done = await service.get(first["job_id"])
+            assert done["result"]["answer"] == "คำตอบ q1" and done["result"]["main_reference"] == "ref"
+            assert rag.calls[0] == ("q1", "bulk", 0)
+        finally:
+            await service.stop()
+
+    asyncio.run(scenario())
+
+
+def test_error_event_fails_job_and_busy_queue_is_retried(repo):
+    async def scenario():
+        rag = _StubRAG()
+        rag.fail_first["q"] = True
+        rag.gate("q").set()
+        rag.gate("error").set()
+        service = JobService(rag, repo)
+        await service.start()
+        try:
+            failed = await service.submit("error")
+            ok = await service.submit("q")
+            await _wait(lambda: _status(service, ok, "succeeded"))
+            job = await service.get(failed["job_id"])
+            assert job["status"] == "failed" and job["error"] == "ระบบขัดข้อง"
+            assert job["partial_answer"] == "คำตอบ error"
+            # 503 ก่อนเริ่มตอบ = รอตาม Retry-After แล้วลองใหม่
+            assert [q for q, _, _ in rag.calls].count("q") == 2
+        finally:
+            await service.stop()
+
+    asyncio.run(scenario())
+
+
+def test_unfinished_jobs_resume_after_restart(repo):
+    repo.create("old-running", "q1", None, None)
+    repo.update("old-running", status="running", partial_answer="ครึ่งทาง")
+    repo.create("old-queued", "q2", None, None)
+    repo.create("finished", "q3", None, None)
+    repo.update("finished", status="succeeded")
+
+    async def scenario():
+        rag = _StubRAG()
+        rag.gate("q1").set()
+        rag.gate("q2").set()
+        service = JobService(rag, JobRepository(repo.path))
+        await service.start()
+        try:
+            await _wait(lambda: _status(service, {"job_id": "old-queued"}, "succeeded"))
+            assert (await service.get("old-running"))["result"]["answer"] == "คำตอบ q1"
+            assert [q for q, _, _ in rag.calls] == ["q1", "q2"]
+        finally:
+            await service.stop()
+
+    asyncio.run(scenario())
+
+
+def test_submit_rejects_when_too_many_pending(repo):
+    async def scenario():
+        rag = _StubRAG()
+        service = JobService(rag, repo)
+        service.max_pending = 1
+        await service.start()
+        try:
+            await service.submit("q1")
+            # worker รับงานแรกไปแล้ว คิวว่าง
+            await _wait(lambda: not service._pending)
+            await service.submit("q2")
+            with pytest.raises(HTTPException) as exc:
+                await service.submit("q3")
+            assert exc.value.status_code == 503
+        finally:
+            await service.stop()
+
+    asyncio.run(scenario())
+
+
+async def _status(service, job, status) -> bool:
+    return (await service.get(job["job_id"]))["status"] == status
@@ -0,0 +1,140 @@
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.config import settings
+from src.repository.log_repository import LogRepository
+
+BASE = datetime(2024, 1, 1, 9, 0, 0)
+
+
+def _entry(i: int, domain: str = "vat", status: str = "ok", **extra):
+    return {
+        "timestamp": (BASE + timedelta(minutes=i)).isoformat(),
+        "question": f"คำถามที่ {i}",
+        "answer": f"คำตอบที่ {i}",
+        "answer_source": "llm",
+        "domain": domain,
+        "status": status,
+        "main_reference": f"กค 07{i % 3}",
+        "references": [{"doc": i}],
+        **extra,
+    }
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    # ไม่นำเข้า JSON แบบเก่า และไม่ compact อัตโนมัติระหว่างทดสอบ
+    monkeypatch.setitem(settings.LOG_CONFIG, "legacy_json", None)
+    monkeypatch.setitem(settings.LOG_CONFIG, "compact_every", 0)
+    return LogRepository(str(tmp_path / "logs.sqlite3"))
+
+
+def test_query_pages_newest_first_without_gaps(repo):
+    repo.save_logs([_entry(i) for i in range(25)])
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        items, cursor = repo.query(limit=10, cursor=cursor)
+        seen.extend(item["question"] for item in items)
+        pages += 1
+        if cursor is None:
+            break
+    assert pages == 3
+    assert seen == [f"คำถามที่ {i}" for i in reversed(range(25))]
+
+
+def test_query_exact_page_has_no_next_cursor(repo):
+    repo.save_logs([_entry(i) for i in range(10)])
+    items, cursor = repo.query(limit=10)
+    assert len(items) == 10 and cursor is None
+    assert repo.query(limit=10, cursor=items[-1]["id"]) == ([], None)
+
+
+def test_query_filters_and_time_range(repo):
+    repo.save_logs([_entry(i, domain="vat" if i % 2 else "pit", status="error" if i == 7 else "ok")
+                    for i in range(10)])
+
+    items, _ = repo.query(domain="vat")
+    assert [item["question"] for item in items] == [f"คำถามที่ {i}" for i in (9, 7, 5, 3, 1)]
+    items, _ = repo.query(domain="vat", status="error")
+    assert [item["question"] for item in items] == ["คำถามที่ 7"]
+    items, _ = repo.query(main_reference="กค 070")
+    assert {item["question"] for item in items} == {"คำถามที่ 0", "คำถามที่ 3", "คำถามที่ 6", "คำถามที่ 9"}
+
+    since = (BASE + timedelta(minutes=3)).timestamp()
+    until = (BASE + timedelta(minutes=6)).timestamp()
+    items, _ = repo.query(since=since, until=until)
+    assert [item["question"] for item in items] == ["คำถามที่ 5", "คำถามที่ 4", "คำถามที่ 3"]
+
+
+def test_query_summary_omits_answer_and_references(repo):
+    repo.save_log(_entry(1))
+    full, _ = repo.query()
+    assert full[0]["answer"] == "คำตอบที่ 1" and full[0]["references"] == [{"doc": 1}]
+
+    summary, _ = repo.query(summary=True)
+    assert summary[0] == {
+        "id": full[0]["id"], "domain": "vat", "status": "ok", "main_reference": "กค 071",
+        "timestamp": full[0]["timestamp"], "question": "คำถามที่ 1", "answer_source": "llm",
+    }
+
+
+def test_migrates_store_without_filter_columns(tmp_path, monkeypatch):
+    monkeypatch.setitem(settings.LOG_CONFIG, "legacy_json", None)
+    path = str(tmp_path / "old.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE logs (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL,"
+               " size INTEGER NOT NULL, entry TEXT NOT NULL)")
+    db.execute("INSERT INTO logs (created_at, size, entry) VALUES (0, 0, ?)",
+               ('{"question": "เก่า", "domain": "cit", "status": "ok"}',))
+    db.commit()
+    db.close()
+
+    repo = LogRepository(path)
+    items, _ = repo.query(domain="cit")
+    assert [item["question"] for item in items] == ["เก่า"]
+
+
+def _questions(repo):
+    return [entry["question"] for entry in repo.get_all_logs()]
+
+
+def test_compact_keeps_newest_max_entries(repo):
+    repo.max_entries, repo.max_bytes, repo.max_age = 3, None, None
+    repo.save_logs([_entry(i) for i in range(8)])
+    assert repo.compact() == 5
+    assert _questions(repo) == ["คำถามที่ 5", "คำถามที่ 6", "คำถามที่ 7"]
+    assert repo.compact() == 0
+
+
+def test_compact_keeps_newest_within_max_bytes(repo):
+    repo.max_entries, repo.max_age = None, None
+    repo.save_logs([_entry(i) for i in range(6)])
+    sizes = [row[0] for row in repo._db.execute("SELECT size FROM logs ORDER BY id DESC")]
+    repo.max_bytes = sum(sizes[:2]) + 1
+
+    assert repo.compact() == 4
+    assert _questions(repo) == ["คำถามที่ 4", "คำถามที่ 5"]
+
+
+def test_compact_drops_entries_older_than_max_age(repo):
+    repo.max_entries, repo.max_bytes, repo.max_age = None, None, 86400
+    now = datetime.now()
+    repo.save_logs([
+        _entry(1, timestamp=(now - timedelta(days=3)).isoformat()),
+        _entry(2, timestamp=(now - timedelta(hours=1)).isoformat()),
+        _entry(3, timestamp=now.isoformat()),
+    ])
+    assert repo.compact() == 1
+    assert _questions(repo) == ["คำถามที่ 2", "คำถามที่ 3"]
+
+
+def test_compact_runs_automatically_every_n_writes(repo):
+    repo.max_entries, repo.max_bytes, repo.max_age = 4, None, None
+    repo.compact_every = 5
+    repo.save_logs([_entry(i) for i in range(3)])
+    assert repo.count() == 3
+    repo.save_logs([_entry(i) for i in range(3, 6)])
+    assert repo.count() == 4
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from src.config import settings
+from src.repository.log_repository import LogRepository
+from src.repository.log_sink import LogSink
+
+
+def _entry(i: int):
+    return {"timestamp": "2024-01-01T09:00:00", "question": f"คำถามที่ {i}", "answer": "-"}
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.setitem(settings.LOG_CONFIG, "legacy_json", None)
+    monkeypatch.setitem(settings.LOG_CONFIG, "compact_every", 0)
+    return LogRepository(str(tmp_path / "logs.sqlite3"))
+
+
+def _wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+class _GatedRepo:
+    """LogRepository ที่ save_logs รอจนกว่าจะ set() gate (ใช้ถือ thread เขียนไว้)"""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.gate = threading.Event()
+        self.batches = []
+
+    def save_logs(self, entries):
+        self.gate.wait(5)
+        self.batches.append(len(entries))
+        self.repo.save_logs(entries)
+
+
+def test_writes_full_batches_without_waiting_for_interval(repo):
+    sink = LogSink(repo, buffer_size=100, batch_size=5, flush_interval=60)
+    for i in range(10):
+        sink.submit(_entry(i))
+    _wait_for(lambda: sink.stats()["written"] == 10)
+    assert sink.stats()["batches"] == 2
+    assert repo.count() == 10
+    sink.close()
+
+
+def test_partial_batch_is_written_after_flush_interval(repo):
+    sink = LogSink(repo, buffer_size=100, batch_size=50, flush_interval=0.05)
+    for i in range(3):
+        sink.submit(_entry(i))
+    _wait_for(lambda: repo.count() == 3)
+    assert sink.stats()["batches"] == 1
+    sink.close()
+
+
+def test_full_buffer_drops_and_counts(repo):
+    gated = _GatedRepo(repo)
+    sink = LogSink(gated, buffer_size=3, batch_size=1, flush_interval=60)
+    sink.submit(_entry(0))
+    # thread เขียนถือ entry แรกไว้ buffer ว่างอีก 3 ช่อง
+    _wait_for(lambda: sink.stats()["buffered"] == 0)
+    for i in range(1, 6):
+        sink.submit(_entry(i))
+
+    stats = sink.stats()
+    assert stats["submitted"] == 4 and stats["dropped"] == 2 and stats["buffered"] == 3
+    gated.gate.set()
+    sink.close()
+    assert repo.count() == 4
+
+
+def test_flush_writes_entries_held_by_writer_thread(repo):
+    # batch ยังไม่ครบและ flush_interval ยาว: thread เขียนถือ log ไว้รอครบ batch
+    sink = LogSink(repo, buffer_size=100, batch_size=50, flush_interval=60)
+    for i in range(3):
+        sink.submit(_entry(i))
+    _wait_for(lambda: sink.stats()["buffered"] == 0)
+    assert repo.count() == 0
+
+    sink.flush()
+    assert repo.count() == 3
+    assert [e["question"] for e in repo.get_all_logs()] == [f"คำถามที่ {i}" for i in range(3)]
+
+    # flush ซ้ำตอนไม่มีอะไรค้างต้องคืนทันที
+    sink.flush(timeout=1)
+    assert sink.stats()["written"] == 3
+    sink.close()
+
+
+def test_close_drains_and_later_submits_write_directly(repo):
+    sink = LogSink(repo, buffer_size=100, batch_size=1000, flush_interval=60)
+    for i in range(7):
+        sink.submit(_entry(i))
+    sink.close()
+    assert repo.count() == 7
+    assert not sink._thread.is_alive()
+
+    sink.submit(_entry(7))
+    assert repo.count() == 8
+    sink.close()
+
+
+def test_write_errors_are_counted_as_dropped(repo):
+    class Broken:
+        def save_logs(self, entries):
+            raise OSError("disk full")
+
+    sink = LogSink(Broken(), buffer_size=10, batch_size=2, flush_interval=60)
+    sink.submit(_entry(0))
+    sink.submit(_entry(1))
+    _wait_for(lambda: sink.stats()["errors"] == 1)
+    assert sink.stats()["dropped"] == 2 and sink.stats()["written"] == 0
+    sink.close()
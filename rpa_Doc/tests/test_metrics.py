@@ -0,0 +1,107 @@
+import math
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.core.metrics import Counter, Histogram, MetricsRegistry, Sample, _number
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    h = Histogram("rag_stage_seconds", "Stage time", (0.1, 1), label="stage")
+    for value in (0.05, 0.1, 0.5, 5):
+        h.observe(value, "retrieval")
+    h.observe(2, "generation")
+
+    assert h.render() == [
+        "# HELP rag_stage_seconds Stage time",
+        "# TYPE rag_stage_seconds histogram",
+        'rag_stage_seconds_bucket{stage="generation",le="0.1"} 0',
+        'rag_stage_seconds_bucket{stage="generation",le="1"} 0',
+        'rag_stage_seconds_bucket{stage="generation",le="+Inf"} 1',
+        'rag_stage_seconds_sum{stage="generation"} 2',
+        'rag_stage_seconds_count{stage="generation"} 1',
+        # ค่าที่เท่ากับขอบ bucket พอดีนับอยู่ใน bucket นั้น (le = น้อยกว่าหรือเท่ากับ)
+        'rag_stage_seconds_bucket{stage="retrieval",le="0.1"} 2',
+        'rag_stage_seconds_bucket{stage="retrieval",le="1"} 3',
+        'rag_stage_seconds_bucket{stage="retrieval",le="+Inf"} 4',
+        'rag_stage_seconds_sum{stage="retrieval"} 5.65',
+        'rag_stage_seconds_count{stage="retrieval"} 4',
+    ]
+
+
+def test_histogram_and_counter_without_label():
+    h = Histogram("h", "help", (1,))
+    h.observe(0.5)
+    assert h.render()[2:] == ['h_bucket{le="1"} 1', 'h_bucket{le="+Inf"} 1', "h_sum 0.5", "h_count 1"]
+
+    c = Counter("c_total", "help")
+    c.inc()
+    c.inc(2)
+    assert c.render() == ["# HELP c_total help", "# TYPE c_total counter", "c_total 3"]
+
+
+def test_counter_series_per_label():
+    c = Counter("rag_requests_total", "Requests", label="status")
+    c.inc(label_value="success")
+    c.inc(label_value="error")
+    c.inc(label_value="success")
+    assert c.render()[2:] == ['rag_requests_total{status="error"} 1', 'rag_requests_total{status="success"} 2']
+
+
+def test_label_values_are_escaped():
+    c = Counter("c_total", "help", label="q")
+    c.inc(label_value='a"b\\c\nd')
+    assert c.render()[-1] == 'c_total{q="a\\"b\\\\c\\nd"} 1'
+
+
+@pytest.mark.parametrize("value,text", [
+    (3, "3"), (3.0, "3"), (0.25, "0.25"), (math.inf, "+Inf"), (-math.inf, "-Inf"), (True, "1"),
+])
+def test_number_format(value, text):
+    assert _number(value) == text
+
+
+def test_registry_reuses_metrics_and_writes_help_once_per_sample_name():
+    registry = MetricsRegistry()
+    assert registry.counter("c_total", "help") is registry.counter("c_total", "other help")
+    registry.counter("c_total", "help").inc()
+
+    text = registry.render([
+        Sample("ollama_queue_depth", "gauge", "Queue depth", 2, {"lane": "interactive"}),
+        Sample("ollama_queue_depth", "gauge", "Queue depth", 0, {"lane": "bulk"}),
+        Sample("rag_cache_hit_ratio", "gauge", "Hit ratio", 0.5),
+    ])
+    assert text.endswith("\n")
+    assert text.splitlines() == [
+        "# HELP c_total help",
+        "# TYPE c_total counter",
+        "c_total 1",
+        "# HELP ollama_queue_depth Queue depth",
+        "# TYPE ollama_queue_depth gauge",
+        'ollama_queue_depth{lane="interactive"} 2',
+        'ollama_queue_depth{lane="bulk"} 0',
+        "# HELP rag_cache_hit_ratio Hit ratio",
+        "# TYPE rag_cache_hit_ratio gauge",
+        "rag_cache_hit_ratio 0.5",
+    ]
+
+
+# ---------- GET /metrics ----------
+
+def test_metrics_route_renders_current_state(rag_router):
+    from src.api.controllers import metrics_router
+
+    app = FastAPI()
+    app.include_router(metrics_router.router)
+    r = TestClient(app).get("/metrics")
+
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = r.text.splitlines()
+    assert 'ollama_queue_jobs_total{outcome="cancelled"} 0' in lines
+    assert "rag_inflight_questions 0" in lines
+    # ทุกบรรทัดที่ไม่ใช่ comment คือ "<ชื่อ>[{labels}] <ตัวเลข>"
+    for line in lines:
+        if not line.startswith("#"):
+            float(line.rsplit(" ", 1)[1].replace("Inf", "inf"))
@@ -0,0 +1,226 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from src.api.services.llm_service import LLMService
+from src.core.ollama_backends import BackendPool, NoBackendAvailableError
+from src.core.ollama_client import close_ollama_client
+from src.core.ollama_queue import OllamaScheduler
+from src.devtools.fake_ollama import FakeOllamaConfig, start_fake_ollama
+
+REFUSED = httpx.ConnectError("connection refused")
+
+
+def _status_error(code: int) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "http://backend/api/generate")
+    return httpx.HTTPStatusError("error", request=request, response=httpx.Response(code, request=request))
+
+
+def _pool(*specs, threshold: int = 2) -> BackendPool:
+    pool = BackendPool([{"url": url, "max_concurrency": n} for url, n in specs])
+    pool.failure_threshold = threshold
+    pool.probe_interval = 0.05
+    pool.probe_timeout = 1
+    return pool
+
+
+def _run(coro):
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await close_ollama_client()
+    return asyncio.run(_main())
+
+
+# ---------- BackendPool ----------
+
+def test_try_acquire_picks_least_outstanding_within_capacity():
+    pool = _pool(("http://a", 2), ("http://b", 1))
+    a, b = pool.backends
+
+    # สัดส่วนงานค้างต่อ max_concurrency: a 0/2, b 0/1 -> a แล้ว b 0/1 < a 1/2 -> b แล้ว a
+    assert [pool.try_acquire() for _ in range(3)] == [a, b, a]
+    assert pool.try_acquire() is None
+    assert (a.outstanding, b.outstanding) == (2, 1)
+
+    pool.release(b)
+    assert pool.try_acquire() is b
+    assert pool.try_acquire(exclude=[b]) is None
+
+
+def test_consecutive_failures_eject_backend():
+    pool = _pool(("http://a", 1), ("http://b", 1), threshold=2)
+    a, b = pool.backends
+
+    pool.release(pool.try_acquire(a), REFUSED)
+    assert a.healthy and a.consecutive_failures == 1
+    # สำเร็จคั่นกลาง = เริ่มนับใหม่
+    pool.release(pool.try_acquire(a))
+    assert a.consecutive_failures == 0
+
+    pool.release(pool.try_acquire(a), _status_error(503))
+    pool.release(pool.try_acquire(a), REFUSED)
+    assert not a.healthy and a.down_since is not None
+    assert pool.try_acquire() is b
+    with pytest.raises(NoBackendAvailableError):
+        pool.try_acquire(a)
+
+
+def test_client_errors_do_not_count_as_backend_failures():
+    pool = _pool(("http://a", 1), threshold=1)
+    a = pool.backends[0]
+    pool.release(pool.try_acquire(), _status_error(400))
+    pool.release(pool.try_acquire(), asyncio.CancelledError())
+    assert a.healthy and a.failures == 0 and a.outstanding == 0
+
+
+def test_no_healthy_backend_raises():
+    pool = _pool(("http://a", 1), ("http://b", 1), threshold=1)
+    for backend in pool.backends:
+        pool.report_failure(backend, REFUSED)
+    with pytest.raises(NoBackendAvailableError):
+        pool.try_acquire()
+    with pytest.raises(NoBackendAvailableError):
+        pool.pick()
+
+
+def test_lease_waits_for_free_slot_and_times_out():
+    pool = _pool(("http://a", 1))
+    held = pool.try_acquire()
+
+    async def scenario():
+        with pytest.raises(NoBackendAvailableError):
+            async with pool.lease(timeout=0.1):
+                pass
+        asyncio.get_running_loop().call_later(0.1, pool.release, held)
+        async with pool.lease(timeout=2) as backend:
+            return backend
+
+    assert _run(scenario()) is held
+    assert held.outstanding == 0
+
+
+# ---------- เครื่อง Ollama จำลอง 2 เครื่อง ----------
+
+@pytest.fixture
+def servers():
+    started = {}
+
+    def start(name: str, port: int = 0, **config):
+        server = start_fake_ollama(port=port, config=FakeOllamaConfig(response_tokens=4, tokens_per_second=0, **config))
+        started[name] = server
+        return server
+
+    def url(name: str) -> str:
+        host, port = started[name].server_address[:2]
+        return f"http://{host}:{port}"
+
+    def kill(name: str):
+        started[name].shutdown()
+        started[name].server_close()
+
+    start.url, start.kill, start.servers = url, kill, started
+    yield start
+    for server in started.values():
+        server.shutdown()
+        server.server_close()
+
+
+def _service(pool: BackendPool) -> LLMService:
+    svc = LLMService()
+    svc.backends = pool
+    svc.scheduler = OllamaScheduler(num_parallel=pool.total_concurrency, max_queue=10, default_deadline=0)
+    return svc
+
+
+def test_requests_move_to_other_backend_and_return_after_probe(servers):
+    servers("a")
+    servers("b")
+    pool = _pool((servers.url("a"), 1), (servers.url("b"), 1), threshold=2)
+    a, b = pool.backends
+    svc = _service(pool)
+    port_a = servers.servers["a"].server_address[1]
+
+    async def ask(n: int):
+        return await asyncio.gather(*(svc.call_ollama(f"คำถาม {i}", options={"num_predict": 4}) for i in range(n)))
+
+    assert all(_run(ask(4)))
+    assert a.requests > 0 and b.requests > 0
+
+    servers.kill("a")
+    before_b = b.requests
+    # ทุกคำถามยังได้คำตอบ: ที่ส่งไป a จะถูกส่งซ้ำไป b จน a ถูกนำออก
+    assert all(_run(ask(6)))
+    assert not a.healthy
+    assert b.requests - before_b >= 6
+
+    before_a = a.requests
+    assert all(_run(ask(2)))
+    assert a.requests == before_a
+
+    # เปิด a กลับมาที่ port เดิม probe_forever จะนำกลับเข้ามาใช้
+    servers("a", port=port_a)
+
+    async def wait_probe():
+        task = asyncio.get_running_loop().create_task(pool.probe_forever())
+        try:
+            for _ in range(100):
+                if a.healthy:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            task.cancel()
+
+    _run(wait_probe())
+    assert a.healthy and a.down_since is None
+    assert all(_run(ask(4)))
+    assert a.requests > before_a
+
+
+def test_5xx_is_retried_on_next_backend(servers):
+    servers("broken", error_rate=1.0)
+    servers("ok")
+    pool = _pool((servers.url("broken"), 1), (servers.url("ok"), 1), threshold=5)
+    broken, ok = pool.backends
+    svc = _service(pool)
+
+    assert _run(svc.call_ollama("คำถาม", options={"num_predict": 4}))
+    assert broken.failures == 1 and broken.healthy
+    assert ok.requests == 1 and ok.failures == 0
+
+
+def test_pinned_backend_is_not_retried_elsewhere(servers):
+    servers("a")
+    servers("b")
+    pool = _pool((servers.url("a"), 1), (servers.url("b"), 1))
+    a, b = pool.backends
+    svc = _service(pool)
+    servers.kill("a")
+
+    async def send(backend):
+        async with httpx.AsyncClient() as client:
+            return (await client.get(f"{backend.url}/api/tags")).status_code
+
+    with pytest.raises(httpx.ConnectError):
+        _run(svc._on_backend(send, backend=a))
+    assert b.requests == 0
+
+
+def test_all_backends_down_returns_503(servers):
+    servers("a")
+    servers("b")
+    pool = _pool((servers.url("a"), 1), (servers.url("b"), 1), threshold=1)
+    svc = _service(pool)
+    servers.kill("a")
+    servers.kill("b")
+
+    # ครั้งแรก: ลองครบทุกเครื่องแล้วต่อไม่ได้, ครั้งถัดไป: ไม่มีเครื่องที่ปกติเหลือ
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc:
+            _run(svc.call_ollama("คำถาม", options={"num_predict": 4}))
+        assert exc.value.status_code == 503
+        assert int(exc.value.headers["Retry-After"]) >= 1
+    assert not any(b.healthy for b in pool.backends)
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.core.ollama_queue import DeadlineExceededError, OllamaScheduler, QueueFullError
+
+
+def _blocked_scheduler(**kwargs):
+    """Scheduler 1 slot ที่ worker ถูกกั้นไว้จนกว่าจะ set() event ที่คืนมา"""
+    scheduler = OllamaScheduler(num_parallel=1, **kwargs)
+    gate, started = threading.Event(), threading.Event()
+
+    def hold():
+        started.set()
+        gate.wait(5)
+
+    blocker = scheduler.enqueue(hold, deadline=0)
+    assert started.wait(5)
+    return scheduler, gate, blocker
+
+
+def test_interactive_lane_runs_before_bulk():
+    scheduler, gate, _ = _blocked_scheduler(max_queue=10, default_deadline=0)
+    order = []
+    futures = [scheduler.enqueue(order.append, "bulk-1", priority="bulk"),
+               scheduler.enqueue(order.append, "bulk-2", priority="bulk"),
+               scheduler.enqueue(order.append, "interactive", priority="interactive")]
+    assert scheduler.pending("bulk") == 2 and scheduler.pending("interactive") == 1
+
+    gate.set()
+    for f in futures:
+        f.result(timeout=5)
+    assert order == ["interactive", "bulk-1", "bulk-2"]
+    assert scheduler.stats()["completed"] == 4
+
+
+def test_max_queue_rejects_with_retry_after():
+    scheduler, gate, _ = _blocked_scheduler(max_queue=2, default_deadline=0)
+    scheduler.enqueue(time.sleep, 0)
+    scheduler.enqueue(time.sleep, 0, priority="bulk")
+    with pytest.raises(QueueFullError) as exc:
+        scheduler.enqueue(time.sleep, 0)
+    assert exc.value.depth == 2 and exc.value.retry_after >= 1
+    gate.set()
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_unknown_lane_is_rejected():
+    scheduler = OllamaScheduler(num_parallel=1, max_queue=1, default_deadline=0)
+    with pytest.raises(ValueError):
+        scheduler.enqueue(time.sleep, 0, priority="urgent")
+
+
+def test_deadline_expires_waiting_jobs():
+    scheduler, gate, _ = _blocked_scheduler(max_queue=10, default_deadline=0)
+
+    # หมด deadline ฝั่งผู้เรียก (submit รอไม่ไหว) -> ยกเลิกก่อนถึงโมเดล
+    with pytest.raises(DeadlineExceededError):
+        scheduler.submit(time.sleep, 0, deadline=0.05)
+    # หมด deadline ระหว่างรอในคิว -> worker ทิ้งเอง
+    dropped = scheduler.enqueue(time.sleep, 0, deadline=0.05)
+    time.sleep(0.1)
+    gate.set()
+    with pytest.raises(DeadlineExceededError):
+        dropped.result(timeout=5)
+
+    stats = scheduler.stats()
+    assert stats["expired"] == 2
+    assert stats["cancelled"] == 0 and stats["failed"] == 0
+    assert stats["queue_depth"] == 0
+
+
+def test_cancel_and_failure_are_counted_separately():
+    scheduler, gate, _ = _blocked_scheduler(max_queue=10, default_deadline=0)
+    waiting = scheduler.enqueue(time.sleep, 0)
+    assert waiting.cancel()
+
+    def boom():
+        raise RuntimeError("ollama error")
+
+    failing = scheduler.enqueue(boom)
+    gate.set()
+    with pytest.raises(RuntimeError):
+        failing.result(timeout=5)
+
+    stats = scheduler.stats()
+    assert stats["cancelled"] == 1 and stats["failed"] == 1 and stats["expired"] == 0
+    assert stats["queue_depth"] == 0
+
+
+def test_async_jobs_share_the_slots():
+    scheduler = OllamaScheduler(num_parallel=1, max_queue=10, default_deadline=0)
+    running, peak = 0, 0
+
+    async def work(i):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return i
+
+    async def main():
+        return await asyncio.gather(*(scheduler.run(lambda i=i: work(i)) for i in range(4)))
+
+    assert asyncio.run(main()) == [0, 1, 2, 3]
+    assert peak == 1
+    assert scheduler.stats()["completed"] == 4
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from src.api.services.rag_service import PreparedQuestion, RAGService
+
+
+class _CountingLLM:
+    """แทน LLMService: นับจำนวนครั้งที่ generate และค้างไว้จนกว่าจะ set() gate"""
+
+    def __init__(self, error: Exception = None):
+        self.calls = 0
+        self.error = error
+        self.gate = asyncio.Event()
+
+    async def call_ollama(self, prompt, priority="interactive", options=None, timings=None):
+        self.calls += 1
+        await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return f"คำตอบของ {prompt}"
+
+
+def _service(llm) -> RAGService:
+    # ใช้เฉพาะส่วน single-flight (ไม่เปิด Index/Log/Cache จริง)
+    svc = RAGService.__new__(RAGService)
+    svc.llm = llm
+    svc.cache = None
+    svc._inflight = {}
+    svc.singleflight = {"leaders": 0, "coalesced": 0}
+    return svc
+
+
+def _prepared(key: str = "k1") -> PreparedQuestion:
+    return PreparedQuestion(refs=[], prompt=f"prompt-{key}", options={}, cache_key=key)
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_identical_questions_generate_once():
+    async def scenario():
+        llm = _CountingLLM()
+        svc = _service(llm)
+        tasks = [asyncio.ensure_future(svc._generate_once(_prepared())) for _ in range(5)]
+        await _settle()
+        assert llm.calls == 1 and svc.inflight_stats()["inflight_questions"] == 1
+
+        llm.gate.set()
+        results = await asyncio.gather(*tasks)
+        assert [a for a, _ in results] == ["คำตอบของ prompt-k1"] * 5
+        assert [c for _, c in results] == [False] + [True] * 4
+        assert svc.singleflight == {"leaders": 1, "coalesced": 4}
+        assert svc._inflight == {}
+
+    asyncio.run(scenario())
+
+
+def test_different_keys_generate_separately():
+    async def scenario():
+        llm = _CountingLLM()
+        llm.gate.set()
+        svc = _service(llm)
+        results = await asyncio.gather(svc._generate_once(_prepared("k1")), svc._generate_once(_prepared("k2")))
+        assert llm.calls == 2
+        assert [c for _, c in results] == [False, False]
+
+    asyncio.run(scenario())
+
+
+def test_failure_reaches_every_waiter_and_clears_entry():
+    async def scenario():
+        llm = _CountingLLM(error=RuntimeError("ollama down"))
+        svc = _service(llm)
+        tasks = [asyncio.ensure_future(svc._generate_once(_prepared())) for _ in range(3)]
+        await _settle()
+        llm.gate.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert svc._inflight == {}
+
+        # คำถามถัดไปเริ่ม generate ใหม่ ไม่ได้รับ error เดิมซ้ำ
+        llm.error = None
+        answer, coalesced = await svc._generate_once(_prepared())
+        assert answer == "คำตอบของ prompt-k1" and not coalesced
+        assert llm.calls == 2
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize("cancelled", [0, 1])
+def test_cancelling_a_caller_does_not_cancel_shared_generation(cancelled):
+    """cancelled = 0: ผู้เรียกคนแรก (ที่สร้างงาน) เลิกรอ, 1: ผู้ที่มารอทีหลังเลิกรอ"""
+    async def scenario():
+        llm = _CountingLLM()
+        svc = _service(llm)
+        tasks = [asyncio.ensure_future(svc._generate_once(_prepared())) for _ in range(3)]
+        await _settle()
+        shared = svc._inflight["k1"]
+
+        tasks[cancelled].cancel()
+        await _settle()
+        assert not shared.cancelled()
+
+        llm.gate.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert isinstance(results[cancelled], asyncio.CancelledError)
+        others = [r for i, r in enumerate(results) if i != cancelled]
+        assert [a for a, _ in others] == ["คำตอบของ prompt-k1"] * 2
+        assert llm.calls == 1
+        assert svc._inflight == {}
+
+    asyncio.run(scenario())
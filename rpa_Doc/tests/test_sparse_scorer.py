@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+
+from src.core.sparse_scorer import SparseScorer, select_top_k
+
+
+def test_select_top_k_orders_and_limits():
+    rows = np.array([10, 11, 12, 13, 14])
+    scores = np.array([0.2, 0.9, 0.5, 0.9, 0.1])
+    top_rows, top_scores = select_top_k(rows, scores, 3)
+    assert top_scores.tolist() == [0.9, 0.9, 0.5]
+    assert set(top_rows[:2].tolist()) == {11, 13} and top_rows[2] == 12
+
+
+def test_select_top_k_applies_min_score_and_edge_cases():
+    rows = np.array([1, 2, 3])
+    scores = np.array([0.05, 0.3, 0.01])
+    assert select_top_k(rows, scores, 5, min_score=0.05)[0].tolist() == [2, 1]
+    assert select_top_k(rows, scores, 0)[0].size == 0
+    assert select_top_k(rows[:0], scores[:0], 3)[0].size == 0
+
+
+@pytest.fixture
+def matrix():
+    rng = np.random.default_rng(0)
+    m = sp.random(200, 50, density=0.05, random_state=rng, format="csr")
+    return normalize(m, norm="l2")
+
+
+def _dense_top(matrix, q, k):
+    scores = (matrix @ q.T).toarray().ravel()
+    order = np.argsort(-scores, kind="stable")[:k]
+    return scores[order]
+
+
+@pytest.mark.parametrize("mode", ["csr", "inverted", "auto"])
+def test_top_k_matches_dense_scoring(matrix, mode):
+    scorer = SparseScorer(matrix)
+    q = normalize(sp.csr_matrix(np.eye(1, 50, 3) + np.eye(1, 50, 17)), norm="l2")
+    _, scores = scorer.top_k(q, 5, mode=mode)
+    expected = _dense_top(matrix, q, 5)
+    np.testing.assert_allclose(scores, expected[:len(scores)])
+    assert len(scores) == min(5, int((expected > 0).sum()))
+
+
+def test_top_k_many_matches_single_queries(matrix):
+    scorer = SparseScorer(matrix)
+    queries = normalize(sp.random(7, 50, density=0.2, random_state=1, format="csr"), norm="l2")
+    batch = scorer.top_k_many(queries, 4, block_size=3)
+    assert len(batch) == 7
+    for i, (rows, scores) in enumerate(batch):
+        single_rows, single_scores = scorer.top_k(queries[i], 4)
+        np.testing.assert_allclose(scores, single_scores)
+
+
+def test_empty_query_returns_nothing(matrix):
+    rows, scores = SparseScorer(matrix).top_k(sp.csr_matrix((1, 50)), 5)
+    assert rows.size == 0 and scores.size == 0
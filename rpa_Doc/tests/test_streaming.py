@@ -0,0 +1,234 @@
+import asyncio
+import json
+import time
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from src.api.models.schemas import QuestionRequest
+from src.api.services.llm_service import LLMService
+from src.api.services.rag_service import PreparedQuestion, RAGService
+from src.core.ollama_backends import BackendPool
+from src.core.ollama_client import close_ollama_client
+from src.core.ollama_queue import OllamaScheduler
+from src.devtools.fake_ollama import FakeOllamaConfig, start_fake_ollama
+
+REFS = [{"title": "กค 0702/1", "is_primary": True}, {"title": "กค 0702/2", "is_primary": False}]
+
+
+def _overloaded() -> HTTPException:
+    return HTTPException(status_code=503, detail="busy", headers={"Retry-After": "7"})
+
+
+class _StubLLM:
+    """แทน LLMService.stream_ollama: ส่ง token ตามที่กำหนด หรือ error กลางทาง / 503 ตอนเข้าคิว"""
+
+    def __init__(self, tokens=("ภาษี", "มูลค่าเพิ่ม"), error: Exception = None, reject: bool = False):
+        self.tokens = tokens
+        self.error = error
+        self.reject = reject
+        self.calls = []
+        self.closed = False
+
+    def stream_ollama(self, prompt, priority="interactive", options=None, deadline=None, timings=None):
+        if self.reject:
+            raise _overloaded()
+        self.calls.append((priority, deadline))
+
+        async def _chunks():
+            try:
+                for t in self.tokens:
+                    await asyncio.sleep(0)
+                    yield {"response": t, "done": False}
+                if self.error is not None:
+                    raise self.error
+                if timings is not None:
+                    timings.update(queue_wait=1.5, generation=20.0)
+                yield {"response": "", "done": True, "eval_count": len(self.tokens), "eval_duration": 1000}
+            finally:
+                self.closed = True
+
+        return _chunks()
+
+
+class _Sink:
+    def __init__(self):
+        self.entries = []
+
+    def submit(self, entry):
+        self.entries.append(entry)
+
+
+def _service(llm, prompt: str = "prompt", cached=None) -> RAGService:
+    svc = RAGService.__new__(RAGService)
+    svc.llm = llm
+    svc.cache = None
+    svc.log_sink = _Sink()
+
+    async def _prepare_async(question, year_from, year_to):
+        return PreparedQuestion(REFS if prompt else [], prompt, options={}, cache_key="k", cached=cached,
+                                timings={"retrieval": 1.0})
+
+    svc._prepare_async = _prepare_async
+    return svc
+
+
+async def _collect(events):
+    return [e async for e in events]
+
+
+# ---------- RAGService.stream_question ----------
+
+def test_stream_event_order_and_log():
+    llm = _StubLLM()
+    svc = _service(llm)
+    events = asyncio.run(_collect(svc.stream_question("VAT คืออะไร", priority="bulk", deadline=0)))
+
+    assert [e for e, _ in events] == ["refs", "token", "token", "done"]
+    assert events[0][1] == {"main_reference": "กค 0702/1", "refs": REFS, "domain": "ภาษีมูลค่าเพิ่ม"}
+    assert [d["text"] for e, d in events if e == "token"] == ["ภาษี", "มูลค่าเพิ่ม"]
+    assert events[-1][1]["status"] == "success" and events[-1][1]["eval_count"] == 2
+    assert llm.calls == [("bulk", 0)]
+
+    (entry,) = svc.log_sink.entries
+    assert entry["status"] == "success" and entry["answer"] == "ภาษีมูลค่าเพิ่ม"
+    # เวลารอคิว/generate ของ stream ถูกบันทึกเหมือนคำถามแบบปกติ
+    assert entry["timings"]["queue_wait"] == 1.5 and entry["timings"]["generation"] == 20.0
+
+
+def test_stream_error_mid_answer_becomes_error_event():
+    llm = _StubLLM(tokens=("ภาษี",), error=_overloaded())
+    svc = _service(llm)
+    events = asyncio.run(_collect(svc.stream_question("q")))
+
+    assert events[-1] == ("error", {"detail": "busy"})
+    assert [e for e, _ in events] == ["refs", "token", "error"]
+    assert svc.log_sink.entries[0]["status"] == "error"
+    assert svc.log_sink.entries[0]["answer"] == "ภาษี"
+
+
+def test_stream_rejected_before_refs_when_queue_full():
+    svc = _service(_StubLLM(reject=True))
+
+    async def first_event():
+        return await svc.stream_question("q").__anext__()
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(first_event())
+    assert exc.value.status_code == 503
+
+
+def test_stream_closed_early_logs_cancelled_and_closes_llm_stream():
+    llm = _StubLLM(tokens=("ก", "ข", "ค"))
+    svc = _service(llm)
+
+    async def read_two():
+        events = svc.stream_question("q")
+        got = [await events.__anext__(), await events.__anext__()]
+        await events.aclose()
+        return got
+
+    assert [e for e, _ in asyncio.run(read_two())] == ["refs", "token"]
+    assert llm.closed
+    assert svc.log_sink.entries[0]["status"] == "cancelled"
+
+
+def test_stream_without_documents_or_from_cache():
+    events = asyncio.run(_collect(_service(_StubLLM(), prompt=None).stream_question("q")))
+    assert [e for e, _ in events] == ["refs", "done"] and events[-1][1]["status"] == "fail"
+
+    cached = {"answer": "จาก cache", "refs": REFS}
+    llm = _StubLLM()
+    events = asyncio.run(_collect(_service(llm, cached=cached).stream_question("q")))
+    assert events[1:] == [("token", {"text": "จาก cache"}), ("done", {"status": "success", "cached": True})]
+    assert llm.calls == []
+
+
+# ---------- LLMService.stream_ollama ----------
+
+def test_closing_stream_cancels_scheduler_job_and_frees_backend():
+    server = start_fake_ollama(config=FakeOllamaConfig(response_tokens=200, tokens_per_second=50))
+    host, port = server.server_address[:2]
+    try:
+        llm = LLMService()
+        llm.backends = BackendPool([{"url": f"http://{host}:{port}", "max_concurrency": 1}])
+        llm.scheduler = OllamaScheduler(num_parallel=1, max_queue=4, default_deadline=0)
+
+        async def read_one_then_disconnect():
+            try:
+                chunks = llm.stream_ollama("prompt", options={"num_predict": 200})
+                first = await chunks.__anext__()
+                await chunks.aclose()
+                return first
+            finally:
+                await close_ollama_client()
+
+        assert asyncio.run(read_one_then_disconnect())["response"]
+        deadline = time.monotonic() + 5
+        while llm.scheduler.stats()["cancelled"] < 1 or llm.backends.backends[0].outstanding:
+            assert time.monotonic() < deadline, "job was not cancelled"
+            time.sleep(0.01)
+        # ยกเลิกโดยผู้เรียก ไม่นับเป็นความผิดของเครื่อง
+        assert llm.backends.backends[0].healthy and llm.backends.backends[0].failures == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# ---------- POST /rag/ask/stream ----------
+
+def _parse_sse(text: str):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(rag_router):
+    app = FastAPI()
+    app.include_router(rag_router.router)
+    return TestClient(app)
+
+
+def test_sse_route_streams_events(rag_router, client, monkeypatch):
+    monkeypatch.setattr(rag_router, "rag_service", _service(_StubLLM()))
+    r = client.post("/rag/ask/stream", json={"question": "VAT คืออะไร"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(r.text)
+    assert [e for e, _ in events] == ["refs", "token", "token", "done"]
+    assert events[0][1]["main_reference"] == "กค 0702/1"
+
+
+def test_sse_route_returns_503_before_streaming(rag_router, client, monkeypatch):
+    monkeypatch.setattr(rag_router, "rag_service", _service(_StubLLM(reject=True)))
+    r = client.post("/rag/ask/stream", json={"question": "q"})
+    assert r.status_code == 503
+    assert r.headers["retry-after"] == "7"
+
+
+def test_sse_route_stops_generation_when_client_disconnects(rag_router, monkeypatch):
+    llm = _StubLLM(tokens=("ก", "ข", "ค", "ง"))
+    svc = _service(llm)
+    monkeypatch.setattr(rag_router, "rag_service", svc)
+
+    class _Request:
+        def __init__(self):
+            self.checks = 0
+
+        async def is_disconnected(self):
+            # ตัดการเชื่อมต่อหลังได้ token แรก
+            self.checks += 1
+            return self.checks > 1
+
+    async def consume():
+        response = await rag_router.ask_question_stream(QuestionRequest(question="q"), _Request())
+        return [chunk async for chunk in response.body_iterator]
+
+    sent = asyncio.run(consume())
+    assert [s.split("\n", 1)[0] for s in sent] == ["event: refs", "event: token"]
+    assert llm.closed
+    assert svc.log_sink.entries[0]["status"] == "cancelled"
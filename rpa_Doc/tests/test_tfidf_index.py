@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from src.core.tfidf_index import WORD_ANALYZER, TfidfEncoder, load_index, make_vectorizer, save_index
+
+DOCS = [
+    "ผู้ประกอบการขายอาหารสัตว์ได้รับยกเว้นภาษีมูลค่าเพิ่ม",
+    "ค่าขนส่งต้องหักภาษี ณ ที่จ่ายร้อยละ 1",
+    "VAT 7% สำหรับการให้บริการ",
+    "ภาษีป้ายคำนวณจากขนาดของป้าย",
+]
+QUERIES = ["ขายอาหารสัตว์ต้องเสีย VAT ไหม", "หักภาษี ณ ที่จ่าย ค่าขนส่ง", "xyz ไม่มีในคลังคำ"]
+
+
+@pytest.mark.parametrize("analyzer,ngram_range", [("char_wb", (2, 3)), ("char", (1, 2)), (WORD_ANALYZER, (1, 2))])
+def test_encoder_matches_sklearn_transform(analyzer, ngram_range):
+    vectorizer = make_vectorizer(analyzer, ngram_range)
+    vectorizer.fit(DOCS)
+    encoder = TfidfEncoder.from_vectorizer(vectorizer, analyzer, ngram_range)
+
+    expected = vectorizer.transform(QUERIES + DOCS).toarray()
+    actual = encoder.transform(QUERIES + DOCS).toarray()
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-12)
+
+
+def test_encoder_lookup_marks_unknown_tokens():
+    vectorizer = make_vectorizer("char", (1, 1)).fit(["abc"])
+    encoder = TfidfEncoder.from_vectorizer(vectorizer)
+    assert encoder.lookup(["a", "z", "c"]).tolist() == [0, -1, 2]
+    assert encoder.oov_ratio(["az"]) == 0.5
+
+
+def test_save_and_load_round_trip(tmp_path):
+    vectorizer = make_vectorizer("char_wb", (2, 3))
+    matrix = vectorizer.fit_transform(DOCS)
+    encoder = TfidfEncoder.from_vectorizer(vectorizer)
+    shards = [
+        {"key": "2566", "year": 2566, "shard_hash": "a", "matrix": matrix[:2], "doc_hashes": ["h0", "h1"]},
+        {"key": "2567", "year": 2567, "shard_hash": "b", "matrix": matrix[2:], "doc_hashes": ["h2", "h3"]},
+    ]
+    save_index(str(tmp_path), encoder, shards, {"build_hash": "test"})
+
+    index = load_index(str(tmp_path))
+    assert index is not None and index.n_rows == len(DOCS)
+    loaded = index.shard_map()
+    np.testing.assert_allclose(loaded["2567"].matrix.toarray(), matrix[2:].toarray())
+    np.testing.assert_allclose(loaded["2566"].inverted.toarray(), matrix[:2].toarray())
+    np.testing.assert_allclose(
+        index.encoder.transform(QUERIES).toarray(), vectorizer.transform(QUERIES).toarray()
+    )
+
+
+def test_load_without_index_returns_none(tmp_path):
+    assert load_index(str(tmp_path / "missing")) is None
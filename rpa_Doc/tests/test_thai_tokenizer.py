@@ -0,0 +1,38 @@
+from src.core.thai_tokenizer import ThaiWordTokenizer, load_lexicon, make_word_analyzer
+
+WORDS = ["ภาษี", "ภาษีเงินได้", "เงิน", "ได้", "หัก", "ณ", "ที่", "จ่าย", "หัก ณ ที่จ่าย", "บริษัท"]
+
+
+def test_prefers_longest_dictionary_words():
+    tok = ThaiWordTokenizer(WORDS)
+    assert tok.segment_thai("ภาษีเงินได้") == ["ภาษีเงินได้"]
+    assert tok.segment_thai("บริษัทหักภาษี") == ["บริษัท", "หัก", "ภาษี"]
+
+
+def test_unknown_characters_are_grouped():
+    tok = ThaiWordTokenizer(WORDS)
+    assert tok.segment_thai("ภาษีกขคบริษัท") == ["ภาษี", "กขค", "บริษัท"]
+    assert tok.segment_thai("") == []
+
+
+def test_multi_word_entries_split_on_spaces():
+    # "หัก ณ ที่จ่าย" ลงทะเบียนเป็น "หัก", "ณ", "ที่จ่าย" (คำน้อยที่สุดชนะ "ที่" + "จ่าย")
+    tok = ThaiWordTokenizer(WORDS)
+    assert tok.segment_thai("หักณที่จ่าย") == ["หัก", "ณ", "ที่จ่าย"]
+    assert ThaiWordTokenizer(["ที่", "จ่าย"]).segment_thai("ที่จ่าย") == ["ที่", "จ่าย"]
+
+
+def test_tokenize_mixed_text():
+    tok = ThaiWordTokenizer(WORDS)
+    tokens = tok.tokenize("บริษัท ABC หักภาษี 3.5 % ตามมาตรา 50")
+    assert tokens == ["บริษัท", "abc", "หัก", "ภาษี", "3.5", "ตามมาตรา", "50"]
+
+
+def test_default_lexicon_and_word_ngrams():
+    assert "ภาษีเงินได้" in load_lexicon()
+    analyze = make_word_analyzer((1, 2))
+    text = "บริษัทหักภาษีเงินได้นิติบุคคล"
+    unigrams = make_word_analyzer((1, 1))(text)
+    assert len(unigrams) > 1 and all(" " not in g for g in unigrams)
+    bigrams = [f"{a} {b}" for a, b in zip(unigrams, unigrams[1:])]
+    assert analyze(text) == unigrams + bigrams